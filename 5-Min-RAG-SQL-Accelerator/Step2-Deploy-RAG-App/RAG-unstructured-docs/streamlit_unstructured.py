@@ -1,19 +1,36 @@
 import streamlit as st
 import os
-import re
+import sys
+import time
 import pandas as pd
-import tiktoken
-import requests
-import numpy as np
 import json
 from azure.ai.formrecognizer import DocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
 from openai import AzureOpenAI
 import pyodbc
-import struct
 from azure.identity import DefaultAzureCredential
 from azure.identity import InteractiveBrowserCredential
 
+# Shared helpers live in the top-level Shared folder of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'Shared'))
+from sqlvector import EmbeddingClient, EmbeddingCache, embeddings_url, AdaptiveScheduler, as_throttled
+from sqlvector.embeddings import estimate_tokens
+from sqlvector.dimensions import VectorConfig, two_stage_search_sql
+from sqlvector.pool import ConnectionPool
+from sqlvector.auth import AccessTokenProvider
+from sqlvector.query_cache import SearchCache
+from sqlvector.pipeline import Pipeline, Stage
+from sqlvector.chunking import chunk_text
+from sqlvector.normalize import TextNormalizer
+from sqlvector.exact import ExactIndex, LocalTable
+from sqlvector.ann import load_graph_table
+from sqlvector.quantize import QuantizedIndex
+from sqlvector.tracing import Tracer, span
+from sqlvector.streaming import CompletionStream
+from sqlvector.context import ContextBuilder
+from sqlvector.answer_cache import AnswerCache, answer_scope, result_ids
+from sqlvector.incremental import IncrementalIndexer, MemoryIndexStore, SqlIndexStore, document_hash
+
 # Adjust the layout to make the main window wide
 st.set_page_config(layout="wide", page_title="RAG with Azure SQL and OpenAI")
 
@@ -48,6 +65,10 @@ with st.sidebar:
     AZOPENAI_API_KEY = st.text_input('Azure OpenAI API Key', type='password', key='openai_key') 
     st.text_input("Embedding Model Deployment Name", value="text-embedding-ada-002", key="embedding_model")
     st.text_input("Chat Completion Model Name", value="gpt-4.1", key="gpt-4.1")
+    st.checkbox("Show timing breakdown", key="show_timings",
+                help="Time each stage of a search or recommendation (connection, token, embedding, query, fetch, completion) and show the breakdown.")
+    st.checkbox("Reuse answers to similar questions", value=True, key="use_answer_cache",
+                help="Answer a question that is nearly identical to an earlier one, and finds the same chunks, with the earlier recommendation instead of a new completion.")
 
 
 # Store config in session state for use throughout the app
@@ -68,37 +89,72 @@ def get_document_analysis_client():
     return DocumentAnalysisClient(endpoint=endpoint, credential=AzureKeyCredential(key))
 
 # Azure OpenAI setup
+EMBEDDING_DEPLOYMENT = "text-embedding-ada-002"
+
+# Vector column shape, from VECTOR_DIMENSIONS, VECTOR_ELEMENT_TYPE and VECTOR_PREFIX_DIMENSIONS.
+# float16 halves the storage and the bytes sent per vector; fewer dimensions truncate the embeddings
+# (fine for Matryoshka models such as text-embedding-3-*); a prefix size (e.g. 256) adds a short
+# embedding_prefix column used by the two-stage search
+VECTOR_CONFIG = VectorConfig.from_env(1536)
+
 def get_openai_embedding_url():
     endpoint = get_config('AZOPENAI_ENDPOINT')
-    deployment = "text-embedding-ada-002"
-    return f"{endpoint}openai/deployments/{deployment}/embeddings?api-version=2023-05-15"
+    return embeddings_url(endpoint, EMBEDDING_DEPLOYMENT)
 
 def get_openai_key():
     return get_config('AZOPENAI_API_KEY')
 
+# Request tracing: TRACING=1 records every request, TRACE_LOG and TRACE_OTEL export the spans;
+# otherwise only requests made with "Show timing breakdown" checked are recorded
+@st.cache_resource
+def get_tracer():
+    return Tracer.from_env()
+
+def show_timing_breakdown(trace):
+    # Stages of the last request, and latency percentiles of every stage since the app started
+    with st.expander(f"**Timing breakdown** ({trace.duration * 1000:.1f} ms)", expanded=True):
+        st.dataframe(pd.DataFrame(trace.breakdown()), hide_index=True)
+        st.write("Stage latencies since startup:")
+        st.dataframe(pd.DataFrame.from_dict(get_tracer().stats(), orient='index'))
+
 # SQL DB connection helper
+@st.cache_resource
+def get_token_provider():
+    # The token is acquired once (one browser sign-in) and refreshed in the background before it expires
+    credential = InteractiveBrowserCredential()
+    # credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
+    return AccessTokenProvider(credential)
+
+def open_mssql_connection(sql_connection_string, entra_connection_string):
+    with span("sql.connect"):
+        if entra_connection_string:
+            with span("auth.token"):
+                attrs_before = get_token_provider().attrs_before()
+            conn = pyodbc.connect(entra_connection_string, attrs_before=attrs_before)
+        else:
+            conn = pyodbc.connect(sql_connection_string)
+    
+    return conn
+
+@st.cache_resource
+def get_connection_pool(sql_connection_string, entra_connection_string):
+    # Process-wide pool: searches reuse open connections instead of paying a login (and token) each time
+    return ConnectionPool(lambda: open_mssql_connection(sql_connection_string, entra_connection_string), max_size=5)
+
 def get_mssql_connection():
+    # Returns a pooled connection; conn.close() hands it back to the pool
     sql_connection_string = get_config('SQL_CONNECTION_STRING')
     entra_connection_string = get_config('ENTRA_CONNECTION_STRING')
 
-    if entra_connection_string:
-        credential = InteractiveBrowserCredential()
-        # credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
-        token = credential.get_token('https://database.windows.net/.default')
-        token_bytes = token.token.encode('UTF-16LE')
-        token_struct = struct.pack(f'<I{len(token_bytes)}s', len(token_bytes), token_bytes)
-        SQL_COPT_SS_ACCESS_TOKEN = 1256
-        conn = pyodbc.connect(entra_connection_string, attrs_before={SQL_COPT_SS_ACCESS_TOKEN: token_struct})
-    elif sql_connection_string:
-        conn = pyodbc.connect(sql_connection_string)
-    else:
+    if not entra_connection_string and not sql_connection_string:
         raise ValueError("No valid connection string found.")
-    
-    return conn
+
+    with span("sql.connection"):
+        return get_connection_pool(sql_connection_string, entra_connection_string).acquire()
 
 # PDF extraction
-def extract_text_from_pdf(pdf_file):
-    document_analysis_client = get_document_analysis_client()
+def extract_text_from_pdf(pdf_file, document_analysis_client=None):
+    document_analysis_client = document_analysis_client or get_document_analysis_client()
     poller = document_analysis_client.begin_analyze_document("prebuilt-layout", document=pdf_file)
     result = poller.result()
     text = ""
@@ -107,104 +163,320 @@ def extract_text_from_pdf(pdf_file):
             text += line.content + " "
     return text
 
+# Collapse whitespace and keep only letters, digits and spaces; works on whole columns at once
+TEXT_NORMALIZER = TextNormalizer(lowercase=False, ascii_only=False, strip_punctuation=False, alphanumeric_only=True)
+
 def clean_text(text):
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-    return text
+    return TEXT_NORMALIZER.normalize(text)
 
-# Function to split text into chunks of 500 tokens
-def split_text_into_token_chunks(text, max_tokens=500):
-    tokenizer = tiktoken.get_encoding("cl100k_base")
-    tokens = tokenizer.encode(text)
-    chunks = []
-    for i in range(0, len(tokens), max_tokens):
-        chunk_tokens = tokens[i:i + max_tokens]
-        chunk_text = tokenizer.decode(chunk_tokens)
-        chunks.append(chunk_text)
-    return chunks
+# Function to split text into chunks of up to 500 tokens that end on sentence boundaries,
+# with a small overlap between consecutive chunks; the tokenizer is loaded once per process
+def split_text_into_token_chunks(text, max_tokens=500, overlap=50):
+    return chunk_text(text, max_tokens=max_tokens, overlap=overlap, boundary="sentence")
 
 # Embedding generation
+@st.cache_resource
+def get_embedding_cache():
+    # On-disk cache keyed by deployment + text hash, so re-uploaded resumes and repeated queries skip the API
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'embedding_cache.sqlite')
+    return EmbeddingCache(os.environ.get('EMBEDDING_CACHE_PATH', default_path))
+
+@st.cache_resource
+def get_embedding_client(openai_url, openai_key):
+    # One batched client per endpoint/key, reused across Streamlit reruns
+    return EmbeddingClient(openai_url, openai_key, cache=get_embedding_cache(), model=EMBEDDING_DEPLOYMENT)
+
+def current_embedding_client():
+    return get_embedding_client(get_openai_embedding_url(), get_openai_key())
+
 def get_embedding(text):
-    openai_url = get_openai_embedding_url()
-    openai_key = get_openai_key()
-    response = requests.post(openai_url,
-        headers={"api-key": openai_key, "Content-Type": "application/json"},
-        json={"input": [text]}
-    )
-    if response.status_code == 200:
-        response_json = response.json()
-        embedding = json.loads(str(response_json['data'][0]['embedding']))
-        return embedding
-    else:
-        return None
+    # Throttled requests are retried by the client's scheduler; other failures raise instead of returning None
+    with span("openai.embedding"):
+        return current_embedding_client().embed_one(text)
 
-# Insert into SQL DB
-def insert_embeddings_to_db(df):
+@st.cache_resource
+def get_search_cache():
+    # In-process cache of query embeddings and top-k results, invalidated by sync_embeddings_to_db
+    return SearchCache()
+
+def invalidate_resumedocs():
+    # Re-indexed files keep their chunk ids with new text: drop the cached results and the answers grounded in them
+    get_search_cache().invalidate('resumedocs')
+    get_answer_cache().clear()
+
+def get_embeddings(texts, progress=None):
+    """
+    Embed many chunks at once: inputs are packed into batched requests that run concurrently.
     """
-    Insert the embeddings DataFrame into the resumedocs table using the correct VECTOR type handling.
+    return current_embedding_client().embed(texts, progress=progress)
+
+# Incremental indexing into SQL DB
+# Every chunk row stores a hash of its text and resumedocs_files a hash of each PDF, so re-running the
+# steps only extracts changed files, embeds new or changed chunks, and removes chunks that disappeared.
+# Changes are written with one MERGE (and one DELETE) from a temp table, with vectors in their binary format
+def resume_index_store(conn):
+    return SqlIndexStore(conn, 'resumedocs', VECTOR_CONFIG, key='chunkid', document='filename', text='chunk',
+                         hash='content_hash', vector='embedding', prefix_vector='embedding_prefix',
+                         documents_table='resumedocs_files')
+
+def find_changed_files(files):
     """
+    Hashes of the uploaded files that are new or changed since they were last indexed
+    (all of them when no database is configured yet).
+    """
+    hashes = {f.name: document_hash(f.getvalue()) for f in files}
+    if not get_config('SQL_CONNECTION_STRING') and not get_config('ENTRA_CONNECTION_STRING'):
+        return hashes
     conn = get_mssql_connection()
-    cursor = conn.cursor()
-    cursor.fast_executemany = True
+    try:
+        return IncrementalIndexer(resume_index_store(conn)).changed_documents(hashes)
+    finally:
+        conn.close()
+
+def plan_resume_changes(df, document_hashes):
+    """
+    Compare the chunks of the processed files with the stored ones: only new or changed chunks need embeddings.
+    """
+    items = list(zip(df['unique_chunk_id'], df['file_name'], df['chunk_text']))
+    try:
+        conn = get_mssql_connection()
+    except Exception as e:
+        # Without the stored hashes every chunk counts as new; Step 4 still merges them on chunkid
+        st.warning(f"Could not read the indexed chunks ({e}); embedding every chunk.")
+        return IncrementalIndexer(MemoryIndexStore()).plan(items, list(document_hashes), document_hashes)
+    try:
+        return IncrementalIndexer(resume_index_store(conn)).plan(items, list(document_hashes), document_hashes)
+    finally:
+        conn.close()
+
+def sync_embeddings_to_db(plan, embeddings):
+    """
+    Apply a change plan to the resumedocs table: upsert the new and changed chunks with their
+    embeddings, delete the chunks that disappeared and record the file hashes, in one transaction.
+    """
+    conn = get_mssql_connection()
+    try:
+        result = IncrementalIndexer(resume_index_store(conn)).apply(plan, embeddings)
+    finally:
+        conn.close()
+    invalidate_resumedocs()
+    st.success(f"Table updated in {result.elapsed:.1f} s: {result.inserted} new, {result.updated} changed and "
+               f"{result.deleted} removed chunks; {result.unchanged} unchanged chunks were left as they are.")
+
+# Document processing pipeline
+def chunk_records(file_name, text):
+    """
+    Chunk the text of one document into the rows shown in Step 2. Chunking runs on the extracted
+    text, so sentence boundaries are still visible, and each chunk is cleaned afterwards;
+    start/end are character offsets into the extracted text.
+    """
+    chunks = split_text_into_token_chunks(text)
+    cleaned_chunks = TEXT_NORMALIZER.normalize_series(pd.Series([chunk.text for chunk in chunks], dtype=object))
+    records = []
+    for chunk_id, (chunk, cleaned) in enumerate(zip(chunks, cleaned_chunks)):
+        records.append({
+            "file_name": file_name,
+            "chunk_id": chunk_id,
+            "chunk_text": cleaned if cleaned else "NULL",
+            "unique_chunk_id": f"{file_name}_{chunk_id}",
+            "start": chunk.start,
+            "end": chunk.end
+        })
+    return records
+
+def process_documents(files, embed_and_insert=False, extract_workers=4, progress=None, document_hashes=None):
+    """
+    Run extraction -> cleaning/chunking (-> planning -> embedding -> upsert) as a staged pipeline connected
+    by bounded queues: several documents are analyzed at once, and chunks of the first documents are
+    embedded and written while later ones are still being extracted.
+    When embedding, each document's chunks are compared with the stored ones and only the new or changed
+    chunks (marked 'changed') are embedded and upserted; chunks that disappeared are deleted and the
+    `document_hashes` of the files recorded at the end, except for files whose upsert failed.
+    Returns the chunk records (with an 'embedding' when embedded) and the list of write errors.
+    """
+    # Clients and connections are resolved here, on the script thread: the stage workers are plain
+    # threads without access to st.session_state
+    document_analysis_client = get_document_analysis_client()
+    stages = [Stage("extract", lambda f: [(f.name, extract_text_from_pdf(f, document_analysis_client))], workers=extract_workers)]
     errors = []
-    rows_inserted = 0
-    for index, row in df.iterrows():
-        chunkid = row['chunkid']
-        filename = row['filename']
-        chunk = row['chunk']
-        embedding = row['embedding']
-        embedding_json = json.dumps(embedding)
-        try:
-            # Use NVARCHAR(MAX) to avoid truncation for large embeddings
-            query = """
-            INSERT INTO resumedocs (chunkid, filename, chunk, embedding)
-            VALUES (?, ?, ?, CAST(CAST(? AS NVARCHAR(MAX)) AS VECTOR(1536)))
-            """
-            cursor.execute(query, chunkid, filename, chunk, embedding_json)
-            rows_inserted += 1
-        except Exception as e:
-            errors.append(f"Row {index}: {e}")
-    conn.commit()
-    conn.close()
-    if errors:
-        st.error(f"Some rows failed to insert: {errors}")
-    elif rows_inserted == 0:
-        st.warning("No rows were inserted into the table. Please check your data and table schema.")
+    if embed_and_insert:
+        embedding_client = current_embedding_client()
+        sql_connection_string = get_config('SQL_CONNECTION_STRING')
+        entra_connection_string = get_config('ENTRA_CONNECTION_STRING')
+        if not entra_connection_string and not sql_connection_string:
+            raise ValueError("No valid connection string found.")
+        pool = get_connection_pool(sql_connection_string, entra_connection_string)
+        deletes, failed = {}, set()
+
+        def plan(document):
+            # A whole document at a time, so chunks it no longer has are found too
+            file_name, records = document
+            with pool.connection() as conn:
+                change = IncrementalIndexer(resume_index_store(conn)).plan(
+                    [(r["unique_chunk_id"], file_name, r["chunk_text"]) for r in records], [file_name])
+            upserts = {upsert[0]: upsert for upsert in change.upserts}
+            for record in records:
+                record["changed"] = upserts.get(record["unique_chunk_id"])
+            deletes[file_name] = change.deletes
+            return records
+
+        def embed(records):
+            changed = [r for r in records if r["changed"]]
+            if changed:
+                for record, embedding in zip(changed, embedding_client.embed([r["chunk_text"] for r in changed])):
+                    record["embedding"] = embedding
+            return records
+
+        def upsert(records):
+            changed = [r for r in records if r["changed"]]
+            if changed:
+                try:
+                    with pool.connection() as conn:
+                        resume_index_store(conn).write([r["changed"] for r in changed], [r["embedding"] for r in changed])
+                except Exception as e:
+                    errors.append(f"{len(changed)} chunks of {sorted({r['file_name'] for r in changed})}: {e}")
+                    failed.update(r["file_name"] for r in changed)
+            return records
+
+        stages += [
+            Stage("chunk", lambda doc: [(doc[0], chunk_records(*doc))]),
+            Stage("plan", plan, workers=2),
+            Stage("embed", embed, workers=2, batch_size=64),
+            Stage("upsert", upsert, batch_size=500, batch_wait=0.5),
+        ]
     else:
-        st.success(f"{rows_inserted} rows inserted successfully into the table.")
+        stages.append(Stage("chunk", lambda doc: chunk_records(*doc)))
+    records = Pipeline(stages, queue_size=32, progress=progress).run(files)
+    if embed_and_insert:
+        # A failed file keeps its old hash and its old chunks, so the next run processes it again
+        hashes = {name: digest for name, digest in (document_hashes or {}).items() if name not in failed}
+        removed = [key for name, keys in deletes.items() if name not in failed for key in keys]
+        with pool.connection() as conn:
+            resume_index_store(conn).write(deletes=removed, document_hashes=hashes)
+        invalidate_resumedocs()
+    # Completion order depends on which document finished first; restore a stable order
+    records.sort(key=lambda r: (r["file_name"], r["chunk_id"]))
+    return records, errors
 
 # Vector search
-def vector_search_sql(query, num_results=5):
+def run_vector_search(user_query_embedding, num_results):
     """
     Perform a vector similarity search in the resumedocs table using the VECTOR_DISTANCE function.
     """
     conn = get_mssql_connection()
     cursor = conn.cursor()
-    user_query_embedding = get_embedding(query)
-    embedding_json = json.dumps(user_query_embedding)
-    sql_similarity_search = """
+    sql_similarity_search = f"""
+    DECLARE @v {VECTOR_CONFIG.sql_type} = {VECTOR_CONFIG.parameter()};
     SELECT TOP (?) filename, chunkid, chunk,
-           1-vector_distance('cosine', CAST(CAST(? AS NVARCHAR(MAX)) AS VECTOR(1536)), embedding) AS similarity_score,
-           vector_distance('cosine', CAST(CAST(? AS NVARCHAR(MAX)) AS VECTOR(1536)), embedding) AS distance_score
+           1-vector_distance('cosine', @v, embedding) AS similarity_score,
+           vector_distance('cosine', @v, embedding) AS distance_score
     FROM dbo.resumedocs
     ORDER BY distance_score
     """
-    cursor.execute(sql_similarity_search, num_results, embedding_json, embedding_json)
-    results = cursor.fetchall()
+    with span("sql.query"):
+        cursor.execute(sql_similarity_search, VECTOR_CONFIG.encode(user_query_embedding), num_results)
+    with span("sql.fetch"):
+        results = cursor.fetchall()
+    conn.close()
+    return results
+
+def run_two_stage_vector_search(user_query_embedding, num_results):
+    """
+    Same result rows as run_vector_search: candidates are found over the short embedding_prefix
+    column, then reranked with the full embedding.
+    """
+    conn = get_mssql_connection()
+    cursor = conn.cursor()
+    sql = two_stage_search_sql(VECTOR_CONFIG, 'dbo.resumedocs', ['filename', 'chunkid', 'chunk'], 'embedding', 'embedding_prefix')
+    with span("sql.query"):
+        cursor.execute(sql, VECTOR_CONFIG.encode_prefix(user_query_embedding), VECTOR_CONFIG.encode(user_query_embedding),
+                       num_results, num_results * TWO_STAGE_OVERSAMPLE)
+    with span("sql.fetch"):
+        results = [tuple(row[:-1]) + (1 - row[-1], row[-1]) for row in cursor.fetchall()]
     conn.close()
     return results
 
+SQL_BACKEND = "Azure SQL (VECTOR_DISTANCE)"
+LOCAL_EXACT_BACKEND = "Local exact search (numpy)"
+LOCAL_ANN_BACKEND = "Local ANN graph index"
+LOCAL_QUANTIZED_BACKEND = "Local int8 scan + exact rescoring"
+SQL_TWO_STAGE_BACKEND = "Azure SQL two-stage (prefix + full rerank)"
+SEARCH_BACKENDS = [SQL_BACKEND, LOCAL_EXACT_BACKEND, LOCAL_ANN_BACKEND, LOCAL_QUANTIZED_BACKEND]
+if VECTOR_CONFIG.prefix_dimensions:
+    SEARCH_BACKENDS.insert(1, SQL_TWO_STAGE_BACKEND)
+# Candidates fetched over the prefix column per result, before the full-vector rerank
+TWO_STAGE_OVERSAMPLE = 4
+ANN_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ann_index', 'resumedocs')
+
+@st.cache_resource(max_entries=2)
+def get_local_table(sql_connection_string, entra_connection_string, table_version, backend):
+    # In-memory copy of resumedocs, reloaded once new chunks were inserted (the table version changes).
+    # The ANN graph is saved next to the app and reused while the table's row count and highest row_version are unchanged
+    with get_connection_pool(sql_connection_string, entra_connection_string).connection() as conn:
+        columns = ['filename', 'chunkid', 'chunk']
+        if backend == LOCAL_ANN_BACKEND:
+            return load_graph_table(conn, ANN_INDEX_PATH, 'dbo.resumedocs', columns, 'embedding', VECTOR_CONFIG.dimensions,
+                                    VECTOR_CONFIG.element_type, dtype=VECTOR_CONFIG.dtype)
+        index_factory = QuantizedIndex if backend == LOCAL_QUANTIZED_BACKEND else ExactIndex
+        return LocalTable.load(conn, 'dbo.resumedocs', columns, 'embedding', VECTOR_CONFIG.dimensions,
+                               VECTOR_CONFIG.element_type, dtype=VECTOR_CONFIG.dtype, index_factory=index_factory)
+
+def run_local_vector_search(user_query_embedding, num_results, backend):
+    """
+    Same result rows as run_vector_search, computed over an in-memory copy of the table
+    (exactly, or approximately with the graph index).
+    """
+    with span("local.load"):
+        table = get_local_table(get_config('SQL_CONNECTION_STRING'), get_config('ENTRA_CONNECTION_STRING'),
+                                get_search_cache().version('resumedocs'), backend)
+    with span("local.search"):
+        return [row + (1 - distance, distance) for row, distance in table.search(user_query_embedding, num_results)]
+
+def query_embedding(query):
+    # Embedded once per query text and embedding model, shortened to the configured dimensions like the stored vectors
+    with span("query_embedding"):
+        embedding = get_search_cache().embedding(query, lambda: get_embedding(query), model=EMBEDDING_DEPLOYMENT,
+                                                 dimensions=current_embedding_client().dimensions)
+        return VECTOR_CONFIG.truncate(embedding)
+
+def vector_search_sql(query, num_results=5, backend=SQL_BACKEND):
+    """
+    Cached vector search: repeated "Find Candidates" clicks reuse the query embedding and the results.
+    """
+    cache = get_search_cache()
+    user_query_embedding = query_embedding(query)
+    if backend == SQL_BACKEND:
+        run = run_vector_search
+    elif backend == SQL_TWO_STAGE_BACKEND:
+        run = run_two_stage_vector_search
+    else:
+        run = lambda embedding, k: run_local_vector_search(embedding, k, backend)
+    with span("search", backend=backend):
+        return cache.search(user_query_embedding, num_results, lambda k: run(user_query_embedding, k), table='resumedocs', backend=backend)
+
 # LLM completion
-def generate_completion(search_results, user_input):
-    api_key = get_openai_key()
-    azure_endpoint = get_config('AZOPENAI_ENDPOINT')
-    chat_model = "gpt-4.1"
-    client = AzureOpenAI(
-        api_key=api_key,
-        api_version="2023-05-15",
-        azure_endpoint=azure_endpoint
-    )
-    system_prompt = '''
+@st.cache_resource
+def get_chat_scheduler(azure_endpoint):
+    # Rate-limit-aware scheduler shared by all chat completion calls against the endpoint
+    return AdaptiveScheduler()
+
+@st.cache_resource
+def get_answer_cache():
+    # Recommendations by question embedding: a question within ANSWER_CACHE_THRESHOLD cosine similarity
+    # of an earlier one that found the same chunks gets the earlier answer for ANSWER_CACHE_TTL seconds
+    return AnswerCache(threshold=float(os.environ.get('ANSWER_CACHE_THRESHOLD', 0.95)),
+                       ttl=float(os.environ.get('ANSWER_CACHE_TTL', 3600)))
+
+# Chunks are sent to the model best first, without near-duplicates (e.g. the same resume uploaded
+# twice), in a compact format capped at CONTEXT_TOKEN_BUDGET tokens
+CONTEXT_BUILDER = ContextBuilder(
+    [("File", "filename"), ("Chunk ID", "chunkid"), ("Similarity Score", "similarity_score")], "chunktext",
+    text_label="Relevant Text", max_tokens=int(os.environ.get('CONTEXT_TOKEN_BUDGET', 3000))
+)
+
+CHAT_DEPLOYMENT = "gpt-4.1"
+
+SYSTEM_PROMPT = '''
 You are an intelligent & funny assistant who will exclusively answer based on the data provided in the `search_results`:
 - Use the information from `search_results` to generate your top 3 responses. If the data is not a perfect match for the user's query, use your best judgment to provide helpful suggestions and include the following format:
   File: {filename}
@@ -216,7 +488,24 @@ You are an intelligent & funny assistant who will exclusively answer based on th
 - Add a summary about why the candidate maybe a goodfit even if exact skills and the role being hired for are not matching , at the end of the recommendations. Ensure you call out which skills match the description and which ones are missing. If the candidate doesnt have prior experience for the hiring role which we may need to pay extra attention to during the interview process.
 - Add a Microsoft related interesting fact about the technology that was searched 
 '''
-    messages = [{"role": "system", "content": system_prompt}]
+
+# Cached answers are only reused for the same deployment, system prompt and context budget
+ANSWER_SCOPE = answer_scope(CHAT_DEPLOYMENT, SYSTEM_PROMPT, CONTEXT_BUILDER.max_tokens, CONTEXT_BUILDER.max_item_tokens)
+
+@st.cache_resource
+def get_openai_client(azure_endpoint, api_key):
+    # One client (and HTTP connection pool) per endpoint/key instead of one per question;
+    # retries are left to the chat scheduler, which honors Retry-After
+    return AzureOpenAI(api_key=api_key, api_version="2023-05-15", azure_endpoint=azure_endpoint, max_retries=0)
+
+def generate_completion(search_results, user_input):
+    """
+    Start a streamed completion and return its CompletionStream: iterating it yields the
+    answer as it is generated, and `stats` then holds the time to first token and tokens/s.
+    """
+    azure_endpoint = get_config('AZOPENAI_ENDPOINT')
+    client = get_openai_client(azure_endpoint, get_openai_key())
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
     result_list = []
     for result in search_results:
         filename, chunkid, chunktext, similarity_score, _ = result
@@ -226,10 +515,19 @@ You are an intelligent & funny assistant who will exclusively answer based on th
             "chunktext": chunktext,
             "similarity_score": similarity_score
         })
-    messages.append({"role": "system", "content": f"{result_list}"})
+    with span("context.pack") as pack_span:
+        context = CONTEXT_BUILDER.build(result_list)
+        pack_span.set(rows=len(context.used), tokens=context.tokens, duplicates=context.duplicates)
+    messages.append({"role": "system", "content": context.text})
     messages.append({"role": "user", "content": user_input})
-    response = client.chat.completions.create(model=chat_model, messages=messages, temperature=0)
-    return response.choices[0].message.content
+    start = time.perf_counter()
+    # Returns once the response headers arrive, so a 429 is still raised (and retried) here
+    with span("openai.chat_completion"):
+        chunks = get_chat_scheduler(azure_endpoint).run(
+            lambda: as_throttled(lambda: client.chat.completions.create(model=CHAT_DEPLOYMENT, messages=messages, temperature=0, stream=True)),
+            tokens=sum(estimate_tokens(m["content"]) for m in messages)
+        )
+    return CompletionStream(chunks, start)
 
 # --- Table Creation Utility ---
 def check_and_create_table():
@@ -242,20 +540,43 @@ def check_and_create_table():
     exists = cursor.fetchone()[0]
     if not exists:
         # Create table using schema from CreateTable.sql
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE resumedocs (
                 id INT IDENTITY(1,1) PRIMARY KEY,
                 chunkid NVARCHAR(255),
                 filename NVARCHAR(255),
                 chunk NVARCHAR(MAX),
-                embedding VECTOR(1536)
+                content_hash CHAR(64),
+                {VECTOR_CONFIG.column_definitions('embedding', 'embedding_prefix')}
             )
         ''')
-        conn.commit()
-        conn.close()
-        return False  # Table was created
+    elif not cursor.execute("SELECT COL_LENGTH('resumedocs', 'content_hash')").fetchone()[0]:
+        # Table created by an earlier version: its rows get a hash (and are re-embedded once) on the next sync
+        cursor.execute("ALTER TABLE resumedocs ADD content_hash CHAR(64) NULL")
+    # The local ANN index is reused while COUNT_BIG(*) and MAX(row_version) are unchanged; the index keeps that cheap
+    cursor.execute("IF COL_LENGTH('resumedocs', 'row_version') IS NULL ALTER TABLE resumedocs ADD row_version ROWVERSION")
+    cursor.execute('''
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_resumedocs_row_version' AND object_id = OBJECT_ID('resumedocs'))
+            CREATE INDEX ix_resumedocs_row_version ON resumedocs (row_version);
+    ''')
+    # The earlier insert-only path added the chunks of a re-uploaded file again: keep the newest row of each chunk
+    cursor.execute('''
+        WITH duplicates AS (SELECT ROW_NUMBER() OVER (PARTITION BY chunkid ORDER BY id DESC) AS n FROM resumedocs)
+        DELETE FROM duplicates WHERE n > 1;
+    ''')
+    # Change detection state: the chunk lookups of the MERGE and the hash of every indexed file
+    cursor.execute('''
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_resumedocs_chunkid' AND object_id = OBJECT_ID('resumedocs'))
+            IF COL_LENGTH('resumedocs', 'row_version') IS NULL
+        ALTER TABLE resumedocs ADD row_version ROWVERSION;
+    CREATE INDEX ix_resumedocs_row_version ON resumedocs (row_version);
+    CREATE INDEX ix_resumedocs_chunkid ON resumedocs (chunkid) INCLUDE (filename, content_hash);
+        IF OBJECT_ID('resumedocs_files') IS NULL
+            CREATE TABLE resumedocs_files (filename NVARCHAR(255) PRIMARY KEY, content_hash CHAR(64) NOT NULL);
+    ''')
+    conn.commit()
     conn.close()
-    return True  # Table already existed
+    return bool(exists)  # False when the table was created
 
 # Streamlit UI
 st.title("RAG Resume Matcher with Azure SQL DB, Document Intelligence, and OpenAI")
@@ -272,7 +593,7 @@ st.subheader("Step 1: SQL Database Table Creation")
 with st.expander("**Table Creation Process**"):
     st.markdown("We will insert our vectors into the SQL Table. Azure SQL DB now has a dedicated, native, data type for storing vectors: the `vector` data type. Read about the preview [here](https://devblogs.microsoft.com/azure-sql/eap-for-vector-support-refresh-introducing-vector-type/).  " \
     "\nTo facilitate creation of the table, following SQL query would be executed:")
-    st.code("""
+    st.code(f"""
     IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'resumedocs')
     BEGIN
         CREATE TABLE resumedocs (
@@ -280,9 +601,19 @@ with st.expander("**Table Creation Process**"):
             chunkid NVARCHAR(255),
             filename NVARCHAR(255),
             chunk NVARCHAR(MAX),
-            'embedding VECTOR(1536)'
+            content_hash CHAR(64),
+            '{VECTOR_CONFIG.column_definitions('embedding', 'embedding_prefix')}'
         )
     END
+    IF COL_LENGTH('resumedocs', 'content_hash') IS NULL
+        ALTER TABLE resumedocs ADD content_hash CHAR(64) NULL;
+    WITH duplicates AS (SELECT ROW_NUMBER() OVER (PARTITION BY chunkid ORDER BY id DESC) AS n FROM resumedocs)
+    DELETE FROM duplicates WHERE n > 1;
+    IF COL_LENGTH('resumedocs', 'row_version') IS NULL
+        ALTER TABLE resumedocs ADD row_version ROWVERSION;
+    CREATE INDEX ix_resumedocs_row_version ON resumedocs (row_version);
+    CREATE INDEX ix_resumedocs_chunkid ON resumedocs (chunkid) INCLUDE (filename, content_hash);
+    CREATE TABLE resumedocs_files (filename NVARCHAR(255) PRIMARY KEY, content_hash CHAR(64) NOT NULL);
     """)
 if st.button("Check/Create documents Table"):
     existed = check_and_create_table()
@@ -297,9 +628,10 @@ with st.expander("**Dataset Processing**"):
     st.markdown("Next we'll be using **Azure Document Intelligence** to analyze text and structured data from the PDF resumes. " \
     "DocumentAnalysisClient provides operations for analyzing input documents using prebuilt and custom models through the `begin_analyze_document` and `begin_analyze_document_from_url` APIs. In this tutorial, we are using the [prebuilt-layout](https://learn.microsoft.com/en-us/python/api/overview/azure/ai-formrecognizer-readme?view=azure-python#using-prebuilt-models)." )
     st.markdown("When faced with content that exceeds the embedding limit, we usually also chunk the content into smaller pieces and then embed those one at a time. " \
-    "Here we will use `tiktoken` to chunk the extracted text into **token sizes of 500**, as we will later pass the extracted chunks to to the `text-embedding-small` model "
+    "Here we will use `tiktoken` to chunk the extracted text into **token sizes of up to 500** that end on sentence boundaries (consecutive chunks overlap by about 50 tokens), as we will later pass the extracted chunks to to the `text-embedding-small` model "
     "for [generating text embeddings](https://learn.microsoft.com/en-us/azure/ai-services/openai/tutorials/embeddings?tabs=python-new%2Ccommand-line&pivots=programming-language-python) as this has a model input token limit of 8192.")
 uploaded_files = st.file_uploader("Upload docs", type=["pdf"], accept_multiple_files=True)
+pipelined = st.checkbox("Also generate embeddings and insert them while extracting (runs Steps 3 and 4 in the same pipeline)")
 
 # Use session state to avoid reprocessing and persist results
 if 'df' not in st.session_state:
@@ -312,32 +644,41 @@ if 'insert_status' not in st.session_state:
 if uploaded_files:
     if st.session_state.get('last_uploaded_files') != [f.name for f in uploaded_files]:
         # Only process if new files are uploaded
-        all_data = []
         status_placeholder = st.empty()  # Placeholder for status messages
-        total_chunks = 0
-        for file in uploaded_files:
-            status_placeholder.info(f"Processing: {file.name}")
-            text = extract_text_from_pdf(file)
-            cleaned = clean_text(text)
-            chunks = split_text_into_token_chunks(cleaned)
-            total_chunks += len(chunks)
-            status_placeholder.success(f"Extracted {len(chunks)} chunks from {file.name}")
-            for chunk_id, chunk in enumerate(chunks):
-                chunk_text = chunk.strip() if chunk.strip() else "NULL"
-                unique_chunk_id = f"{file.name}_{chunk_id}"
-                all_data.append({
-                    "file_name": file.name,
-                    "chunk_id": chunk_id,
-                    "chunk_text": chunk_text,
-                    "unique_chunk_id": unique_chunk_id
-                })
-        df = pd.DataFrame(all_data)
+        progress_text = st.empty()
+        # Files indexed before with the same content are skipped before they are sent for extraction
+        document_hashes = find_changed_files(uploaded_files)
+        changed_files = [f for f in uploaded_files if f.name in document_hashes]
+        skipped = len(uploaded_files) - len(changed_files)
+        skipped_note = f" ({skipped} unchanged file(s) skipped)" if skipped else ""
+        status_placeholder.info(f"Processing {len(changed_files)} file(s){skipped_note}...")
+        all_data, errors = process_documents(
+            changed_files,
+            embed_and_insert=pipelined,
+            progress=lambda stats: progress_text.write(" | ".join(f"{name}: {c['in']} in, {c['out']} out" for name, c in stats.items())),
+            document_hashes=document_hashes
+        )
+        df = pd.DataFrame(all_data, columns=["file_name", "chunk_id", "chunk_text", "unique_chunk_id", "start", "end"])
         st.session_state['df'] = df
+        st.session_state['document_hashes'] = document_hashes
+        st.session_state['change_plan'] = None
         st.session_state['result_df'] = None  # Reset embeddings if new files
         st.session_state['insert_status'] = None
+        if pipelined:
+            # Only the new or changed chunks were embedded and written
+            embedded = [r for r in all_data if r.get('embedding') is not None]
+            st.session_state['result_df'] = pd.DataFrame({
+                'filename': [r['file_name'] for r in embedded],
+                'chunkid': [r['unique_chunk_id'] for r in embedded],
+                'chunk': [r['chunk_text'] for r in embedded],
+                'embedding': [r['embedding'] for r in embedded]
+            })
+            st.session_state['insert_status'] = True
+            if errors:
+                st.error(f"Some rows failed to insert: {errors}")
         st.session_state['last_uploaded_files'] = [f.name for f in uploaded_files]
         # After processing all files, show a summary success message
-        status_placeholder.success(f"Processed {len(uploaded_files)} file(s) and extracted a total of {total_chunks} text chunks.")
+        status_placeholder.success(f"Processed {len(changed_files)} file(s){skipped_note} and extracted a total of {len(df)} text chunks.")
     else:
         df = st.session_state['df']
     st.write("Preview of processed dataset:")
@@ -357,47 +698,48 @@ if st.session_state['df'] is not None:
     if st.button("Generate Embeddings") or st.session_state.get('result_df') is not None:
         if st.session_state.get('result_df') is None:
             df = st.session_state['df']
-            all_filenames, all_chunkids, all_chunks, all_embeddings = [], [], [], []
-            for index, row in df.iterrows():
-                filename = row['file_name']
-                chunkid = row['unique_chunk_id']
-                chunk = row['chunk_text']
-                embedding = get_embedding(chunk)
-                if embedding is not None:
-                    all_filenames.append(filename)
-                    all_chunkids.append(chunkid)
-                    all_chunks.append(chunk)
-                    all_embeddings.append(embedding)
-                if (index + 1) % 10 == 0:
-                    st.write(f"Completed {index + 1} rows")
+            # Only chunks that are new or changed since the last sync are embedded
+            plan = plan_resume_changes(df, st.session_state.get('document_hashes') or {})
+            texts = plan.texts
+            all_embeddings = []
+            if texts:
+                progress_bar = st.progress(0.0, text="Generating embeddings...")
+                all_embeddings = get_embeddings(
+                    texts,
+                    progress=lambda done, total: progress_bar.progress(done / total, text=f"Completed {done} of {total} rows")
+                )
             # Always show the final count
-            st.success(f"Completed {len(df)} rows")
+            st.success(f"Completed {len(texts)} rows ({plan.new} new and {plan.changed} changed chunks; "
+                       f"{plan.unchanged} unchanged chunks skipped, {len(plan.deletes)} removed chunks to delete)")
             result_df = pd.DataFrame({
-                'filename': all_filenames,
-                'chunkid': all_chunkids,
-                'chunk': all_chunks,
+                'filename': [document for _, document, _, _ in plan.upserts],
+                'chunkid': [key for key, _, _, _ in plan.upserts],
+                'chunk': texts,
                 'embedding': all_embeddings
             })
             st.session_state['result_df'] = result_df
+            st.session_state['change_plan'] = plan
         st.dataframe(st.session_state['result_df'].head())
 
 # Step 4: Insert into DB
 st.subheader("Step 4: Insert data into SQL DB")
 with st.expander("**Vector Embedding Storage in Azure SQL Database**"):
-    st.markdown("""
-    We will insert our vectors into the SQL Table now. The table embeddings has a column called **vector** which is vector(1536) type.
+    st.markdown(f"""
+    We will insert our vectors into the SQL Table now. The table embeddings has a column called **vector** which is {VECTOR_CONFIG.sql_type.lower()} type.
 
-    We will pass the vectors by converting a JSON array to a compact **binary** representation of a vector. Vectors are stored in an efficient binary format that also enables usage of dedicated CPU vector processing extensions like SIMD and AVX.       
+    Only new or changed chunks are written: they are sent to a temporary table and merged into `resumedocs` with a single `MERGE` on `chunkid`, chunks that are no longer in the processed files are deleted, and the hash of every file is recorded in `resumedocs_files`, so uploading the same files again does not create duplicate rows.
+
+    We will pass the vectors in their compact native **binary** representation (a small header followed by the {VECTOR_CONFIG.element_type} values) instead of JSON text. Vectors are stored in an efficient binary format that also enables usage of dedicated CPU vector processing extensions like SIMD and AVX.       
     """)
     # st.code("""
     #         INSERT INTO resumedocs (chunkid, filename, chunk, embedding)
-    #         VALUES (?, ?, ?, CAST(CAST(? AS NVARCHAR(MAX)) AS VECTOR(1536)))
+    #         VALUES (?, ?, ?, CAST(? AS VECTOR(1536)))
     #         """)
 if st.session_state.get('result_df') is not None:
     if st.button("Insert Embeddings into Azure SQL DB") or st.session_state.get('insert_status') is not None:
         if st.session_state.get('insert_status') is None:
             result_df = st.session_state['result_df']
-            insert_embeddings_to_db(result_df)
+            sync_embeddings_to_db(st.session_state['change_plan'], result_df['embedding'].tolist())
             st.session_state['insert_status'] = True
         with st.expander("**Preview of the inserted data:**"):
             st.dataframe(st.session_state['result_df'].head())
@@ -443,17 +785,25 @@ We are passing the results of the `vector_search_sql` function to the model and
 
 
 user_query = st.text_input("What role or skills are you hiring for?")
+search_backend = st.radio("Search backend", SEARCH_BACKENDS, horizontal=True,
+                          help="The local backends load the resume vectors into memory once and search them without a query per search: "
+                               "exactly with numpy, approximately with a graph index saved next to the app, or by scanning "
+                               "int8 codes (4x smaller) and rescoring the best candidates exactly.")
 
 # Use session state to persist results
 if 'search_results' not in st.session_state:
     st.session_state['search_results'] = None
 if 'llm_response' not in st.session_state:
     st.session_state['llm_response'] = None
+# Set when the answer was just streamed on this run, so it is not written a second time
+streamed = False
 
 if st.button("**Find Candidates**") and user_query:
-    search_results = vector_search_sql(user_query)
+    with get_tracer().trace("vector_search", record=st.session_state.show_timings, backend=search_backend) as request:
+        search_results = vector_search_sql(user_query, backend=search_backend)
     st.session_state['search_results'] = search_results
     st.session_state['llm_response'] = None  # Reset LLM response on new search
+    st.session_state['last_trace'] = request.trace
 
 if st.session_state['search_results']:
     st.write("**Top matching candidates:**")
@@ -463,8 +813,31 @@ if st.session_state['search_results']:
             st.write(r[2])
     st.write("---")
     if st.button("**Ask LLM for Recommendation**"):
-        completions_results = generate_completion(st.session_state['search_results'], user_query)
-        st.session_state['llm_response'] = completions_results
+        with get_tracer().trace("recommendation", record=st.session_state.show_timings) as request:
+            # The chunk ids and texts identify the results; the answer is only reused for the same chunks
+            answer_key = (query_embedding(user_query), result_ids(st.session_state['search_results'], (1, 2)))
+            cached = None
+            if st.session_state.use_answer_cache:
+                with span("answer_cache.lookup"):
+                    cached = get_answer_cache().lookup(*answer_key, scope=ANSWER_SCOPE)
+            if cached is not None:
+                st.session_state['llm_response'] = cached.answer
+                st.session_state['llm_caption'] = (f"Cached answer to \"{cached.question}\" "
+                                                   f"(similarity {cached.similarity:.3f}, {cached.age:.0f} s ago)")
+            else:
+                completion = generate_completion(st.session_state['search_results'], user_query)
+                # Rendered token by token as the answer is generated
+                with span("openai.stream"):
+                    st.session_state['llm_response'] = st.write_stream(completion)
+                get_answer_cache().store(*answer_key, completion.text, scope=ANSWER_SCOPE, question=user_query)
+                st.session_state['llm_caption'] = completion.stats.describe()
+                streamed = True
+        st.session_state['last_trace'] = request.trace
 
 if st.session_state['llm_response']:
-    st.write(st.session_state['llm_response'])
+    if not streamed:
+        st.write(st.session_state['llm_response'])
+    st.caption(st.session_state['llm_caption'])
+
+if st.session_state.show_timings and st.session_state.get('last_trace') is not None:
+    show_timing_breakdown(st.session_state['last_trace'])
@@ -1,13 +1,30 @@
 import streamlit as st
 import os
+import sys
+import time
 import pandas as pd
-import json
-import requests
 from dotenv import load_dotenv
 from openai import AzureOpenAI
 import pyodbc
 from azure.identity import DefaultAzureCredential
-import struct
+
+# Shared helpers live in the top-level Shared folder of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'Shared'))
+from sqlvector import EmbeddingClient, EmbeddingCache, embeddings_url, AdaptiveScheduler, as_throttled
+from sqlvector.embeddings import estimate_tokens
+from sqlvector.dimensions import VectorConfig, supports_dimensions, two_stage_search_sql
+from sqlvector.ingest import stream_csv_to_table
+from sqlvector.pool import ConnectionPool
+from sqlvector.auth import AccessTokenProvider
+from sqlvector.query_cache import SearchCache
+from sqlvector.normalize import TextNormalizer
+from sqlvector.exact import ExactIndex, LocalTable
+from sqlvector.ann import load_graph_table
+from sqlvector.quantize import QuantizedIndex
+from sqlvector.tracing import Tracer, span
+from sqlvector.streaming import CompletionStream
+from sqlvector.context import ContextBuilder
+from sqlvector.answer_cache import AnswerCache, answer_scope, result_ids
 
 # Adjust the layout to make the main window wide
 st.set_page_config(layout="wide", page_title="RAG with Azure SQL and OpenAI")
@@ -15,6 +32,12 @@ st.set_page_config(layout="wide", page_title="RAG with Azure SQL and OpenAI")
 # Load environment variables
 load_dotenv()
 
+# Vector column shape, from VECTOR_DIMENSIONS, VECTOR_ELEMENT_TYPE and VECTOR_PREFIX_DIMENSIONS.
+# float16 halves the storage and the bytes sent per vector; fewer dimensions truncate the embeddings
+# (fine for Matryoshka models such as text-embedding-3-*); a prefix size (e.g. 256) adds a short
+# [VectorPrefix] column used by the two-stage search
+VECTOR_CONFIG = VectorConfig.from_env(1536)
+
 # Update custom CSS for styling expander elements
 st.markdown(
     """
@@ -39,6 +62,10 @@ with st.sidebar:
     st.text_input("Azure OpenAI API Key", type="password", key="openai_api_key")
     st.text_input("Embedding Model Deployment Name", placeholder="text-embedding-3-small", key="embedding_model")
     st.text_input("Chat Completion Model Name", placeholder="gpt-4.1", key="gpt-4.1")
+    st.checkbox("Show timing breakdown", key="show_timings",
+                help="Time each stage of a search or answer (connection, token, embedding, query, fetch, completion) and show the breakdown below the results.")
+    st.checkbox("Reuse answers to similar questions", value=True, key="use_answer_cache",
+                help="Answer a question that is nearly identical to an earlier one, and retrieves the same rows, with the earlier answer instead of a new completion.")
 
 # Automatically expand the sidebar when the user visits the site
 st.sidebar.markdown("<style>.sidebar .sidebar-content {width: 300px;}</style>", unsafe_allow_html=True)
@@ -67,26 +94,61 @@ if st.session_state.embedding_model:
 
 
 
+@st.cache_resource
+def get_tracer():
+    """
+    Request tracer: TRACING=1 records every request, TRACE_LOG and TRACE_OTEL export the spans.
+    Otherwise only requests made with "Show timing breakdown" checked are recorded.
+    """
+    return Tracer.from_env()
+
+def show_timing_breakdown(trace):
+    # Stages of the last request, and latency percentiles of every stage since the app started
+    with st.expander(f"**Timing breakdown** ({trace.duration * 1000:.1f} ms)", expanded=True):
+        st.dataframe(pd.DataFrame(trace.breakdown()), hide_index=True)
+        st.write("Stage latencies since startup:")
+        st.dataframe(pd.DataFrame.from_dict(get_tracer().stats(), orient='index'))
+
+@st.cache_resource
+def get_token_provider():
+    """
+    Cached Entra ID access token for SQL connections, refreshed in the background before it expires.
+    """
+    return AccessTokenProvider(DefaultAzureCredential(exclude_interactive_browser_credential=False))
+
+def open_mssql_connection(sql_connection_string, entra_connection_string):
+    """
+    Open a new physical connection to Azure SQL Database.
+    """
+    with span("sql.connect"):
+        if entra_connection_string:
+            with span("auth.token"):
+                attrs_before = get_token_provider().attrs_before()
+            conn = pyodbc.connect(entra_connection_string, attrs_before=attrs_before)
+        else:
+            conn = pyodbc.connect(sql_connection_string)
+
+    return conn
+
+@st.cache_resource
+def get_connection_pool(sql_connection_string, entra_connection_string):
+    """
+    Process-wide connection pool, shared across Streamlit reruns and sessions.
+    """
+    return ConnectionPool(lambda: open_mssql_connection(sql_connection_string, entra_connection_string), max_size=5)
+
 def get_mssql_connection():
     """
-    Establish a connection to Azure SQL Database.
+    Get a connection to Azure SQL Database from the pool; `close()` returns it to the pool.
     """
     entra_connection_string = os.getenv('ENTRAID_CONNECTION_STRING')
     sql_connection_string = os.getenv('SQL_CONNECTION_STRING')
 
-    if entra_connection_string:
-        credential = DefaultAzureCredential(exclude_interactive_browser_credential=False)
-        token = credential.get_token('https://database.windows.net/.default')
-        token_bytes = token.token.encode('UTF-16LE')
-        token_struct = struct.pack(f'<I{len(token_bytes)}s', len(token_bytes), token_bytes)
-        SQL_COPT_SS_ACCESS_TOKEN = 1256
-        conn = pyodbc.connect(entra_connection_string, attrs_before={SQL_COPT_SS_ACCESS_TOKEN: token_struct})
-    elif sql_connection_string:
-        conn = pyodbc.connect(sql_connection_string)
-    else:
+    if not entra_connection_string and not sql_connection_string:
         raise ValueError("No valid connection string found.")
 
-    return conn
+    with span("sql.connection"):
+        return get_connection_pool(sql_connection_string, entra_connection_string).acquire()
 
 
 # Section 1: Check and Create Table in Azure SQL Database
@@ -96,7 +158,7 @@ st.subheader("Step 1: Create Table in Azure SQL Database")
 with st.expander("**Table Creation Process**"):
     st.markdown("We will insert our vectors into the SQL Table. Azure SQL DB now has a dedicated, native, data type for storing vectors: the vector data type. Read about the preview [here](https://devblogs.microsoft.com/azure-sql/eap-for-vector-support-refresh-introducing-vector-type/).  " \
     "\nTo facilitate creation of the table, following SQL query would be executed:")
-    st.code("""
+    st.code(f"""
     IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'embeddings')
     BEGIN
         CREATE TABLE [dbo].[embeddings]
@@ -108,9 +170,12 @@ with st.expander("**Table Creation Process**"):
             [Summary] [nvarchar](max) NULL,
             [Text] [nvarchar](max) NULL,
             [Combined] [nvarchar](max) NULL,
-            '[Vector] [vector](1536) NULL'
+            '{VECTOR_CONFIG.column_definitions('[Vector]', '[VectorPrefix]', ' NULL')}'
         )
     END
+    IF COL_LENGTH('dbo.embeddings', 'row_version') IS NULL
+        ALTER TABLE [dbo].[embeddings] ADD [row_version] ROWVERSION
+    CREATE INDEX ix_embeddings_row_version ON [dbo].[embeddings] ([row_version])
     """)
 
 def check_and_create_table():
@@ -118,7 +183,7 @@ def check_and_create_table():
     cursor = conn.cursor()
     
     # Check if the table exists
-    check_table_query = """
+    check_table_query = f"""
     IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'embeddings')
     BEGIN
         CREATE TABLE [dbo].[embeddings]
@@ -130,11 +195,18 @@ def check_and_create_table():
             [Summary] [nvarchar](max) NULL,
             [Text] [nvarchar](max) NULL,
             [Combined] [nvarchar](max) NULL,
-            [Vector] [vector](1536) NULL
+            {VECTOR_CONFIG.column_definitions('[Vector]', '[VectorPrefix]', ' NULL')}
         )
     END
     """
     cursor.execute(check_table_query)
+    # The local ANN index is reused while COUNT_BIG(*) and MAX(row_version) are unchanged; the index keeps that cheap.
+    # Separate statements, so the index is compiled once the column exists
+    cursor.execute("IF COL_LENGTH('dbo.embeddings', 'row_version') IS NULL ALTER TABLE [dbo].[embeddings] ADD [row_version] ROWVERSION")
+    cursor.execute("""
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_embeddings_row_version' AND object_id = OBJECT_ID('dbo.embeddings'))
+        CREATE INDEX ix_embeddings_row_version ON [dbo].[embeddings] ([row_version])
+    """)
     conn.commit()
     conn.close()
 
@@ -159,6 +231,9 @@ with st.expander("**Dataset Processing**"):
     st.markdown("Next we'll perform some light data cleaning on the uploaded reviews dataset by removing redundant whitespace and cleaning up the punctuation to prepare the data for tokenization." \
     " We will also remove comments that are too long for the token limit (8192 tokens - the maximum length of input text for the Azure OpenAI embedding models). When faced with content that exceeds the embedding limit, you can also chunk the content into smaller pieces and then embed those one at a time. You can read more about data chunking [here](https://learn.microsoft.com/en-us/azure/search/vector-search-how-to-chunk-documents)")
 
+# Collapses redundant whitespace over the whole column at once (same normalizer as the resume app's chunk cleaner)
+COMBINED_NORMALIZER = TextNormalizer(lowercase=False, ascii_only=False, strip_punctuation=False)
+
 uploaded_file = st.file_uploader("Upload the CSV file for embedding generation", type="csv")
 if uploaded_file is not None:
     # Only reload DataFrame if file changes
@@ -166,7 +241,7 @@ if uploaded_file is not None:
         df = pd.read_csv(uploaded_file)
         required_columns = ["Id", "Time", "ProductId", "UserId", "Score", "Summary", "Text"]
         df = df[required_columns]
-        df["combined"] = df["Summary"].str.strip() + ": " + df["Text"].str.strip()
+        df["combined"] = COMBINED_NORMALIZER.normalize_series(df["Summary"].str.strip() + ": " + df["Text"].str.strip())
         st.session_state['uploaded_df'] = df
         st.session_state['last_uploaded_file'] = uploaded_file.name
         st.session_state['embeddings_df'] = None  # Reset embeddings if new file
@@ -194,24 +269,57 @@ with st.expander("**What are Embeddings ?**"):
     Since the embedding generation process can be time-consuming, we will only generate embeddings for the *first 10 rows* of the dataset for demonstration purposes.
     """)
 
+# Deployment from the sidebar or AZURE_OPENAI_EMBEDDING_MODEL_DEPLOYMENT_NAME
+EMBEDDING_DEPLOYMENT = os.environ.get('AZURE_OPENAI_EMBEDDING_MODEL_DEPLOYMENT_NAME') or "text-embedding-ada-002"
+# text-embedding-3-* models return vectors of the configured size directly; other models are
+# asked for their native size, and shortening their vectors costs noticeably more recall
+EMBEDDING_DIMENSIONS = VECTOR_CONFIG.embedding_dimensions(EMBEDDING_DEPLOYMENT)
+if not supports_dimensions(EMBEDDING_DEPLOYMENT) and VECTOR_CONFIG.truncates(1536):
+    st.warning(f"`{EMBEDDING_DEPLOYMENT}` does not support shortened embeddings: its vectors will be truncated to "
+               f"{VECTOR_CONFIG.dimensions} dimensions (prefix: {VECTOR_CONFIG.prefix_dimensions}), which lowers "
+               "search quality. Use a text-embedding-3 model, or unset VECTOR_DIMENSIONS and VECTOR_PREFIX_DIMENSIONS.")
+
+@st.cache_resource
+def get_embedding_cache():
+    """
+    On-disk embedding cache, so re-uploaded reviews and repeated queries are not embedded again.
+    """
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'embedding_cache.sqlite')
+    return EmbeddingCache(os.environ.get('EMBEDDING_CACHE_PATH', default_path))
+
+@st.cache_resource
+def get_embedding_client(openai_url, openai_key, deployment, dimensions):
+    """
+    Batched embedding client, shared across reruns for the same endpoint, key, deployment and dimensions.
+    """
+    return EmbeddingClient(openai_url, openai_key, cache=get_embedding_cache(), model=deployment,
+                           dimensions=dimensions)
+
+def current_embedding_client():
+    openai_url = embeddings_url(os.environ.get('AZURE_OPENAI_ENDPOINT'), EMBEDDING_DEPLOYMENT)
+    return get_embedding_client(openai_url, os.environ.get('AZURE_OPENAI_API_KEY'), EMBEDDING_DEPLOYMENT,
+                                EMBEDDING_DIMENSIONS)
+
 def get_embedding(text):
     """
-    Get sentence embedding using the Azure OpenAI text-embedding-ada-002.
+    Get sentence embedding using the configured Azure OpenAI embedding deployment.
+    """
+    with span("openai.embedding"):
+        return current_embedding_client().embed_one(text)
+
+@st.cache_resource
+def get_search_cache():
+    """
+    In-process cache of query embeddings and top-k search results, invalidated when new rows are inserted.
     """
-    openai_url = os.environ.get('AZURE_OPENAI_ENDPOINT') + "/openai/deployments/text-embedding-ada-002/embeddings?api-version=2023-05-15"
-    response = requests.post(
-        openai_url,
-        headers={"api-key": os.environ.get('AZURE_OPENAI_API_KEY'), "Content-Type": "application/json"},
-        json={"input": [text]}
-    )
-    return response.json()['data'][0]['embedding']
+    return SearchCache()
 
 def generate_embeddings(df):
     """
-    Generate embeddings for the first 10 rows of the DataFrame.
+    Generate embeddings for the first 10 rows of the DataFrame, sending them in batched requests.
     """
-    df = df.head(10).copy()  
-    df.loc[:, "vector"] = df["combined"].apply(get_embedding)  
+    df = df.head(10).copy()
+    df["vector"] = current_embedding_client().embed(df["combined"].tolist())
     return df
 
 if uploaded_file is not None:
@@ -229,12 +337,12 @@ if uploaded_file is not None:
 st.subheader("Step 4: Upload Pre-Generated Embeddings")
 
 with st.expander("**Vector Embedding Storage in Azure SQL Database**"):
-    st.markdown("""
+    st.markdown(f"""
     Let's import **finefoodembeddings.csv** ([GitHub](https://github.com/Azure-Samples/azure-sql-db-vector-search/blob/main/Datasets/FineFoodEmbeddings.csv) / [Kaggle](https://www.kaggle.com/datasets/pookam90/fine-food-reviews-with-embeddings?resource=download)) which contains embeddings for the entire dataset calculated in the same manner as above, directly to the SQL table      
 
-    We will insert our vectors into the SQL Table now. The table embeddings has a column called **vector** which is vector(1536) type.
+    We will insert our vectors into the SQL Table now. The table embeddings has a column called **vector** which is {VECTOR_CONFIG.sql_type.lower()} type.
 
-    We will pass the vectors by converting a JSON array to a compact **binary** representation of a vector. Vectors are stored in an efficient binary format that also enables usage of dedicated CPU vector processing extensions like SIMD and AVX.       
+    We will pass the vectors in their compact native **binary** representation (a small header followed by the {VECTOR_CONFIG.element_type} values) instead of JSON text. Vectors are stored in an efficient binary format that also enables usage of dedicated CPU vector processing extensions like SIMD and AVX.       
     """)
 
 
@@ -242,48 +350,61 @@ with st.expander("**Vector Embedding Storage in Azure SQL Database**"):
 uploaded_embeddings_file = st.file_uploader("Upload the CSV file with pre-generated embeddings", type="csv")
 
 if uploaded_embeddings_file is not None:
-    embeddings_df = pd.read_csv(uploaded_embeddings_file)
+    # Only the first rows are read for the preview; the full file is streamed on insert
+    preview_df = pd.read_csv(uploaded_embeddings_file, nrows=5)
     st.write("Preview of Uploaded Embeddings Dataset:")
-    st.dataframe(embeddings_df.head())  # Keep preview small for performance
-
-    # Ensure the vector column is properly deserialized into a list of numeric values
-    embeddings_df['vector'] = embeddings_df['vector'].apply(json.loads)
-
-    # ✅ Pre-serialize vectors once (avoid doing inside loop)
-    embeddings_df['vector'] = embeddings_df['vector'].apply(json.dumps)
-
-    # ✅ Prepare data as a list of tuples using zip (faster than iterrows)
-    data_to_insert = list(zip(
-        embeddings_df['Id'],
-        embeddings_df['ProductId'],
-        embeddings_df['UserId'],
-        embeddings_df['Score'],
-        embeddings_df['Summary'],
-        embeddings_df['Text'],
-        embeddings_df['combined'],
-        embeddings_df['vector']
-    ))
+    st.dataframe(preview_df)  # Keep preview small for performance
+
+    def vector_payloads(vectors):
+        # The full vector, plus its short prefix when the table has a prefix column
+        if VECTOR_CONFIG.prefix_dimensions:
+            return VECTOR_CONFIG.encode_many(vectors), VECTOR_CONFIG.encode_prefix_many(vectors)
+        return (VECTOR_CONFIG.encode_many(vectors),)
+
+    def build_rows(frame, vectors):
+        # ✅ Vectors are parsed once into float32 and encoded into the native binary vector format
+        return zip(
+            frame['Id'],
+            frame['ProductId'],
+            frame['UserId'],
+            frame['Score'],
+            frame['Summary'],
+            frame['Text'],
+            frame['combined'],
+            *vector_payloads(vectors)
+        )
 
     # Insert embeddings into the database
     if st.button("Insert Pre-Generated Embeddings into Database"):
         try:
-            conn = get_mssql_connection()
-            cursor = conn.cursor()
-            cursor.fast_executemany = True  # Enable fast execution for batch insertion
-
-            query = """
-            INSERT INTO embeddings (Id, ProductId, UserId, score, summary, text, combined, vector)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CAST(CAST(? AS VARCHAR(MAX)) AS VECTOR(1536)))
-            """
-
-            # ✅ Insert in chunks for better memory handling
-            batch_size = 1000
-            for i in range(0, len(data_to_insert), batch_size):
-                cursor.executemany(query, data_to_insert[i:i+batch_size])
-
-            conn.commit()
-            conn.close()
-            st.success("Pre-generated embeddings inserted into the database successfully!")
+            if VECTOR_CONFIG.prefix_dimensions:
+                query = f"""
+                INSERT INTO embeddings (Id, ProductId, UserId, score, summary, text, combined, vector, VectorPrefix)
+                VALUES (?, ?, ?, ?, ?, ?, ?, {VECTOR_CONFIG.parameter()}, {VECTOR_CONFIG.prefix_parameter()})
+                """
+            else:
+                query = f"""
+                INSERT INTO embeddings (Id, ProductId, UserId, score, summary, text, combined, vector)
+                VALUES (?, ?, ?, ?, ?, ?, ?, {VECTOR_CONFIG.parameter()})
+                """
+
+            # ✅ Stream the CSV in chunks: parsing and inserting overlap and memory use stays flat
+            # regardless of the file size. Rows are inserted in committed batches of 1000.
+            uploaded_embeddings_file.seek(0)
+            progress_text = st.empty()
+            # The connection goes back to the pool even when the upload fails
+            with get_mssql_connection() as conn:
+                result = stream_csv_to_table(
+                    uploaded_embeddings_file, conn, query, build_rows,
+                    vector_column='vector', chunksize=5000, batch_size=1000,
+                    # Vectors shorter than the configured column cannot be stored; longer ones are truncated
+                    min_dimensions=VECTOR_CONFIG.dimensions,
+                    progress=lambda r: progress_text.write(f"Inserted {r.rows_inserted} rows ({r.rows_per_second:.0f} rows/s)")
+                )
+            get_search_cache().invalidate('embeddings')
+            if result.errors:
+                st.error(f"Some batches failed to insert: {result.errors}")
+            st.success(f"{result.rows_inserted} pre-generated embeddings inserted into the database ({result.rows_per_second:.0f} rows/s).")
         except Exception as e:
             st.error(f"An error occurred: {e}")
 
@@ -309,9 +430,26 @@ Then we can use that vector to calculate the **cosine distance** against all the
             ORDER BY Distance;
             """)
 
+# Vector search backends
+SQL_BACKEND = "Azure SQL (VECTOR_DISTANCE)"
+LOCAL_EXACT_BACKEND = "Local exact search (numpy)"
+LOCAL_ANN_BACKEND = "Local ANN graph index"
+LOCAL_QUANTIZED_BACKEND = "Local int8 scan + exact rescoring"
+SQL_TWO_STAGE_BACKEND = "Azure SQL two-stage (prefix + full rerank)"
+SEARCH_BACKENDS = [SQL_BACKEND, LOCAL_EXACT_BACKEND, LOCAL_ANN_BACKEND, LOCAL_QUANTIZED_BACKEND]
+if VECTOR_CONFIG.prefix_dimensions:
+    SEARCH_BACKENDS.insert(1, SQL_TWO_STAGE_BACKEND)
+# Candidates fetched over the prefix column per result, before the full-vector rerank
+TWO_STAGE_OVERSAMPLE = 4
+ANN_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ann_index', 'embeddings')
+
 # Input fields
 user_query = st.text_input("Enter your search query")
 num_results = st.number_input("Number of results to retrieve", min_value=1, max_value=100, value=5)
+search_backend = st.radio("Search backend", SEARCH_BACKENDS, horizontal=True,
+                          help="The local backends load the table's vectors into memory once and search them without a query per search: "
+                               "exactly with numpy, approximately with a graph index saved next to the app, or by scanning "
+                               "int8 codes (4x smaller) and rescoring the best candidates exactly.")
 
 # Clear session state button
 if st.button("Clear Results"):
@@ -321,22 +459,75 @@ if st.button("Clear Results"):
     st.success("Previous search results cleared!")
 
 # Vector search function
-def vector_search_sql(query, num_results):
+def run_vector_search(user_query_embedding, num_results):
     conn = get_mssql_connection()
     cursor = conn.cursor()
-    user_query_embedding = get_embedding(query)
-    user_query_embedding_json = json.dumps(user_query_embedding)
-    sql_similarity_search = """
+    sql_similarity_search = f"""
     SELECT TOP(?) ProductId, Summary, text,
-           1 - vector_distance('cosine', CAST(CAST(? AS VARCHAR(MAX)) AS VECTOR(1536)), [vector]) AS similarity_score
+           1 - vector_distance('cosine', {VECTOR_CONFIG.parameter()}, [vector]) AS similarity_score
     FROM dbo.embeddings
     ORDER BY similarity_score DESC
     """
-    cursor.execute(sql_similarity_search, (num_results, user_query_embedding_json))
-    results = cursor.fetchall()
+    with span("sql.query"):
+        cursor.execute(sql_similarity_search, (num_results, VECTOR_CONFIG.encode(user_query_embedding)))
+    with span("sql.fetch"):
+        results = cursor.fetchall()
+    conn.close()
+    return results
+
+def run_two_stage_vector_search(user_query_embedding, num_results):
+    # Candidates come from the short [VectorPrefix] column and are reranked with the full vector
+    conn = get_mssql_connection()
+    cursor = conn.cursor()
+    sql = two_stage_search_sql(VECTOR_CONFIG, 'dbo.embeddings', ['ProductId', 'Summary', 'text'], '[vector]', '[VectorPrefix]')
+    with span("sql.query"):
+        cursor.execute(sql, VECTOR_CONFIG.encode_prefix(user_query_embedding), VECTOR_CONFIG.encode(user_query_embedding),
+                       num_results, num_results * TWO_STAGE_OVERSAMPLE)
+    with span("sql.fetch"):
+        results = [tuple(row[:-1]) + (1 - row[-1],) for row in cursor.fetchall()]
     conn.close()
     return results
 
+@st.cache_resource(max_entries=2)
+def get_local_table(sql_connection_string, entra_connection_string, table_version, backend):
+    # In-memory copy of dbo.embeddings, reloaded once new rows were inserted (the table version changes).
+    # The ANN graph is saved next to the app and reused while the table's row count and highest row_version are unchanged
+    with get_connection_pool(sql_connection_string, entra_connection_string).connection() as conn:
+        columns = ['ProductId', 'Summary', 'text']
+        if backend == LOCAL_ANN_BACKEND:
+            return load_graph_table(conn, ANN_INDEX_PATH, 'dbo.embeddings', columns, '[vector]', VECTOR_CONFIG.dimensions,
+                                    VECTOR_CONFIG.element_type, dtype=VECTOR_CONFIG.dtype)
+        index_factory = QuantizedIndex if backend == LOCAL_QUANTIZED_BACKEND else ExactIndex
+        return LocalTable.load(conn, 'dbo.embeddings', columns, '[vector]', VECTOR_CONFIG.dimensions,
+                               VECTOR_CONFIG.element_type, dtype=VECTOR_CONFIG.dtype, index_factory=index_factory)
+
+def run_local_vector_search(user_query_embedding, num_results, backend):
+    with span("local.load"):
+        table = get_local_table(os.getenv('SQL_CONNECTION_STRING'), os.getenv('ENTRAID_CONNECTION_STRING'),
+                                get_search_cache().version('embeddings'), backend)
+    with span("local.search"):
+        return [row + (1 - distance,) for row, distance in table.search(user_query_embedding, num_results)]
+
+def query_embedding(query):
+    # Embedded once per query text and embedding model, shortened to the configured dimensions like the stored vectors
+    with span("query_embedding"):
+        embedding = get_search_cache().embedding(query, lambda: get_embedding(query), model=EMBEDDING_DEPLOYMENT,
+                                                 dimensions=current_embedding_client().dimensions)
+        return VECTOR_CONFIG.truncate(embedding)
+
+def vector_search_sql(query, num_results, backend=SQL_BACKEND):
+    # The query is embedded once, and a cached top-k result also serves any smaller num_results
+    cache = get_search_cache()
+    user_query_embedding = query_embedding(query)
+    if backend == SQL_BACKEND:
+        run = run_vector_search
+    elif backend == SQL_TWO_STAGE_BACKEND:
+        run = run_two_stage_vector_search
+    else:
+        run = lambda embedding, k: run_local_vector_search(embedding, k, backend)
+    with span("search", backend=backend):
+        return cache.search(user_query_embedding, num_results, lambda k: run(user_query_embedding, k), table='embeddings', backend=backend)
+
 # Run search only on button click
 if st.button("Vector Search"):
     if user_query:
@@ -347,10 +538,12 @@ if st.button("Vector Search"):
         ):
             st.session_state.pop('search_results', None)
 
-        search_results = vector_search_sql(user_query, num_results)
+        with get_tracer().trace("vector_search", record=st.session_state.show_timings, backend=search_backend) as request:
+            search_results = vector_search_sql(user_query, num_results, search_backend)
         st.session_state['search_results'] = search_results
         st.session_state['last_user_query'] = user_query
         st.session_state['last_num_results'] = num_results
+        st.session_state['last_trace'] = request.trace
     else:
         st.error("Please enter a search query.")
 
@@ -364,6 +557,9 @@ if st.session_state.get('search_results') is not None:
         st.write(f"**Similarity Score:** {result[3]:.4f}")
         st.write("---")
 
+if st.session_state.show_timings and st.session_state.get('last_trace') is not None:
+    show_timing_breakdown(st.session_state['last_trace'])
+
 # ---------------------------
 # Section 6: Augment LLM Generation
 # ---------------------------
@@ -391,15 +587,24 @@ We are passing the results of the `vector_search_sql` function to the model and
     - Add emojis for ranking (🔥 for top pick, ⭐ for others).
             """)
     
-# Azure OpenAI client
-client = AzureOpenAI(
-    api_key=os.getenv('AZURE_OPENAI_API_KEY'),
-    api_version="2023-05-15",
-    azure_endpoint=os.getenv('AZURE_OPENAI_ENDPOINT')
+@st.cache_resource
+def get_openai_client(endpoint, api_key):
+    """
+    One Azure OpenAI client (and its HTTP connection pool) per endpoint and key, created once the
+    configuration is entered. Retries are left to the scheduler below, which honors Retry-After.
+    """
+    return AzureOpenAI(api_key=api_key, api_version="2023-05-15", azure_endpoint=endpoint, max_retries=0)
+
+# Search results are sent to the model best first, without near-duplicate reviews (the dataset repeats
+# many texts under several products), in a compact format capped at CONTEXT_TOKEN_BUDGET tokens
+CONTEXT_BUILDER = ContextBuilder(
+    [("Product ID", "product_id"), ("Summary", "summary"), ("Similarity Score", "similarity_score")], "text",
+    text_label="Review", max_tokens=int(os.environ.get('CONTEXT_TOKEN_BUDGET', 3000)), max_item_tokens=400
 )
 
-def generate_completion(search_results, user_query):
-    system_prompt = '''
+CHAT_DEPLOYMENT = 'gpt-4.1'
+
+SYSTEM_PROMPT = '''
     You are an intelligent & funny assistant who will exclusively answer based on the data provided in the `search_results`:
     - Use the information from `search_results` to generate your responses. If the data is not a perfect match for the user's query, use your best judgment to provide helpful suggestions and include the following format:
       Product ID: {product_id}
@@ -414,7 +619,31 @@ def generate_completion(search_results, user_query):
     - Add emojis for ranking (🔥 for top pick, ⭐ for others).
     '''
 
-    messages = [{"role": "system", "content": system_prompt}]
+# Cached answers are only reused for the same deployment, system prompt and context budget
+ANSWER_SCOPE = answer_scope(CHAT_DEPLOYMENT, SYSTEM_PROMPT, CONTEXT_BUILDER.max_tokens, CONTEXT_BUILDER.max_item_tokens)
+
+@st.cache_resource
+def get_chat_scheduler(endpoint):
+    """
+    Rate-limit-aware scheduler shared by all chat completion calls against the endpoint.
+    """
+    return AdaptiveScheduler()
+
+@st.cache_resource
+def get_answer_cache():
+    """
+    Answers by question embedding: a question within ANSWER_CACHE_THRESHOLD cosine similarity of an
+    earlier one, whose search returned the same reviews, gets the earlier answer for ANSWER_CACHE_TTL seconds.
+    """
+    return AnswerCache(threshold=float(os.environ.get('ANSWER_CACHE_THRESHOLD', 0.95)),
+                       ttl=float(os.environ.get('ANSWER_CACHE_TTL', 3600)))
+
+def generate_completion(search_results, user_query):
+    """
+    Start a streamed completion; iterate the returned CompletionStream (e.g. with st.write_stream)
+    to get the answer as it is generated, then read its time to first token and tokens/s in `stats`.
+    """
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
     result_list = [
         {
             "product_id": r[0],
@@ -424,35 +653,67 @@ def generate_completion(search_results, user_query):
         }
         for r in search_results
     ]
-    messages.append({"role": "system", "content": f"{result_list}"})
+    with span("context.pack") as pack_span:
+        context = CONTEXT_BUILDER.build(result_list)
+        pack_span.set(rows=len(context.used), tokens=context.tokens, duplicates=context.duplicates)
+    messages.append({"role": "system", "content": context.text})
     messages.append({"role": "user", "content": user_query})
 
-    response = client.chat.completions.create(
-        model='gpt-4.1',
-        messages=messages,
-        temperature=0
-    )
-    return response.model_dump()
+    client = get_openai_client(os.getenv('AZURE_OPENAI_ENDPOINT'), os.getenv('AZURE_OPENAI_API_KEY'))
+    start = time.perf_counter()
+    # The call returns once the response headers arrive; a 429 is still raised here and retried
+    with span("openai.chat_completion"):
+        chunks = get_chat_scheduler(os.getenv('AZURE_OPENAI_ENDPOINT')).run(
+            lambda: as_throttled(lambda: client.chat.completions.create(
+                model=CHAT_DEPLOYMENT,
+                messages=messages,
+                temperature=0,
+                stream=True
+            )),
+            tokens=sum(estimate_tokens(m["content"]) for m in messages)
+        )
+    return CompletionStream(chunks, start)
 
 if st.button("Generate Response"):
     if user_query:
         try:
-            # Use cached results if query unchanged
-            if (
-                st.session_state.get('search_results') is not None and
-                st.session_state.get('last_user_query') == user_query and
-                st.session_state.get('last_num_results') == num_results
-            ):
-                search_results = st.session_state['search_results']
+            with get_tracer().trace("generate_response", record=st.session_state.show_timings, backend=search_backend) as request:
+                # Use cached results if the query, result count and search backend are unchanged
+                if (
+                    st.session_state.get('search_results') is not None and
+                    st.session_state.get('last_user_query') == user_query and
+                    st.session_state.get('last_num_results') == num_results and
+                    st.session_state.get('last_search_backend') == search_backend
+                ):
+                    search_results = st.session_state['search_results']
+                else:
+                    search_results = vector_search_sql(user_query, num_results, search_backend)
+                    st.session_state['search_results'] = search_results
+                    st.session_state['last_user_query'] = user_query
+                    st.session_state['last_num_results'] = num_results
+                    st.session_state['last_search_backend'] = search_backend
+
+                # Product, summary and review identify a result; the answer is only reused for the same ones
+                answer_key = (query_embedding(user_query), result_ids(search_results, (0, 1, 2)))
+                cached = None
+                if st.session_state.use_answer_cache:
+                    with span("answer_cache.lookup"):
+                        cached = get_answer_cache().lookup(*answer_key, scope=ANSWER_SCOPE)
+                st.write("### Generated Response:")
+                if cached is not None:
+                    st.write(cached.answer)
+                else:
+                    completion = generate_completion(search_results, user_query)
+                    # Tokens are rendered as they arrive instead of after the whole answer
+                    with span("openai.stream"):
+                        st.write_stream(completion)
+                    get_answer_cache().store(*answer_key, completion.text, scope=ANSWER_SCOPE, question=user_query)
+            if cached is not None:
+                st.caption(f"Cached answer to \"{cached.question}\" (similarity {cached.similarity:.3f}, {cached.age:.0f} s ago)")
             else:
-                search_results = vector_search_sql(user_query, num_results)
-                st.session_state['search_results'] = search_results
-                st.session_state['last_user_query'] = user_query
-                st.session_state['last_num_results'] = num_results
-
-            completion_response = generate_completion(search_results, user_query)
-            st.write("### Generated Response:")
-            st.write(completion_response['choices'][0]['message']['content'])
+                st.caption(completion.stats.describe())
+            if request.trace is not None:
+                show_timing_breakdown(request.trace)
         except Exception as e:
             st.error(f"An error occurred: {e}")
     else:
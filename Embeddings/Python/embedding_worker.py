@@ -0,0 +1,55 @@
+"""
+Change-feed worker for ../T-SQL/05-queue-embeddings-for-worker.sql: polls the queue of
+changed dbo.sample_text rows, embeds their content in large batches of concurrent requests
+with sqlvector.EmbeddingClient and writes the vectors back in bulk with
+sqlvector.changefeed.EmbeddingWorker, so the embedding calls stay out of the writing
+transaction.
+
+Environment: MSSQL (ODBC connection string), AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY,
+and optionally EMBEDDING_DEPLOYMENT (default text-embedding-3-small), WORKER_BATCH_SIZE
+(default 500) and WORKER_POLL_INTERVAL (seconds, default 5). Pass --once to drain the
+queue and exit instead of polling.
+"""
+import os
+import sys
+import pyodbc
+from azure import identity
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Shared'))
+from sqlvector import EmbeddingClient, embeddings_url
+from sqlvector.auth import AccessTokenProvider
+from sqlvector.changefeed import EmbeddingWorker, SqlChangeQueue
+from sqlvector.dimensions import VectorConfig
+
+load_dotenv()
+
+# dbo.sample_text.embedding is a vector(1536)
+VECTOR_CONFIG = VectorConfig(1536)
+
+def get_connection():
+    connection_string = os.environ["MSSQL"]
+    if "uid" in connection_string.lower():
+        return pyodbc.connect(connection_string)
+    provider = AccessTokenProvider(identity.DefaultAzureCredential(exclude_interactive_browser_credential=False))
+    return pyodbc.connect(connection_string, attrs_before=provider.attrs_before())
+
+if __name__ == '__main__':
+    deployment = os.environ.get("EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
+    client = EmbeddingClient(embeddings_url(os.environ["AZURE_OPENAI_ENDPOINT"], deployment),
+                             os.environ["AZURE_OPENAI_API_KEY"], max_batch_items=64, max_workers=4)
+    conn = get_connection()
+    queue = SqlChangeQueue(conn, 'dbo.sample_text', 'dbo.sample_text_embedding_queue', VECTOR_CONFIG)
+    worker = EmbeddingWorker(queue, client.embed, batch_size=int(os.environ.get("WORKER_BATCH_SIZE", 500)),
+                             poll_interval=float(os.environ.get("WORKER_POLL_INTERVAL", 5)))
+
+    print(f'{queue.pending()} rows queued, embedding with {deployment}...')
+    try:
+        stats = worker.run(until_empty='--once' in sys.argv[1:])
+    except KeyboardInterrupt:
+        stats = worker.stats
+    finally:
+        conn.close()
+    print(stats)
+    for error in stats.errors:
+        print(f'Batch failed: {error}')
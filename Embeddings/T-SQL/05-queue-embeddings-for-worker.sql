@@ -0,0 +1,85 @@
+/*
+	Alternative to 04-update-embeddings-with-trigger.sql: the trigger only queues the
+	ids of the rows whose "content" changed, in one set-based statement, and the
+	embeddings are computed outside of the transaction by the Python worker in
+	../Python/embedding_worker.py, in large batches, and written back in bulk
+*/
+drop table if exists dbo.sample_text_embedding_queue;
+drop table if exists dbo.sample_text;
+create table dbo.sample_text
+(
+	id int identity not null primary key,
+	content nvarchar(max) null,
+	embedding vector(1536) null,
+	[vectors_update_info] nvarchar(max) null
+)
+go
+
+/*
+	One row per changed id: "version" is bumped on every change, so the worker can tell
+	whether the content changed again while it was computing the embedding
+*/
+create table dbo.sample_text_embedding_queue
+(
+	id int not null primary key,
+	[version] bigint not null default(1),
+	enqueued_at datetime2 not null default(sysutcdatetime()),
+	attempts int not null default(0),
+	claimed_until datetime2 null,
+	last_error nvarchar(max) null
+)
+go
+
+create index ix_sample_text_embedding_queue_enqueued_at on dbo.sample_text_embedding_queue (enqueued_at)
+go
+
+/*
+	Queue the changed rows; no call to the embedding endpoint happens in the transaction
+*/
+create or alter trigger sample_text_queue_embeddings
+on dbo.sample_text
+after insert, update
+as
+set nocount on;
+
+if not(update(content)) return;
+
+/*
+	update(content) is true whenever the statement sets "content", even to the same
+	value: compare the old and new values and queue only the rows that really changed.
+	The comparison is on the bytes, so changes in case or trailing spaces count, and
+	"is distinct from" treats NULL as a value
+*/
+merge dbo.sample_text_embedding_queue with (holdlock) as q
+using (
+	select i.id
+	from inserted as i
+	left join deleted as d on d.id = i.id
+	where d.id is null
+	or cast(i.content as varbinary(max)) is distinct from cast(d.content as varbinary(max))
+) as i on q.id = i.id
+when matched then
+	update set [version] = q.[version] + 1, attempts = 0, last_error = null
+when not matched then
+	insert (id) values (i.id);
+go
+
+/*
+	Test trigger: the rows are queued, run the worker to compute their embeddings
+*/
+insert into dbo.sample_text (content) values
+('The foundation series from Isaac Asimov'),
+('The Hitchhiker''s Guide to the Galaxy from Douglas Adams')
+go
+
+select * from dbo.sample_text_embedding_queue
+go
+
+/*
+	Setting "content" to the value it already has queues nothing new
+*/
+update dbo.sample_text set content = content
+go
+
+select * from dbo.sample_text_embedding_queue
+go
@@ -5,6 +5,7 @@ create table dbo.documents
 (
     id int constraint pk__documents primary key,
     content nvarchar(max),
+    content_hash char(64),
     embedding vector(384)
 )
 
@@ -1,16 +1,23 @@
 import os
+import sys
 import pyodbc
 import logging
-import json
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
-from utilities import get_mssql_connection
+from utilities import get_connection_pool
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared'))
+from sqlvector.dimensions import VectorConfig
+from sqlvector.hybrid import HybridSearch, SqlFullTextLeg, SqlVectorLeg
+from sqlvector.incremental import IncrementalIndexer, SqlIndexStore
 
 load_dotenv()
 
+# multi-qa-MiniLM-L6-cos-v1 returns 384-dimensional vectors; every SQL type and payload below derives from this
+VECTOR_CONFIG = VectorConfig(384)
+
 if __name__ == '__main__':
     print('Initializing sample...')
-    print('Getting embeddings...')    
     sentences = [
         'The dog is barking',
         'The cat is purring',
@@ -18,34 +25,30 @@ if __name__ == '__main__':
         'The bear roars'
     ]
     model = SentenceTransformer('multi-qa-MiniLM-L6-cos-v1') # returns a 384-dimensional vector
-    embeddings = model.encode(sentences)
 
-    conn = get_mssql_connection()
+    # Connections come from a process-wide pool and go back to it at the end of each block
+    pool = get_connection_pool()
 
-    print('Cleaning up the database...')
-    try:
-        cursor = conn.cursor()    
-        cursor.execute("DELETE FROM dbo.documents;")
-        cursor.commit();        
-    finally:
-        cursor.close()
+    print('Synchronizing documents and embeddings with the database...')
+    with pool.connection() as conn:
+        # dbo.documents created by an earlier version of 00-setup-database.sql has no content_hash column:
+        # add it, its rows are then re-embedded once
+        cursor = conn.cursor()
+        try:
+            cursor.execute("IF COL_LENGTH('dbo.documents', 'content_hash') IS NULL ALTER TABLE dbo.documents ADD content_hash CHAR(64) NULL")
+            conn.commit()
+        finally:
+            cursor.close()
 
-    print('Saving documents and embeddings in the database...')    
-    try:
-        cursor = conn.cursor()  
-        
-        for id, (content, embedding) in enumerate(zip(sentences, embeddings)):
-            cursor.execute(f"""
-                INSERT INTO dbo.documents (id, content, embedding) VALUES (?, ?, CAST(? AS VECTOR(384)));
-            """,
-            id,
-            content, 
-            json.dumps(embedding.tolist())
-            )
-
-        cursor.commit()
-    finally:
-        cursor.close()
+        # Each row stores a hash of its content: only new or changed documents are embedded and merged
+        # into dbo.documents (one MERGE from a temp table, vectors in their native binary format), and
+        # rows whose id is no longer in the list are deleted; a re-run with the same sentences writes nothing
+        store = SqlIndexStore(conn, 'dbo.documents', VECTOR_CONFIG, key='id', document=None, text='content',
+                              hash='content_hash', vector='embedding', key_type='INT')
+        indexer = IncrementalIndexer(store, embed=lambda texts: model.encode(texts))
+        sync = indexer.sync([(id, None, content) for id, content in enumerate(sentences)])
+    print(f'{sync.inserted} inserted, {sync.updated} updated, {sync.deleted} deleted, {sync.unchanged} unchanged '
+          f'({sync.embedded} embedded, {sync.elapsed * 1000:.0f} ms)')
 
     print('Searching for similar documents...')
     print('Getting embeddings...')    
@@ -54,76 +57,33 @@ if __name__ == '__main__':
     
     print(f'Querying database for "{query}"...') 
     k = 5  
+    # The full-text (BM25) and vector legs run as separate queries on pooled connections, concurrently;
+    # the vector leg uses VECTOR_SEARCH if dbo.documents has a vector index, VECTOR_DISTANCE otherwise.
+    # The two rankings are then combined with Reciprocal Rank Fusion (RRF) in Python
+    search = HybridSearch([
+        SqlFullTextLeg(pool, 'dbo.documents', 'id', '*'),
+        SqlVectorLeg(pool, 'dbo.documents', 'id', 'embedding', VECTOR_CONFIG),
+    ], fusion='rrf', rrf_k=k, candidates=k)
     try:
-        cursor = conn.cursor()  
-        
-        results  = cursor.execute(f"""
-            DECLARE @k INT = ?;
-            DECLARE @q NVARCHAR(1000) = ?;
-            DECLARE @v VECTOR(384) = CAST(? AS VECTOR(384));
-            WITH keyword_search AS (
-                SELECT TOP(@k)
-                    id, 
-                    RANK() OVER (ORDER BY ft_rank DESC) AS rank
-                FROM
-                    (
-                        SELECT TOP(@k)
-                            id,
-                            ftt.[RANK] AS ft_rank
-                        FROM 
-                            dbo.documents 
-                        INNER JOIN 
-                            FREETEXTTABLE(dbo.documents, *, @q) AS ftt ON dbo.documents.id = ftt.[KEY]
-                        ORDER BY
-                            ft_rank DESC
-                    ) AS freetext_documents
-            ),
-            semantic_search AS
-            (
-                SELECT TOP(@k)
-                    id, 
-                    RANK() OVER (ORDER BY cosine_distance) AS rank
-                FROM
-                    (
-                        SELECT 
-                            id, 
-                            VECTOR_DISTANCE('cosine', @v, embedding) AS cosine_distance
-                        FROM 
-                            dbo.documents
-                    ) AS similar_documents
-            ),
-            result AS (
-                SELECT TOP(@k)
-                    COALESCE(ss.id, ks.id) AS id,
-                    ss.rank AS semantic_rank,
-                    ks.rank AS keyword_rank,
-                    COALESCE(1.0 / (@k + ss.rank), 0.0) +
-                    COALESCE(1.0 / (@k + ks.rank), 0.0) AS score -- Reciprocal Rank Fusion (RRF) 
-                FROM
-                    semantic_search ss
-                FULL OUTER JOIN
-                    keyword_search ks ON ss.id = ks.id
-                ORDER BY 
-                    score DESC
-            )   
-            SELECT
-                d.id,
-                semantic_rank,
-                keyword_rank,
-                score,
-                content
-            FROM
-                result AS r
-            INNER JOIN
-                dbo.documents AS d ON r.id = d.id
-            """,
-            k,
-            query, 
-            json.dumps(embedding.tolist()),        
-        )
+        result = search.search(query, embedding, k)
+    finally:
+        search.close()
 
-        for row in results:
-            print(f'Document: {row[0]} (content: {row[4]}) -> RRF score: {row[3]:0.4} (Semantic Rank: {row[1]}, Keyword Rank: {row[2]})')
+    for name, error in result.errors.items():
+        print(f'{name} search failed: {error}')
+    print('Leg latency: ' + ', '.join(f'{name} {seconds * 1000:.1f} ms' for name, seconds in result.latencies.items())
+          + f' (total {result.total * 1000:.1f} ms)')
 
-    finally:
-        cursor.close()
+    contents = {}
+    ids = [row_id for row_id, _, _ in result.results]
+    if ids:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT id, content FROM dbo.documents WHERE id IN ({', '.join('?' * len(ids))})", *ids)
+                contents = dict(cursor.fetchall())
+            finally:
+                cursor.close()
+
+    for row_id, score, ranks in result.results:
+        print(f'Document: {row_id} (content: {contents.get(row_id)}) -> RRF score: {score:0.4} (Semantic Rank: {ranks.get("vector")}, Keyword Rank: {ranks.get("fulltext")})')
@@ -1,10 +1,28 @@
 import os
+import sys
 import pyodbc
-import struct
 import logging
+import threading
 from azure import identity
 
-def get_mssql_connection():
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared'))
+from sqlvector.pool import ConnectionPool
+from sqlvector.auth import AccessTokenProvider
+
+_pool = None
+_token_provider = None
+_pool_lock = threading.Lock()
+
+def get_token_provider(credential=None):
+    # The credential can be injected (e.g. sqlvector.testing.FakeCredential) to run offline
+    global _token_provider
+    with _pool_lock:
+        if _token_provider is None:
+            credential = credential or identity.DefaultAzureCredential(exclude_interactive_browser_credential=False)
+            _token_provider = AccessTokenProvider(credential)
+        return _token_provider
+
+def open_mssql_connection():
     print('Getting MSSQL connection')
     mssql_connection_string = os.environ["MSSQL"]    
     if any(s in mssql_connection_string.lower() for s in ["uid"]):
@@ -12,14 +30,20 @@ def get_mssql_connection():
         attrs_before = None
     else:
         print(' - Getting EntraID credentials...')    
-        mssql_connection_string = os.environ["MSSQL"]    
-        credential = identity.DefaultAzureCredential(exclude_interactive_browser_credential=False)    
-        token_bytes = credential.get_token("https://database.windows.net/.default").token.encode("UTF-16-LE")    
-        token_struct = struct.pack(f'<I{len(token_bytes)}s', len(token_bytes), token_bytes)
-        SQL_COPT_SS_ACCESS_TOKEN = 1256  # This connection option is defined by microsoft in msodbcsql.h        
-        attrs_before = {SQL_COPT_SS_ACCESS_TOKEN: token_struct}
+        attrs_before = get_token_provider().attrs_before()
 
     print(' - Connecting to MSSQL...')    
     conn = pyodbc.connect(mssql_connection_string, attrs_before=attrs_before)
 
-    return conn
\ No newline at end of file
+    return conn
+
+def get_connection_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(open_mssql_connection, max_size=5)
+        return _pool
+
+def get_mssql_connection():
+    # Connections come from a process-wide pool; conn.close() returns them to it
+    return get_connection_pool().acquire()
@@ -0,0 +1,75 @@
+"""
+Python version of 02-rerank.sql: vector search oversamples the candidates, then the
+Cohere re-ranker deployed in Azure AI Foundry reorders them with sqlvector.rerank.Reranker.
+Candidates are sent in concurrent batches, truncated to a token budget; if the re-ranker
+does not answer within RERANK_TIMEOUT seconds the vector search order is kept.
+
+Environment: MSSQL (ODBC connection string), RERANK_URL, RERANK_API_KEY, and optionally
+RERANK_MODEL, RERANK_TIMEOUT.
+"""
+import os
+import sys
+import pyodbc
+from azure import identity
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared'))
+from sqlvector.auth import AccessTokenProvider
+from sqlvector.rerank import CohereReranker, Reranker
+
+load_dotenv()
+
+QUERY = 'cozy bungalow with original hardwood and charm'
+K = 10
+
+def get_connection():
+    connection_string = os.environ["MSSQL"]
+    if "uid" in connection_string.lower():
+        return pyodbc.connect(connection_string)
+    provider = AccessTokenProvider(identity.DefaultAzureCredential(exclude_interactive_browser_credential=False))
+    return pyodbc.connect(connection_string, attrs_before=provider.attrs_before())
+
+def vector_search(conn, phrase, top_n):
+    cursor = conn.cursor()
+    cursor.execute("""
+    DECLARE @search_vector VECTOR(1536);
+    SELECT @search_vector = search_vector FROM search_phrases WHERE search_phrase = ?;
+
+    SELECT TOP (?) WITH APPROXIMATE
+        t.property_id,
+        t.listing_description,
+        s.distance AS vector_distance
+    FROM VECTOR_SEARCH(
+        TABLE = properties AS t,
+        COLUMN = description_vector,
+        SIMILAR_TO = @search_vector,
+        METRIC = 'cosine'
+    ) AS s
+    ORDER BY s.distance;
+    """, phrase, top_n)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+if __name__ == '__main__':
+    scorer = CohereReranker(os.environ["RERANK_URL"], os.environ["RERANK_API_KEY"],
+                            model=os.environ.get("RERANK_MODEL", "Cohere-rerank-v4.0-fast"))
+    reranker = Reranker(scorer, oversample=5, batch_size=10, max_document_tokens=256,
+                        timeout=float(os.environ.get("RERANK_TIMEOUT", 5)))
+
+    conn = get_connection()
+    print(f'Vector search for "{QUERY}" (top {reranker.candidates(K)} candidates)...')
+    rows = vector_search(conn, QUERY, reranker.candidates(K))
+    conn.close()
+
+    # Same YAML-like document format as 02-rerank.sql, as recommended by Cohere for structured data
+    result = reranker.rerank(QUERY, rows, K, text=lambda row: f"Id: {row.property_id}\nContent: {row.listing_description}")
+    reranker.close()
+    print(result)
+
+    original = {row.property_id: position for position, row in enumerate(rows, start=1)}
+    scores = result.scores or [None] * len(result.items)
+    print('reranked  original  property_id  relevance  vector_distance')
+    for position, (row, score) in enumerate(zip(result.items, scores), start=1):
+        relevance = f'{score:9.4f}' if score is not None else '        -'
+        print(f'{position:8}  {original[row.property_id]:8}  {row.property_id:11}  {relevance}  {row.vector_distance:15.4f}')
@@ -0,0 +1,62 @@
+"""
+Build a GraphIndex over a synthetic clustered table and report queries per second
+against recall@10 for several search breadths, with ExactIndex as the ground truth.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.ann import GraphIndex
+from sqlvector.exact import ExactIndex, recall_at_k
+
+ROWS = 20_000
+DIMENSIONS = 384
+LATENT = 32
+CLUSTERS = 200
+QUERIES = 200
+K = 10
+
+
+def clustered(rng, n):
+    # Like real embeddings, the vectors vary along far fewer directions than they have dimensions
+    basis = np.random.default_rng(1).standard_normal((LATENT, DIMENSIONS), dtype=np.float32) / np.sqrt(LATENT)
+    centers = np.random.default_rng(2).standard_normal((CLUSTERS, LATENT), dtype=np.float32)
+    latent = centers[rng.integers(0, CLUSTERS, n)] + 0.5 * rng.standard_normal((n, LATENT), dtype=np.float32)
+    return 4 * latent @ basis + 0.05 * rng.standard_normal((n, DIMENSIONS), dtype=np.float32)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    vectors = clustered(rng, ROWS)
+    queries = clustered(rng, QUERIES)
+
+    exact = ExactIndex(vectors)
+    start = time.perf_counter()
+    for query in queries:
+        exact.search(query, K)
+    print(f'exact, one query at a time: {QUERIES / (time.perf_counter() - start):8.0f} QPS, recall@{K} 1.000')
+    expected, _ = exact.search(queries, K)
+
+    start = time.perf_counter()
+    index = GraphIndex(vectors[:-1000])
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    index.insert(vectors[-1000:])
+    insert = time.perf_counter() - start
+    print(f'graph build: {build:.1f} s for {ROWS - 1000} vectors, incremental insert of 1000: {insert:.1f} s')
+
+    with tempfile.TemporaryDirectory() as path:
+        index.save(path)
+        start = time.perf_counter()
+        index = GraphIndex.load(path, mmap=True)
+        print(f'memory-mapped load: {(time.perf_counter() - start) * 1000:.1f} ms')
+        for breadth in (10, 16, 32, 64, 128, 256):
+            start = time.perf_counter()
+            found, _ = index.search(queries, K, breadth=breadth)
+            qps = QUERIES / (time.perf_counter() - start)
+            print(f'graph, breadth {breadth:3d}       : {qps:8.0f} QPS, recall@{K} {recall_at_k(found, expected):.3f}')
+        del index, found  # release the memory maps before the directory is removed
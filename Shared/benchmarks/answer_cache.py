@@ -0,0 +1,64 @@
+"""
+AnswerCache on a synthetic stream of questions: each topic is asked many times in slightly
+different words (query embeddings close to the topic's), and its search returns the topic's
+rows. Reports, per similarity threshold, the share of completions saved, wrong answers
+served (a cached answer of another topic), and the lookup time; a completion is assumed
+to take COMPLETION_SECONDS.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.answer_cache import AnswerCache, result_ids
+
+DIMENSIONS = 1536
+TOPICS = 200
+QUESTIONS = 5_000
+PARAPHRASE_NOISE = 0.12
+NEIGHBOR_DISTANCE = 0.35
+COMPLETION_SECONDS = 4.0
+
+
+def questions(rng):
+    # Popular topics are asked more often (Zipf-like); every question is a paraphrase of its topic
+    topics = np.minimum(rng.zipf(1.3, QUESTIONS) - 1, TOPICS - 1)
+    centers = rng.standard_normal((TOPICS, DIMENSIONS), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    # Odd topics are related questions close to the previous topic (cosine ~0.94)
+    centers[1::2] = centers[0::2] + NEIGHBOR_DISTANCE * centers[1::2]
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    noise = rng.standard_normal((QUESTIONS, DIMENSIONS), dtype=np.float32)
+    noise *= PARAPHRASE_NOISE / np.linalg.norm(noise, axis=1, keepdims=True)
+    return topics, centers[topics] + noise
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    topics, embeddings = questions(rng)
+    rows = {t: [(f"P{t}-{i}", f"summary {t} {i}") for i in range(5)] for t in range(TOPICS)}
+    # Half of the related topics retrieve the same rows as their neighbor, so only the
+    # similarity threshold tells them apart; for the others the id check does
+    for t in range(1, TOPICS, 2):
+        if rng.random() < 0.5:
+            rows[t] = rows[t - 1]
+
+    for threshold in (0.90, 0.95, 0.98, 0.995):
+        cache = AnswerCache(threshold=threshold, ttl=None, max_entries=512)
+        wrong = 0
+        lookup = 0.0
+        for topic, embedding in zip(topics, embeddings):
+            ids = result_ids(rows[topic], (0, 1))
+            start = time.perf_counter()
+            hit = cache.lookup(embedding, ids)
+            lookup += time.perf_counter() - start
+            if hit is None:
+                cache.store(embedding, ids, f"answer about topic {topic}")
+            elif hit.answer != f"answer about topic {topic}":
+                wrong += 1
+        hits = cache.stats["hits"]
+        print(f'threshold {threshold:5.3f}: {hits / QUESTIONS:6.1%} of completions saved '
+              f'(~{hits * COMPLETION_SECONDS / 3600:4.1f} h of generation), {wrong} answers from another topic, '
+              f'{cache.stats["changed_results"]} similar with other rows, {lookup / QUESTIONS * 1e6:6.1f} us per lookup')
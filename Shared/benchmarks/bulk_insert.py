@@ -0,0 +1,50 @@
+"""
+Compare row-by-row inserts with BulkLoader.
+
+By default runs against SimulatedConnection, an ODBC stand-in with a fixed cost per
+round-trip. Set the MSSQL environment variable to an ODBC connection string (for
+example a local SQL Server 2025 container) to run against a real database; a temporary
+table is used and nothing is left behind.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.bulk import BulkLoader
+from sqlvector.codec import encode_vectors
+from sqlvector.testing import SimulatedConnection
+
+ROWS = 2000
+DIMENSIONS = 1536
+
+
+def get_connection():
+    connection_string = os.environ.get('MSSQL')
+    if not connection_string:
+        return SimulatedConnection(), 'INSERT INTO #bench (id, chunk, embedding) VALUES (?, ?, ?)'
+    import pyodbc
+    conn = pyodbc.connect(connection_string)
+    conn.execute(f'CREATE TABLE #bench (id INT, chunk NVARCHAR(4000), embedding VECTOR({DIMENSIONS}))')
+    return conn, f'INSERT INTO #bench (id, chunk, embedding) VALUES (?, ?, CAST(? AS VECTOR({DIMENSIONS})))'
+
+
+if __name__ == '__main__':
+    vectors = encode_vectors(np.random.default_rng(0).random((ROWS, DIMENSIONS), dtype=np.float32))
+    rows = [(i, f'chunk {i}', v) for i, v in enumerate(vectors)]
+
+    conn, sql = get_connection()
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    for row in rows[:200]:
+        cursor.execute(sql, *row)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    print(f'row by row : {200 / elapsed:8.0f} rows/s (200 rows)')
+
+    for batch_size in (100, 500, 1000):
+        result = BulkLoader(conn, sql, batch_size=batch_size).load(rows)
+        print(f'batch {batch_size:4d} : {result.rows_per_second:8.0f} rows/s ({result.rows_inserted} rows, {result.batches} batches)')
+    conn.close()
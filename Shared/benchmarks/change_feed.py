@@ -0,0 +1,73 @@
+"""
+A bulk update of the content of 300 rows against FakeEmbeddingServer with 20 ms per
+request: the row-by-row trigger of Embeddings/T-SQL/04 (one embedding request per row,
+inside the updating statement) versus the queueing trigger with EmbeddingWorker draining
+MemoryChangeQueue in batched, concurrent requests. Reports how long the update statement
+takes, how long until every embedding is current, and the number of requests. Some rows
+are changed again while the worker is embedding them, to check that no stale vector is kept.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector import EmbeddingClient
+from sqlvector.changefeed import EmbeddingWorker, MemoryChangeQueue
+from sqlvector.testing import FakeEmbeddingServer, fake_embedding
+
+ROWS = 300
+REQUEST_LATENCY = 0.02
+DIMENSIONS = 256
+WORDS = "the foundation series galaxy empire robot planet psychohistory trader mule seldon terminus".split()
+
+
+def sentence(rng):
+    return " ".join(rng.choice(WORDS, rng.integers(8, 40))).capitalize() + "."
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    original = [sentence(rng) for _ in range(ROWS)]
+    changes = [sentence(rng) for _ in range(ROWS)]
+
+    with FakeEmbeddingServer(dimensions=DIMENSIONS, delay=REQUEST_LATENCY) as server:
+        client = EmbeddingClient(server.url, api_key="not-needed", max_batch_items=64, max_workers=4)
+
+        # Trigger: the UPDATE returns once every row has been embedded, one request at a time
+        start = time.perf_counter()
+        for text in changes:
+            client.embed_one(text)
+        trigger = time.perf_counter() - start
+        trigger_requests = len(server.requests)
+        print(f'row-by-row trigger: UPDATE of {ROWS} rows takes {trigger:6.2f} s '
+              f'({trigger_requests} requests, embeddings current when it returns)')
+
+        table = MemoryChangeQueue()
+        keys = table.insert(original)
+        table.queue.clear()  # start from a table whose embeddings are current
+        server.requests.clear()
+
+        start = time.perf_counter()
+        table.update(dict(zip(keys, changes)))
+        statement = time.perf_counter() - start
+
+        again = {}
+
+        def embed(texts):
+            # A concurrent writer changes some of the rows being embedded
+            if not again:
+                again.update({key: sentence(rng) for key in rng.choice(keys, ROWS // 10, replace=False).tolist()})
+                table.update(again)
+            return client.embed(texts)
+
+        stats = EmbeddingWorker(table, embed, batch_size=500).run(until_empty=True)
+        drained = time.perf_counter() - start
+        print(f'queue + worker:     UPDATE of {ROWS} rows takes {statement * 1000:6.2f} ms, '
+              f'embeddings current after {drained:6.2f} s ({len(server.requests)} requests)')
+        print(f'  {stats}')
+
+        current = all(np.allclose(row["embedding"], fake_embedding(row["content"], DIMENSIONS)) for row in table.rows.values())
+        print(f'  {len(again)} rows changed again during the run; every embedding matches the current content: {current}')
+        assert current and table.pending() == 0
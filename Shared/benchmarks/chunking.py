@@ -0,0 +1,41 @@
+"""
+Compare the original chunker of the resume app (tokenizer loaded on every call, one
+decode per 500-token slice) with sqlvector.chunking, in one process and on a process pool.
+
+Needs the cl100k_base encoding (downloaded by tiktoken on first use).
+"""
+import os
+import random
+import sys
+import time
+
+import tiktoken
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.chunking import chunk_documents
+
+DOCUMENTS = 400
+SENTENCES_PER_DOCUMENT = 300
+WORDS = "experience python azure sql developer led team built pipeline data cloud managed delivered".split()
+
+
+def original_split(text, max_tokens=500):
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+    tokens = tokenizer.encode(text)
+    return [tokenizer.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+if __name__ == '__main__':
+    rnd = random.Random(0)
+    documents = [' '.join(' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 25))) + '.' for _ in range(SENTENCES_PER_DOCUMENT))
+                 for _ in range(DOCUMENTS)]
+    tiktoken.get_encoding("cl100k_base")  # warm the download cache
+
+    start = time.perf_counter()
+    count = sum(len(original_split(d)) for d in documents)
+    print(f'original          : {time.perf_counter() - start:6.2f} s, {count} chunks')
+
+    for label, processes in (('sqlvector, 1 proc', None), ('sqlvector, 4 proc', 4)):
+        start = time.perf_counter()
+        count = sum(len(c) for c in chunk_documents(documents, max_tokens=500, overlap=50, processes=processes))
+        print(f'{label:18s}: {time.perf_counter() - start:6.2f} s, {count} chunks (sentence boundaries, 50-token overlap)')
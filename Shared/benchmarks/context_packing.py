@@ -0,0 +1,77 @@
+"""
+Prompt tokens per request for the structured app's search results: the stringified list of
+rows the app used to send (`f"{result_list}"`) versus ContextBuilder with a 3000-token budget,
+for 5, 25 and 100 results over synthetic reviews in which, like in the Fine Foods dataset,
+the same review text often appears under several products.
+Counts cl100k_base tokens when tiktoken can load the encoding, else estimates them.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.chunking import get_encoding
+from sqlvector.context import ContextBuilder
+
+REVIEWS = 5_000
+QUERIES = 20
+BUDGET = 3000
+WORDS = ("coffee tea bold smooth bitter roast flavor aroma price bag box taste sweet strong fresh stale "
+         "dog treats cat food chocolate snack chips salty crunchy organic healthy delicious great awful").split()
+
+
+def reviews(rng):
+    rows = []
+    for i in range(REVIEWS):
+        # About a third of the reviews repeat an earlier text under another product
+        if rows and rng.random() < 0.3:
+            source = rows[rng.integers(0, len(rows))]
+            summary, text = source["summary"], source["text"]
+        else:
+            summary = " ".join(rng.choice(WORDS, 3)).capitalize()
+            text = " ".join(rng.choice(WORDS, rng.integers(30, 250))).capitalize() + "."
+        rows.append({"product_id": f"B{i:09d}", "summary": summary, "text": text, "similarity_score": 0.0})
+    return rows
+
+
+def search(rng, corpus, by_text, num_results):
+    # Identical texts have identical embeddings, so a search returns their copies side by side
+    rows = []
+    while len(rows) < num_results:
+        text = corpus[rng.integers(0, REVIEWS)]["text"]
+        rows.extend(by_text[text][:num_results - len(rows)])
+    scores = np.sort(rng.uniform(0.75, 0.9, num_results))[::-1]
+    return [dict(row, similarity_score=float(score)) for row, score in zip(rows, scores)]
+
+
+if __name__ == '__main__':
+    try:
+        encoding = get_encoding("cl100k_base")
+        count = lambda text: len(encoding.encode_ordinary(text))
+        print('tokens counted with cl100k_base')
+    except Exception as e:
+        encoding = None
+        count = lambda text: len(text) // 4 + 1
+        print(f'cl100k_base not available ({type(e).__name__}), tokens estimated at 4 characters each')
+
+    rng = np.random.default_rng(0)
+    corpus = reviews(rng)
+    by_text = {}
+    for row in corpus:
+        by_text.setdefault(row["text"], []).append(row)
+    builder = ContextBuilder([("Product ID", "product_id"), ("Summary", "summary"), ("Similarity", "similarity_score")],
+                             "text", text_label="Review", max_tokens=BUDGET, max_item_tokens=400, encoding=encoding)
+
+    for num_results in (5, 25, 100):
+        raw, packed, used, duplicates = [], [], [], []
+        for _ in range(QUERIES):
+            rows = search(rng, corpus, by_text, num_results)
+            raw.append(count(f"{rows}"))
+            context = builder.build(rows)
+            packed.append(context.tokens)
+            used.append(len(context.used))
+            duplicates.append(context.duplicates)
+        print(f'{num_results:3} results: stringified list {np.mean(raw):7.0f} tokens, packed {np.mean(packed):6.0f} tokens '
+              f'({1 - np.mean(packed) / np.mean(raw):4.0%} fewer), {np.mean(used):5.1f} rows kept, '
+              f'{np.mean(duplicates):4.1f} near-duplicates dropped')
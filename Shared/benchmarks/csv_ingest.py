@@ -0,0 +1,67 @@
+"""
+Peak memory of loading a FineFoodEmbeddings-style CSV: whole-file read vs streaming.
+
+A synthetic CSV with JSON-array vectors is written to a temporary file, then loaded
+into SimulatedConnection both ways while tracemalloc records the peak allocation.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.bulk import BulkLoader
+from sqlvector.codec import encode_vector, encode_vectors
+from sqlvector.ingest import stream_csv_to_table
+from sqlvector.testing import SimulatedConnection
+
+ROWS = 5000
+DIMENSIONS = 1536
+
+
+class DiscardingConnection(SimulatedConnection):
+    # Keep only a row count, so the "database" does not grow with the file
+    def commit(self):
+        self.rows_committed = getattr(self, 'rows_committed', 0) + len(self.pending)
+        self.pending = []
+
+
+def write_csv(path):
+    rng = np.random.default_rng(0)
+    with open(path, 'w') as f:
+        f.write('Id,Text,vector\n')
+        for i in range(ROWS):
+            f.write(f'{i},review {i},"{json.dumps(rng.random(DIMENSIONS, dtype=np.float32).round(6).tolist())}"\n')
+
+
+def whole_file(path):
+    df = pd.read_csv(path)
+    df['vector'] = df['vector'].apply(lambda v: encode_vector(json.loads(v)))
+    rows = list(zip(df['Id'], df['Text'], df['vector']))
+    return BulkLoader(DiscardingConnection(latency=0, per_row=0), 'INSERT', batch_size=1000).load(rows)
+
+
+def streaming(path):
+    return stream_csv_to_table(path, DiscardingConnection(latency=0, per_row=0), 'INSERT',
+                               lambda frame, vectors: zip(frame['Id'], frame['Text'], encode_vectors(vectors)),
+                               chunksize=500, batch_size=500)
+
+
+if __name__ == '__main__':
+    path = os.path.join(tempfile.mkdtemp(), 'embeddings.csv')
+    write_csv(path)
+    print(f'{ROWS} rows, {os.path.getsize(path) / 2**20:.0f} MB CSV')
+    for name, load in [('whole file', whole_file), ('streaming', streaming)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = load(path)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{name:10s}: {result.rows_inserted} rows in {elapsed:.1f}s, peak {peak / 2**20:.0f} MB')
+    os.remove(path)
@@ -0,0 +1,74 @@
+"""
+Compare processing documents one after the other (extract, chunk, embed, insert)
+with running the same steps as a sqlvector.pipeline.Pipeline.
+
+Everything runs offline: extraction is simulated with a fixed latency per document
+(Document Intelligence is a remote call), embeddings come from FakeEmbeddingServer
+and rows go to SimulatedConnection.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.bulk import BulkLoader
+from sqlvector.codec import encode_vectors
+from sqlvector.embeddings import EmbeddingClient
+from sqlvector.pipeline import Pipeline, Stage
+from sqlvector.testing import FakeEmbeddingServer, SimulatedConnection
+
+DOCUMENTS = 24
+EXTRACT_SECONDS = 0.25
+CHUNKS_PER_DOCUMENT = 8
+DIMENSIONS = 256
+INSERT_SQL = 'INSERT INTO resumedocs (chunkid, filename, chunk, embedding) VALUES (?, ?, ?, ?)'
+
+
+def extract(name):
+    time.sleep(EXTRACT_SECONDS)
+    return ' '.join(f'{name} sentence {i} about skills and experience.' for i in range(CHUNKS_PER_DOCUMENT * 20))
+
+
+def chunk(name, text):
+    words = text.split()
+    size = len(words) // CHUNKS_PER_DOCUMENT
+    return [(f'{name}_{i}', name, ' '.join(words[i * size:(i + 1) * size])) for i in range(CHUNKS_PER_DOCUMENT)]
+
+
+def insert(conn, records, embeddings):
+    rows = [(chunkid, name, text, payload) for (chunkid, name, text), payload in zip(records, encode_vectors(embeddings))]
+    return BulkLoader(conn, INSERT_SQL, batch_size=500).load(rows)
+
+
+def sequential(names, client, conn):
+    for name in names:
+        records = chunk(name, extract(name))
+        insert(conn, records, client.embed([r[2] for r in records]))
+
+
+def pipelined(names, client, conn):
+    def embed(records):
+        return [(record, embedding) for record, embedding in zip(records, client.embed([r[2] for r in records]))]
+
+    def store(pairs):
+        insert(conn, [p[0] for p in pairs], [p[1] for p in pairs])
+        return pairs
+
+    Pipeline([
+        Stage('extract', lambda name: [(name, extract(name))], workers=4),
+        Stage('chunk', lambda doc: chunk(*doc)),
+        Stage('embed', embed, workers=2, batch_size=64),
+        Stage('insert', store, batch_size=500, batch_wait=0.2),
+    ]).run(names)
+
+
+if __name__ == '__main__':
+    names = [f'resume_{i}.pdf' for i in range(DOCUMENTS)]
+    with FakeEmbeddingServer(dimensions=DIMENSIONS) as server:
+        for label, run in (('sequential', sequential), ('pipelined', pipelined)):
+            client = EmbeddingClient(server.url, api_key='not-needed')
+            conn = SimulatedConnection()
+            start = time.perf_counter()
+            run(names, client, conn)
+            elapsed = time.perf_counter() - start
+            print(f'{label:10s}: {elapsed:6.2f} s for {DOCUMENTS} documents, {len(conn.rows)} rows inserted, {conn.round_trips} round-trips')
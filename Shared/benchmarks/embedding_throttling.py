@@ -0,0 +1,68 @@
+"""
+The embedding client under throttling, against a local ThrottlingEmbeddingServer with
+a quota of 10 requests per 0.5 s window (1200 RPM) and batches of 8 texts: 160 texts/s
+over whole windows, a bit more for a run that ends early in its last window.
+
+The first runs are deterministic: requests are sent one at a time and AdaptiveScheduler
+and the server share a FakeClock, so waiting costs no wall time and every run gives the
+same throttle counts and throughput, which are checked. The last runs keep 16 workers
+in flight in wall-clock time to show concurrency adapting to the quota; their timings vary.
+Every run checks that no input is lost or reordered.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector import EmbeddingClient, AdaptiveScheduler
+from sqlvector.testing import FakeClock, ThrottlingEmbeddingServer, fake_embedding
+
+MAX_REQUESTS = 10
+WINDOW = 0.5
+BATCH = 8
+QUOTA = MAX_REQUESTS * BATCH / WINDOW  # texts/s
+
+
+def run(texts, clock=None, workers=1, **budget):
+    kwargs = dict(clock=clock, sleep=clock.sleep) if clock else {}
+    server_kwargs = dict(clock=clock) if clock else {}
+    with ThrottlingEmbeddingServer(max_requests=MAX_REQUESTS, window=WINDOW, dimensions=64, **server_kwargs) as server:
+        scheduler = AdaptiveScheduler(initial_concurrency=min(8, workers), max_concurrency=workers, seed=42,
+                                      **budget, **kwargs)
+        client = EmbeddingClient(server.url, 'not-needed', max_batch_items=BATCH, max_workers=workers,
+                                 scheduler=scheduler)
+        timer = clock or time.perf_counter
+        start = timer()
+        vectors = client.embed(texts)
+        elapsed = timer() - start
+    assert vectors == [fake_embedding(t, 64) for t in texts], 'embeddings lost or out of order'
+    return elapsed, server.throttled, scheduler.snapshot()
+
+
+def report(name, texts, elapsed, throttled, snapshot):
+    print(f'  {name:<24} {len(texts)} texts in {elapsed:5.2f} s ({len(texts) / elapsed:4.0f} texts/s), '
+          f'{throttled:2} throttled responses, scheduler: {snapshot}')
+
+
+if __name__ == '__main__':
+    texts = [f'Review number {i}: great coffee, would buy again.' for i in range(400)]
+    requests = len(texts) // BATCH
+    windows = -(-requests // MAX_REQUESTS)
+
+    print(f'Virtual time, one request at a time (quota {QUOTA:.0f} texts/s):')
+    elapsed, throttled, snapshot = run(texts, FakeClock())
+    report('no client-side budget', texts, elapsed, throttled, snapshot)
+    # One 429 at the end of every full window, then Retry-After points at the next window
+    assert throttled == windows - 1 and snapshot['calls'] == requests
+    assert elapsed == (windows - 1) * WINDOW
+
+    elapsed, throttled, snapshot = run(texts, FakeClock(), requests_per_minute=MAX_REQUESTS / WINDOW * 60 * 0.9)
+    report('client-side RPM budget', texts, elapsed, throttled, snapshot)
+    # The budget spreads the requests below the quota: fewer 429s, at most 10% slower than the quota allows
+    assert throttled < windows - 1
+    assert len(texts) / elapsed >= 0.9 * QUOTA
+
+    print('Wall-clock time, 16 workers:')
+    for name, budget in (('no client-side budget', {}), ('client-side RPM budget', dict(requests_per_minute=20 * 60))):
+        elapsed, throttled, snapshot = run(texts, workers=16, **budget)
+        report(name, texts, elapsed, throttled, snapshot)
@@ -0,0 +1,48 @@
+"""
+Queries per second of ExactIndex on a synthetic table: one query at a time versus batched
+queries, float32 versus float16 storage, against a naive per-query full sort.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.exact import ExactIndex, recall_at_k
+
+ROWS = 50_000
+DIMENSIONS = 1536
+QUERIES = 256
+K = 10
+
+
+def naive(vectors, queries, k):
+    results = []
+    for query in queries:
+        similarity = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        results.append(np.argsort(-similarity)[:k])
+    return np.array(results)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((ROWS, DIMENSIONS), dtype=np.float32)
+    queries = rng.standard_normal((QUERIES, DIMENSIONS), dtype=np.float32)
+
+    start = time.perf_counter()
+    expected = naive(vectors, queries[:32], K)
+    print(f'naive full sort      : {32 / (time.perf_counter() - start):8.1f} QPS')
+
+    for dtype in (np.float32, np.float16):
+        index = ExactIndex(vectors, metric='cosine', dtype=dtype)
+        start = time.perf_counter()
+        for query in queries[:32]:
+            index.search(query, K)
+        single = 32 / (time.perf_counter() - start)
+        start = time.perf_counter()
+        found, _ = index.search(queries, K)
+        batched = QUERIES / (time.perf_counter() - start)
+        name = np.dtype(dtype).name
+        print(f'{name} one at a time: {single:8.1f} QPS, batched: {batched:8.1f} QPS, '
+              f'{index.vectors.nbytes / 2**20:.0f} MB, recall@{K} vs naive {recall_at_k(found[:32], expected):.3f}')
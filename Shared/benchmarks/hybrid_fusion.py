@@ -0,0 +1,103 @@
+"""
+Client-side hybrid search on a synthetic corpus with the local stand-ins (LocalBM25Leg and
+LocalVectorLeg over ExactIndex). Each leg is delayed by a simulated database round-trip,
+to compare running the legs one after the other with HybridSearch running them
+concurrently, and precision@10 (documents of the query's topic) is reported for each leg
+alone and for RRF and score fusion.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.exact import ExactIndex
+from sqlvector.hybrid import HybridSearch, LocalBM25Leg, LocalVectorLeg
+
+DOCUMENTS = 20_000
+TOPICS = 100
+WORDS_PER_TOPIC = 200
+COMMON_WORDS = 2_000
+DIMENSIONS = 384
+QUERIES = 100
+K = 10
+ROUND_TRIP = 0.02
+NOISE = 4.0
+
+
+class DelayedLeg:
+    """
+    Adds a fixed delay to every search of a leg, like a query round-trip to the database.
+    """
+
+    def __init__(self, leg, delay):
+        self.name = leg.name
+        self.leg = leg
+        self.delay = delay
+
+    def search(self, text, vector, k):
+        time.sleep(self.delay)
+        return self.leg.search(text, vector, k)
+
+
+def corpus(rng):
+    # Every document mixes words of its topic with common words; its embedding is its topic
+    # direction plus noise, so both legs find the topic, each with its own mistakes
+    topics = rng.integers(0, TOPICS, DOCUMENTS)
+    texts = []
+    for topic in topics:
+        words = [f"t{topic}w{w}" for w in rng.integers(0, WORDS_PER_TOPIC, 3)]
+        words += [f"c{w}" for w in rng.integers(0, COMMON_WORDS, 30)]
+        texts.append(" ".join(words))
+    directions = rng.standard_normal((TOPICS, DIMENSIONS), dtype=np.float32)
+    vectors = directions[topics] + NOISE * rng.standard_normal((DOCUMENTS, DIMENSIONS), dtype=np.float32)
+    return topics, texts, directions, vectors
+
+
+def precision(results, topics, topic):
+    return np.mean([topics[row_id] == topic for row_id, *_ in results[:K]]) if results else 0.0
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    topics, texts, directions, vectors = corpus(rng)
+    ids = list(range(DOCUMENTS))
+
+    start = time.perf_counter()
+    fulltext = LocalBM25Leg(ids, texts)
+    vector = LocalVectorLeg(ids, ExactIndex(vectors))
+    print(f'indexes built in {time.perf_counter() - start:.2f} s')
+
+    query_topics = rng.integers(0, TOPICS, QUERIES)
+    queries = []
+    for topic in query_topics:
+        words = [f"t{topic}w{w}" for w in rng.integers(0, WORDS_PER_TOPIC, 2)] + [f"c{rng.integers(0, COMMON_WORDS)}"]
+        queries.append((" ".join(words), directions[topic] + NOISE * rng.standard_normal(DIMENSIONS, dtype=np.float32)))
+
+    legs = [DelayedLeg(fulltext, ROUND_TRIP), DelayedLeg(vector, ROUND_TRIP)]
+    start = time.perf_counter()
+    for text, embedding in queries:
+        for leg in legs:
+            leg.search(text, embedding, 50)
+    sequential = (time.perf_counter() - start) / QUERIES
+    print(f'legs one after the other: {sequential * 1000:6.1f} ms per query')
+
+    for fusion in ('rrf', 'score'):
+        search = HybridSearch(legs, fusion=fusion)
+        latencies = {leg.name: [] for leg in legs}
+        totals = []
+        scores = {leg.name: [] for leg in legs}
+        fused = []
+        for (text, embedding), topic in zip(queries, query_topics):
+            result = search.search(text, embedding, K)
+            totals.append(result.total)
+            for name, seconds in result.latencies.items():
+                latencies[name].append(seconds)
+                scores[name].append(precision(result.rankings[name], topics, topic))
+            fused.append(precision(result.results, topics, topic))
+        search.close()
+        legs_report = ', '.join(f'{name} {np.mean(seconds) * 1000:.1f} ms' for name, seconds in latencies.items())
+        print(f'concurrent legs ({fusion:5}): {np.mean(totals) * 1000:6.1f} ms per query ({legs_report})')
+        print(f'  precision@{K}: ' + ', '.join(f'{name} {np.mean(p):.3f}' for name, p in scores.items())
+              + f', fused {np.mean(fused):.3f}')
@@ -0,0 +1,117 @@
+"""
+Re-indexing a document corpus after a small change: a full reload (delete everything,
+embed and insert every chunk, as the samples used to do) versus IncrementalIndexer, which
+skips documents whose hash did not change and embeds and writes only new or changed
+chunks. Runs on MemoryIndexStore with a hash-based stand-in for the embedding model and
+reports chunks embedded, embedding tokens, rows written and time for each run.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.embeddings import estimate_tokens
+from sqlvector.incremental import IncrementalIndexer, MemoryIndexStore, document_hash
+from sqlvector.testing import fake_embedding
+
+DOCUMENTS = 1_000
+CHUNKS_PER_DOCUMENT = (5, 20)
+DIMENSIONS = 256
+WORDS = ("python sql azure developer manager data engineer cloud team lead project years experience "
+         "skills degree university java kubernetes analytics machine learning design customer").split()
+
+
+def chunk(rng):
+    return " ".join(rng.choice(WORDS, rng.integers(200, 400))).capitalize() + "."
+
+
+def corpus(rng):
+    return {f"resume_{i:05d}.pdf": [chunk(rng) for _ in range(rng.integers(*CHUNKS_PER_DOCUMENT))]
+            for i in range(DOCUMENTS)}
+
+
+def edit(rng, documents):
+    """
+    1% of the documents get a rewritten chunk, 0.5% lose their last chunk, 0.5% are removed
+    and 1% are added.
+    """
+    documents = {name: list(chunks) for name, chunks in documents.items()}
+    names = list(documents)
+    picked = iter(rng.permutation(len(names)))
+    for _ in range(DOCUMENTS // 100):
+        chunks = documents[names[next(picked)]]
+        chunks[rng.integers(0, len(chunks))] = chunk(rng)
+    for _ in range(DOCUMENTS // 200):
+        documents[names[next(picked)]].pop()
+    for _ in range(DOCUMENTS // 200):
+        del documents[names[next(picked)]]
+    for i in range(DOCUMENTS // 100):
+        documents[f"resume_new_{i:05d}.pdf"] = [chunk(rng) for _ in range(rng.integers(*CHUNKS_PER_DOCUMENT))]
+    return documents
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.texts = 0
+        self.tokens = 0
+
+    def __call__(self, texts):
+        self.texts += len(texts)
+        self.tokens += sum(estimate_tokens(t) for t in texts)
+        return [fake_embedding(t, DIMENSIONS) for t in texts]
+
+
+def items(documents):
+    return [(f"{name}_{i}", name, text) for name, chunks in documents.items() for i, text in enumerate(chunks)]
+
+
+def full_reload(store, documents):
+    # What the samples did: empty the table, then embed and insert everything
+    embed = CountingEmbedder()
+    start = time.perf_counter()
+    deletes = list(store.rows)
+    upserts = [(key, name, text, None) for key, name, text in items(documents)]
+    vectors = embed([text for _, _, text, _ in upserts])
+    store.write(upserts, vectors, deletes)
+    return embed, len(upserts) + len(deletes), time.perf_counter() - start
+
+
+def incremental(store, documents, previous):
+    embed = CountingEmbedder()
+    start = time.perf_counter()
+    indexer = IncrementalIndexer(store, embed)
+    hashes = {name: document_hash("\n".join(chunks)) for name, chunks in documents.items()}
+    # Documents that are gone have their chunks deleted and their hash removed
+    hashes.update({name: None for name in previous if name not in documents})
+    changed = indexer.changed_documents(hashes)
+    result = indexer.sync(items({name: documents.get(name, []) for name in changed}), list(changed), changed)
+    return embed, result.inserted + result.updated + result.deleted, time.perf_counter() - start, result
+
+
+def report(label, embed, rows, elapsed):
+    print(f'  {label:<12} {embed.texts:>7} chunks embedded  {embed.tokens:>10,} tokens  {rows:>7} rows written  '
+          f'{elapsed * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    original = corpus(rng)
+    edited = edit(rng, original)
+    total = sum(len(c) for c in edited.values())
+    print(f'{DOCUMENTS} documents, {total} chunks after the edit '
+          f'(1% rewritten chunk, 0.5% shorter, 0.5% removed, 1% added)')
+
+    for label, documents, previous in (('same corpus', original, original), ('after edit', edited, original)):
+        print(f'Re-index, {label}:')
+        reload_store, incremental_store = MemoryIndexStore(), MemoryIndexStore()
+        full_reload(reload_store, previous)
+        incremental(incremental_store, previous, {})
+        report('full reload', *full_reload(reload_store, documents))
+        embed, rows, elapsed, result = incremental(incremental_store, documents, previous)
+        report('incremental', embed, rows, elapsed)
+        print(f'  {result}')
+        expected = {key: text for key, _, text in items(documents)}
+        assert {key: row[1] for key, row in incremental_store.rows.items()} == expected
+        assert len(incremental_store.documents) == len(documents)
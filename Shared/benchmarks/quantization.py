@@ -0,0 +1,77 @@
+"""
+Memory, bytes scanned per query, recall@10 and queries per second of float32 and float16
+exact search against int8 and binary QuantizedIndex scans, with and without exact
+rescoring, on a synthetic clustered table. Also compares the float32 and float16 wire
+payloads of one vector.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.codec import decode_vector, encode_vector
+from sqlvector.exact import ExactIndex, recall_at_k
+from sqlvector.quantize import QuantizedIndex
+
+ROWS = 20_000
+DIMENSIONS = 1536
+LATENT = 64
+CLUSTERS = 200
+QUERIES = 100
+K = 10
+
+
+def clustered(rng, n):
+    # Like real embeddings, the vectors vary along far fewer directions than they have dimensions
+    basis = np.random.default_rng(1).standard_normal((LATENT, DIMENSIONS), dtype=np.float32) / np.sqrt(LATENT)
+    centers = np.random.default_rng(2).standard_normal((CLUSTERS, LATENT), dtype=np.float32)
+    latent = centers[rng.integers(0, CLUSTERS, n)] + 0.5 * rng.standard_normal((n, LATENT), dtype=np.float32)
+    return 4 * latent @ basis + 0.05 * rng.standard_normal((n, DIMENSIONS), dtype=np.float32)
+
+
+def timed(search, queries):
+    start = time.perf_counter()
+    found = [search(query)[0][0] for query in queries]
+    return found, len(queries) / (time.perf_counter() - start)
+
+
+def report(name, memory, scanned, found, expected, qps):
+    print(f'{name:<24} {memory / 2**20:8.1f} MB {scanned / 2**20:8.2f} MB/query '
+          f'recall@{K} {recall_at_k(found, expected):.3f} {qps:8.1f} QPS')
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    vectors = clustered(rng, ROWS)
+    queries = clustered(rng, QUERIES)
+
+    payload32 = encode_vector(vectors[0], np.float32)
+    payload16 = encode_vector(vectors[0], np.float16)
+    error = np.abs(decode_vector(payload16).astype(np.float32) - vectors[0]).max()
+    print(f'wire payload per vector: float32 {len(payload32)} bytes, float16 {len(payload16)} bytes '
+          f'(max element error {error:.2e})')
+    print()
+
+    exact = ExactIndex(vectors)
+    expected, qps = timed(lambda q: exact.search(q, K), queries)
+    report('float32 exact', exact.vectors.nbytes, exact.vectors.nbytes, expected, expected, qps)
+
+    half = ExactIndex(vectors, dtype=np.float16)
+    found, qps = timed(lambda q: half.search(q, K), queries)
+    report('float16 exact', half.vectors.nbytes, half.vectors.nbytes, found, expected, qps)
+
+    for mode in ('int8', 'binary'):
+        start = time.perf_counter()
+        index = QuantizedIndex(vectors, mode=mode)
+        print(f'{mode} codes built in {time.perf_counter() - start:.2f} s')
+        memory = index.memory()
+        row_bytes = index.full.vectors[0].nbytes
+        found, qps = timed(lambda q: index.search(q, K, rescore=False), queries)
+        report(f'{mode} scan only', memory['codes'], index.nbytes, found, expected, qps)
+        for oversample in (2, 4, 10):
+            found, qps = timed(lambda q: index.search(q, K, oversample=oversample), queries)
+            # The codes stay in memory; the full vectors can stay on disk, only candidate rows are read
+            report(f'{mode} + rescore x{oversample}', memory['codes'], index.nbytes + K * oversample * row_bytes,
+                   found, expected, qps)
@@ -0,0 +1,95 @@
+"""
+Recall@k, latency percentiles and QPS of vector search backends at several k values and
+concurrency levels, written as JSON or CSV.
+
+Without a connection string, runs offline on a synthetic table: exact search
+(ExactIndex, the ground truth) against the graph index at a few search breadths.
+
+With --mssql (or the MSSQL environment variable) set to an ODBC connection string, e.g.
+for a local SQL Server 2025 container loaded with the DiskANN Wikipedia sample, compares
+VECTOR_SEARCH (approximate) with VECTOR_DISTANCE (exact, the ground truth):
+
+    python recall_latency.py --mssql "Driver={ODBC Driver 18 for SQL Server};..." \\
+        --table dbo.wikipedia_articles_embeddings --vector content_vector --sample-queries 100 \\
+        --output results.csv
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.ann import GraphIndex
+from sqlvector.codec import decode_vectors, vector_column
+from sqlvector.evaluation import (LocalBackend, load_query_vectors, run_benchmark, sql_approximate_backend,
+                                  sql_exact_backend, write_results)
+from sqlvector.exact import ExactIndex
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mssql', default=os.environ.get('MSSQL'), help='ODBC connection string')
+    parser.add_argument('--table', default='dbo.wikipedia_articles_embeddings')
+    parser.add_argument('--id-column', default='id')
+    parser.add_argument('--vector', default='content_vector', help='vector column')
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--element-type', default='float32', choices=['float32', 'float16'])
+    parser.add_argument('--metric', default='cosine', choices=['cosine', 'dot', 'euclidean'])
+    parser.add_argument('--query-table', default='dbo.wikipedia_search_vectors')
+    parser.add_argument('--query-vector', default='v')
+    parser.add_argument('--sample-queries', type=int, default=0,
+                        help='use this many random rows of --table as queries instead of --query-table')
+    parser.add_argument('--rows', type=int, default=20000, help='synthetic table size (offline mode)')
+    parser.add_argument('--queries', type=int, default=200, help='synthetic query count (offline mode)')
+    parser.add_argument('--k', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--output', default='recall_latency.json', help='.json or .csv')
+    return parser.parse_args()
+
+
+def sql_setup(args):
+    import pyodbc
+    connect = lambda: pyodbc.connect(args.mssql)
+    conn = connect()
+    if args.sample_queries:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT TOP ({args.sample_queries}) {vector_column(args.vector, args.dimensions, args.element_type)} "
+                       f"FROM {args.table} ORDER BY NEWID()")
+        queries = decode_vectors([row[0] for row in cursor.fetchall()])
+    else:
+        queries = load_query_vectors(conn, args.query_table, 'id', args.query_vector, args.dimensions, args.element_type)
+    conn.close()
+    columns = (connect, args.table, args.id_column, args.vector, args.dimensions, args.metric, args.element_type,
+               max(args.concurrency))
+    exact = sql_exact_backend(*columns)
+    return queries, exact, [sql_approximate_backend(*columns), exact]
+
+
+def offline_setup(args):
+    rng = np.random.default_rng(0)
+    basis = rng.standard_normal((32, args.dimensions), dtype=np.float32)
+    centers = rng.standard_normal((200, 32), dtype=np.float32)
+
+    def sample(n):
+        latent = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, 32), dtype=np.float32)
+        return latent @ basis + 0.05 * rng.standard_normal((n, args.dimensions), dtype=np.float32)
+
+    vectors = sample(args.rows)
+    print(f'building the graph index over {args.rows} synthetic vectors...')
+    graph = GraphIndex(vectors, metric=args.metric)
+    exact = LocalBackend('local-exact', ExactIndex(vectors, metric=args.metric))
+    backends = [LocalBackend(f'local-graph-breadth-{b}', graph, breadth=b) for b in (16, 64, 256)]
+    return sample(args.queries), exact, backends + [exact]
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    queries, ground_truth, backends = sql_setup(args) if args.mssql else offline_setup(args)
+    print(f'{len(queries)} queries, k={args.k}, concurrency={args.concurrency}')
+    print(f'{"backend":24s} {"k":>4s} {"conc":>4s} {"recall":>7s} {"p50 ms":>8s} {"p95 ms":>8s} {"p99 ms":>8s} {"QPS":>8s}')
+    results = run_benchmark(backends, queries, args.k, args.concurrency, ground_truth=ground_truth, progress=lambda r: print(
+        f'{r["backend"]:24s} {r["k"]:4d} {r["concurrency"]:4d} {r["recall"]:7.3f} {r["p50_ms"]:8.2f} {r["p95_ms"]:8.2f} '
+        f'{r["p99_ms"]:8.2f} {r["qps"]:8.1f}'))
+    write_results(results, args.output)
+    print(f'results written to {args.output}')
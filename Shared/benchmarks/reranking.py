@@ -0,0 +1,76 @@
+"""
+Reranking 50 candidates with Reranker against FakeRerankServer, which answers after a
+fixed delay plus a per-document cost, like a hosted re-ranker: one call with every
+candidate versus batches sent concurrently, the effect of truncating documents to a
+token budget on the bytes sent, and the fallback to the vector order on timeout.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.rerank import CohereReranker, Reranker
+from sqlvector.testing import FakeRerankServer
+
+CANDIDATES = 50
+K = 10
+DELAY = 0.05
+RUNS = 10
+QUERY = 'cozy bungalow with original hardwood and charm'
+FEATURES = ['hardwood floors', 'a gas fireplace', 'custom cabinetry', 'heated floors', 'a breakfast nook',
+            'skylights', 'original charm', 'a wine cellar', 'a home theater', 'granite countertops']
+
+
+class SlowScorer:
+    """
+    Adds a delay proportional to the number of documents, like a model scoring them one by one.
+    """
+
+    def __init__(self, scorer, seconds_per_document):
+        self.scorer = scorer
+        self.seconds_per_document = seconds_per_document
+
+    def score(self, query, documents):
+        time.sleep(self.seconds_per_document * len(documents))
+        return self.scorer.score(query, documents)
+
+
+def candidates():
+    # Listings in "vector order"; the ones mentioning the query's words are spread out
+    return [f"Id: {i}\nContent: Bungalow featuring {FEATURES[i % 10]} and "
+            f"{FEATURES[(i * 3) % 10]}. " + "Well-appointed bedrooms with modern finishes. " * 40
+            for i in range(CANDIDATES)]
+
+
+def timed(reranker, documents):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        result = reranker.rerank(QUERY, documents, K)
+    return result, (time.perf_counter() - start) / RUNS
+
+
+if __name__ == '__main__':
+    documents = candidates()
+    with FakeRerankServer(delay=DELAY) as server:
+        scorer = SlowScorer(CohereReranker(server.url, 'not-needed'), 0.002)
+        for batch_size, concurrency in ((CANDIDATES, 1), (10, 1), (10, 5), (5, 10)):
+            reranker = Reranker(scorer, batch_size=batch_size, max_concurrency=concurrency, encoding=None)
+            result, seconds = timed(reranker, documents)
+            reranker.close()
+            print(f'batches of {batch_size:2}, {concurrency:2} concurrent: {seconds * 1000:6.1f} ms per rerank, '
+                  f'top ids {[d.split()[1] for d in result.items[:5]]}')
+
+        for tokens in (512, 64):
+            server.requests.clear()
+            reranker = Reranker(scorer, batch_size=10, max_concurrency=5, max_document_tokens=tokens, encoding=None)
+            result, seconds = timed(reranker, documents)
+            reranker.close()
+            sent = sum(len(d) for body in server.requests for d in body['documents']) / RUNS
+            print(f'truncated to ~{tokens:3} tokens: {sent / 1024:6.1f} KB of documents per rerank, '
+                  f'{seconds * 1000:6.1f} ms, top ids {[d.split()[1] for d in result.items[:5]]}')
+
+    with FakeRerankServer(delay=1.0) as server:
+        reranker = Reranker(CohereReranker(server.url, 'not-needed'), batch_size=10, timeout=0.2, encoding=None)
+        result = reranker.rerank(QUERY, documents, K)
+        reranker.close()
+        print(f'slow re-ranker (1 s, timeout 0.2 s): {result}, top ids {[d.split()[1] for d in result.items[:5]]}')
@@ -0,0 +1,42 @@
+"""
+Time until the user sees something: a 200-token answer from FakeChatServer (first token
+after 300 ms, then 50 tokens/s) requested whole versus streamed with ChatClient, reporting
+the time to first token and tokens per second measured by CompletionStream.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.streaming import ChatClient
+from sqlvector.testing import FakeChatServer
+
+TOKENS = 200
+FIRST_TOKEN_DELAY = 0.3
+TOKEN_DELAY = 0.02
+RUNS = 3
+
+MESSAGES = [
+    {"role": "system", "content": "You are an intelligent & funny assistant."},
+    {"role": "user", "content": "What's the best coffee?"},
+]
+
+
+if __name__ == '__main__':
+    reply = " ".join(f"word{i}" for i in range(TOKENS))
+    with FakeChatServer(reply, first_token_delay=FIRST_TOKEN_DELAY, token_delay=TOKEN_DELAY) as server:
+        client = ChatClient(server.url, 'not-needed')
+
+        start = time.perf_counter()
+        for _ in range(RUNS):
+            client.complete(MESSAGES, temperature=0)
+        whole = (time.perf_counter() - start) / RUNS
+        print(f'without streaming: first text shown after {whole * 1000:7.1f} ms (the whole answer)')
+
+        for _ in range(RUNS):
+            stream = client.stream(MESSAGES, temperature=0, stream_options={"include_usage": True})
+            text = "".join(stream)
+        assert text == reply
+        print(f'streamed         : {stream.stats.time_to_first_token * 1000:7.1f} ms to first token, '
+              f'{stream.stats.tokens} tokens in {stream.stats.duration * 1000:.1f} ms, '
+              f'{stream.stats.tokens_per_second:.1f} tokens/s')
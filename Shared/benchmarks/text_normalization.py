@@ -0,0 +1,48 @@
+"""
+Normalize a synthetic 500k-row reviews column the way the RAG notebook does (one Python
+lambda per row and step) and with TextNormalizer, in one process and on a process pool.
+"""
+import os
+import random
+import re
+import string
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.normalize import ENGLISH_STOPWORDS, STRING_DTYPE, TextNormalizer
+
+ROWS = 500_000
+WORDS = "the coffee is great and I love it but this café bag was not as fresh as the last one !!! 😀 tastes like chocolate".split()
+
+
+def per_row_lambdas(series):
+    series = series.str.lower()
+    series = series.apply(lambda x: re.sub(r'[^\x00-\x7F]+', '', x))
+    translator = str.maketrans('', '', string.punctuation)
+    series = series.apply(lambda x: x.translate(translator))
+    series = series.str.strip()
+    return series.apply(lambda x: ' '.join([word for word in x.split() if word not in ENGLISH_STOPWORDS]))
+
+
+if __name__ == '__main__':
+    rnd = random.Random(0)
+    reviews = pd.DataFrame({
+        'Summary': [' '.join(rnd.choices(WORDS, k=4)) for _ in range(ROWS)],
+        'Text': [' '.join(rnd.choices(WORDS, k=rnd.randint(10, 60))) for _ in range(ROWS)],
+    })
+    combined = reviews['Summary'].str.strip() + ': ' + reviews['Text'].str.strip()
+    normalizer = TextNormalizer(stopwords=ENGLISH_STOPWORDS)
+    print(f'{ROWS} rows, string dtype {STRING_DTYPE}')
+
+    start = time.perf_counter()
+    expected = per_row_lambdas(combined)
+    print(f'per-row lambdas   : {time.perf_counter() - start:6.2f} s')
+
+    for label, processes in (('TextNormalizer', None), ('TextNormalizer x4', 4)):
+        start = time.perf_counter()
+        result = normalizer.normalize_series(combined, processes=processes)
+        elapsed = time.perf_counter() - start
+        print(f'{label:18s}: {elapsed:6.2f} s, same output: {result.tolist() == expected.tolist()}')
@@ -0,0 +1,72 @@
+"""
+Cost of the tracing instrumentation per span: a bare function call, the same call in a
+`span` block outside any trace (tracing off), and inside a recorded trace, plus the
+breakdown and histograms of a simulated search request.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.tracing import Tracer, span, traced
+
+CALLS = 200_000
+REQUESTS = 50
+
+
+def stage():
+    pass
+
+
+@traced("stage")
+def traced_stage():
+    pass
+
+
+def per_call(function):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        function()
+    return (time.perf_counter() - start) / CALLS * 1e9
+
+
+def in_span():
+    with span("stage"):
+        stage()
+
+
+def search_request(tracer):
+    # Stages of the apps' search path, with sleeps standing in for the services
+    with tracer.trace("vector_search", backend="sql") as request:
+        with span("query_embedding"):
+            with span("openai.embedding"):
+                time.sleep(0.004)
+        with span("sql.connection"):
+            with span("auth.token"):
+                time.sleep(0.0005)
+        with span("sql.query"):
+            time.sleep(0.003)
+        with span("sql.fetch"):
+            time.sleep(0.001)
+    return request
+
+
+if __name__ == '__main__':
+    bare = per_call(stage)
+    print(f'bare call                  : {bare:7.1f} ns')
+    print(f'span, tracing off          : {per_call(in_span):7.1f} ns')
+    print(f'@traced, tracing off       : {per_call(traced_stage):7.1f} ns')
+
+    tracer = Tracer(enabled=True)
+    with tracer.trace("benchmark"):
+        print(f'span inside a trace        : {per_call(in_span):7.1f} ns')
+    tracer.reset()
+
+    for _ in range(REQUESTS):
+        request = search_request(tracer)
+    print(f'\nlast of {REQUESTS} simulated requests:')
+    for row in request.trace.breakdown():
+        print(f'  {row["stage"]:22} +{row["start_ms"]:6.2f} ms {row["duration_ms"]:7.2f} ms')
+    print('histograms:')
+    for name, summary in tracer.stats().items():
+        print(f'  {name:18} n={summary["count"]:3} p50 {summary["p50_ms"]:6.2f} ms p95 {summary["p95_ms"]:6.2f} ms')
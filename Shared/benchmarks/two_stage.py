@@ -0,0 +1,62 @@
+"""
+Two-stage search on synthetic Matryoshka-like embeddings (most of the signal sits in the
+first dimensions): recall@10 and queries per second of a search over the 256-dimensional
+prefix alone and of PrefixIndex (prefix candidates reranked with the full vector) at
+several oversampling factors, against exact search over the full 1536 dimensions.
+Also prints the SQL the Streamlit apps run for the same two-stage search.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sqlvector.dimensions import PrefixIndex, VectorConfig, truncate, two_stage_search_sql
+from sqlvector.exact import ExactIndex, recall_at_k
+
+ROWS = 20_000
+DIMENSIONS = 1536
+PREFIX = 256
+LATENT = 64
+CLUSTERS = 200
+QUERIES = 100
+K = 10
+
+
+def matryoshka(rng, n):
+    # Clustered vectors whose per-dimension scale decays, so a prefix keeps most of the signal
+    basis = np.random.default_rng(1).standard_normal((LATENT, DIMENSIONS), dtype=np.float32) / np.sqrt(LATENT)
+    basis *= np.exp(-np.arange(DIMENSIONS, dtype=np.float32) / 400)
+    centers = np.random.default_rng(2).standard_normal((CLUSTERS, LATENT), dtype=np.float32)
+    latent = centers[rng.integers(0, CLUSTERS, n)] + 0.5 * rng.standard_normal((n, LATENT), dtype=np.float32)
+    return 4 * latent @ basis + 0.01 * rng.standard_normal((n, DIMENSIONS), dtype=np.float32)
+
+
+def timed(search, queries):
+    start = time.perf_counter()
+    found = [search(query)[0][0] for query in queries]
+    return found, len(queries) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    vectors = matryoshka(rng, ROWS)
+    queries = matryoshka(rng, QUERIES)
+
+    exact = ExactIndex(vectors)
+    expected, qps = timed(lambda q: exact.search(q, K), queries)
+    print(f'full {DIMENSIONS} dims        : recall@{K} 1.000 {qps:8.1f} QPS, {exact.vectors.nbytes / 2**20:6.1f} MB scanned')
+
+    prefix = ExactIndex(truncate(vectors, PREFIX))
+    found, qps = timed(lambda q: prefix.search(q[:PREFIX], K), queries)
+    print(f'prefix {PREFIX} dims only  : recall@{K} {recall_at_k(found, expected):.3f} {qps:8.1f} QPS, '
+          f'{prefix.vectors.nbytes / 2**20:6.1f} MB scanned')
+
+    index = PrefixIndex(vectors, prefix_dimensions=PREFIX)
+    for oversample in (1, 2, 4, 10):
+        found, qps = timed(lambda q: index.search(q, K, oversample=oversample), queries)
+        print(f'two-stage, {oversample:2d}x candidates: recall@{K} {recall_at_k(found, expected):.3f} {qps:8.1f} QPS')
+
+    config = VectorConfig(DIMENSIONS, prefix_dimensions=PREFIX)
+    print(two_stage_search_sql(config, 'dbo.resumedocs', ['filename', 'chunkid', 'chunk'], 'embedding', 'embedding_prefix'))
@@ -0,0 +1,6 @@
+"""
+Shared Python helpers for the Azure SQL vector search samples.
+"""
+from .embeddings import EmbeddingClient, embeddings_url
+from .ratelimit import AdaptiveScheduler, ThrottledError, as_throttled
+from .cache import EmbeddingCache
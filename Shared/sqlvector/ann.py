@@ -0,0 +1,368 @@
+import bisect
+import json
+import os
+
+import numpy as np
+
+from .exact import ExactIndex, LocalTable
+
+
+class GraphIndex:
+    """
+    Approximate nearest neighbor index: a DiskANN-style (Vamana) proximity graph over the
+    vectors of an ExactIndex, searched with a greedy beam search.
+
+    Build: the vectors are split into about sqrt(n) clusters with a few k-means rounds;
+    every vector gets its exact nearest neighbors among the members of its `probes` closest
+    clusters as candidates (one matrix multiply per cluster), which are pruned to at most
+    `degree` out-edges with the Vamana rule (an edge is dropped when an already kept
+    neighbor is `alpha` times closer to it; with the dot metric the closest candidates
+    are kept), then reverse edges are added.
+    `insert` adds vectors one at a time with the same beam search and pruning.
+
+    Search starts from the vectors closest to the nearest cluster centers and keeps the
+    `breadth` best candidates: a larger breadth visits more of the graph and trades latency
+    for recall. Distances are exact and follow VECTOR_DISTANCE, like ExactIndex.
+    """
+
+    def __init__(self, vectors=None, metric="cosine", dtype=np.float32, degree=32, alpha=1.2, breadth=64,
+                 build_breadth=96, probes=2, entry_points=4, seed=0):
+        self.exact = ExactIndex(metric=metric, dtype=dtype)
+        self.degree = degree
+        self.alpha = alpha
+        self.breadth = breadth
+        self.build_breadth = build_breadth
+        self.probes = probes
+        self.entry_points = entry_points
+        self.seed = seed
+        self.graph = np.empty((0, degree), dtype=np.int32)
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.entries = np.empty(0, dtype=np.int32)
+        if vectors is not None:
+            self.build(vectors)
+
+    @property
+    def metric(self):
+        return self.exact.metric
+
+    def __len__(self):
+        return len(self.exact)
+
+    # Distances
+
+    def _pairwise(self, queries, vectors, query_norms, norms):
+        scores = queries @ vectors.T
+        if self.metric == "cosine":
+            return 1.0 - scores
+        if self.metric == "dot":
+            return -scores
+        return np.sqrt(np.maximum(np.add.outer(query_norms, norms) - 2.0 * scores, 0.0))
+
+    def _rows(self, positions):
+        return self.exact.vectors[positions].astype(np.float32, copy=False)
+
+    def _to(self, query, query_norm, positions):
+        # Distances from one prepared query to the stored vectors at `positions`
+        return self._pairwise(query[None, :], self._rows(positions), np.array([query_norm]),
+                              self.exact.norms[positions])[0]
+
+    # Build
+
+    def _kmeans(self, vectors, clusters, rounds=5):
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), clusters * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=clusters, replace=False)].copy()
+        for _ in range(rounds):
+            assignment = self._nearest_centroids(sample, centroids, 1)[:, 0]
+            for c in range(clusters):
+                members = sample[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            if self.metric == "cosine":
+                centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        return centroids
+
+    def _nearest_centroids(self, vectors, centroids, count, block=8192):
+        count = min(count, len(centroids))
+        nearest = np.empty((len(vectors), count), dtype=np.int64)
+        centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        for start in range(0, len(vectors), block):
+            part = vectors[start:start + block]
+            distances = self._pairwise(part, centroids, np.einsum("ij,ij->i", part, part), centroid_norms)
+            top = np.argpartition(distances, count - 1, axis=1)[:, :count]
+            order = np.argsort(np.take_along_axis(distances, top, axis=1), axis=1)
+            nearest[start:start + block] = np.take_along_axis(top, order, axis=1)
+        return nearest
+
+    def _prune(self, node, candidates, distances):
+        """
+        Vamana robust prune: keep at most `degree` diverse neighbors of `node`.
+        """
+        candidates, first = np.unique(candidates, return_index=True)
+        distances = distances[first]
+        keep = candidates != node
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        candidates, distances = candidates[order], distances[order]
+        if len(candidates) == 0 or self.metric == "dot":
+            # Dot "distances" are not a metric (they can be negative): keep the closest candidates
+            return candidates[:self.degree]
+        rows = self._rows(candidates)
+        pair = self._pairwise(rows, rows, self.exact.norms[candidates], self.exact.norms[candidates])
+        alive = np.ones(len(candidates), dtype=bool)
+        chosen = []
+        for i in range(len(candidates)):
+            if not alive[i]:
+                continue
+            chosen.append(i)
+            if len(chosen) == self.degree:
+                break
+            alive &= self.alpha * pair[i] > distances
+        return candidates[chosen]
+
+    def _set_neighbors(self, node, neighbors):
+        self.graph[node] = -1
+        self.graph[node, :len(neighbors)] = neighbors
+
+    def _neighbors(self, node):
+        row = self.graph[node]
+        return row[row >= 0]
+
+    def _add_reverse_edges(self, nodes):
+        """
+        Add the reverse of every out-edge of `nodes`; each node receiving edges is pruned
+        at most once, when its neighbor list overflows.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        sources = np.repeat(nodes, self.degree)
+        targets = self.graph[nodes].ravel().astype(np.int64)
+        keep = targets >= 0
+        sources, targets = sources[keep], targets[keep]
+        order = np.argsort(targets, kind="stable")
+        sources, targets = sources[order], targets[order]
+        receivers, starts = np.unique(targets, return_index=True)
+        for target, incoming in zip(receivers, np.split(sources, starts[1:])):
+            current = self._neighbors(target)
+            incoming = np.setdiff1d(incoming, current)
+            if len(incoming) == 0:
+                continue
+            if len(current) + len(incoming) <= self.degree:
+                self.graph[target, len(current):len(current) + len(incoming)] = incoming
+            else:
+                candidates = np.concatenate([current, incoming])
+                distances = self._to(self._rows([target])[0], self.exact.norms[target], candidates)
+                self._set_neighbors(target, self._prune(target, candidates, distances))
+
+    def build(self, vectors, block=2048):
+        """
+        Index `vectors` from scratch.
+        """
+        self.exact = ExactIndex(vectors, metric=self.metric, dtype=self.exact.dtype)
+        n = len(self.exact)
+        prepared = self.exact.vectors.astype(np.float32, copy=False)
+        norms = self.exact.norms
+        self.graph = np.full((n, self.degree), -1, dtype=np.int32)
+        if n == 0:
+            return self
+        clusters = max(1, int(np.sqrt(n)))
+        self.centroids = self._kmeans(prepared, clusters)
+        assignment = self._nearest_centroids(prepared, self.centroids, self.probes)
+
+        per_node = max(2 * self.degree, self.build_breadth)
+        candidate_ids = [[] for _ in range(n)]
+        candidate_distances = [[] for _ in range(n)]
+        for c in range(len(self.centroids)):
+            members = np.flatnonzero((assignment == c).any(axis=1))
+            if len(members) < 2:
+                continue
+            keep = min(per_node + 1, len(members))
+            # Blocks of rows bound the memory of the distance matrix for large clusters
+            for start in range(0, len(members), block):
+                rows = members[start:start + block]
+                distances = self._pairwise(prepared[rows], prepared[members], norms[rows], norms[members])
+                nearest = np.argpartition(distances, keep - 1, axis=1)[:, :keep]
+                for row, node in enumerate(rows):
+                    candidate_ids[node].append(members[nearest[row]])
+                    candidate_distances[node].append(distances[row, nearest[row]])
+
+        for node in range(n):
+            if candidate_ids[node]:
+                self._set_neighbors(node, self._prune(node, np.concatenate(candidate_ids[node]),
+                                                      np.concatenate(candidate_distances[node])))
+            candidate_ids[node] = candidate_distances[node] = None
+        self._add_reverse_edges(np.arange(n))
+
+        # Entry points: the vector closest to each cluster center
+        self.entries = np.array([self._nearest_centroids(c[None, :], prepared, 1)[0, 0] for c in self.centroids],
+                                dtype=np.int32)
+        return self
+
+    def insert(self, vectors):
+        """
+        Add vectors to the index; their positions continue after the existing ones.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if len(self) == 0:
+            return self.build(vectors)
+        start = len(self)
+        self.exact = ExactIndex.from_arrays(np.asarray(self.exact.vectors), np.asarray(self.exact.norms), self.metric)
+        self.exact.add(vectors)
+        self.graph = np.concatenate([self.graph, np.full((len(vectors), self.degree), -1, dtype=np.int32)])
+        for node in range(start, len(self)):
+            query = self._rows([node])[0]
+            visited, distances = self._beam_search(query, self.exact.norms[node], self.build_breadth, limit=node)
+            neighbors = self._prune(node, visited, distances)
+            self._set_neighbors(node, neighbors)
+            self._add_reverse_edges([node])
+        return self
+
+    # Search
+
+    def _start(self, query, query_norm):
+        if len(self.centroids) == 0:
+            return np.array([0], dtype=np.int32)
+        centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        distances = self._pairwise(query[None, :], self.centroids, np.array([query_norm]), centroid_norms)[0]
+        count = min(self.entry_points, len(distances))
+        return np.unique(self.entries[np.argpartition(distances, count - 1)[:count]])
+
+    def _beam_search(self, query, query_norm, breadth, limit=None):
+        """
+        Greedy beam search. Returns every visited node and its distance; with `limit`, only
+        nodes below that position are considered (used while inserting).
+        """
+        start = self._start(query, query_norm)
+        if limit is not None:
+            start = start[start < limit]
+            if len(start) == 0:
+                start = np.array([0], dtype=np.int32)
+        visited = set(start.tolist())
+        distances = self._to(query, query_norm, start)
+        beam = sorted(zip(distances.tolist(), start.tolist()))[:breadth]
+        seen_ids = list(start.tolist())
+        seen_distances = list(distances.tolist())
+        expanded = set()
+        while True:
+            node = next((n for _, n in beam if n not in expanded), None)
+            if node is None:
+                break
+            expanded.add(node)
+            neighbors = [n for n in self._neighbors(node).tolist() if n not in visited and (limit is None or n < limit)]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+            distances = self._to(query, query_norm, neighbors).tolist()
+            seen_ids.extend(neighbors)
+            seen_distances.extend(distances)
+            for distance, neighbor in zip(distances, neighbors):
+                if len(beam) < breadth or distance < beam[-1][0]:
+                    bisect.insort(beam, (distance, neighbor))
+                    if len(beam) > breadth:
+                        beam.pop()
+        return np.array(seen_ids, dtype=np.int64), np.array(seen_distances, dtype=np.float32)
+
+    def search(self, queries, k, breadth=None):
+        """
+        Approximate top-k for each query, same shape as ExactIndex.search:
+        (positions, distances), two (n_queries, k) arrays sorted by distance.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.metric == "cosine":
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            queries = queries / norms
+        k = min(k, len(self))
+        breadth = max(breadth or self.breadth, k)
+        positions = np.full((len(queries), k), -1, dtype=np.int64)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        if k == 0:
+            return positions, distances
+        for i, query in enumerate(queries):
+            ids, found = self._beam_search(query, float(query @ query), breadth)
+            order = np.argsort(found, kind="stable")[:k]
+            positions[i, :len(order)] = ids[order]
+            distances[i, :len(order)] = found[order]
+        return positions, distances
+
+    # Persistence
+
+    def save(self, path):
+        """
+        Write the index to the directory `path` as .npy arrays plus a small JSON header.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.exact.vectors)
+        np.save(os.path.join(path, "norms.npy"), self.exact.norms)
+        np.save(os.path.join(path, "graph.npy"), self.graph)
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "entries.npy"), self.entries)
+        with open(os.path.join(path, "index.json"), "w") as f:
+            json.dump({"metric": self.metric, "degree": self.degree, "alpha": self.alpha, "breadth": self.breadth,
+                       "build_breadth": self.build_breadth, "probes": self.probes,
+                       "entry_points": self.entry_points, "seed": self.seed}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Open an index written by `save`. With `mmap`, the vectors and the graph are
+        memory-mapped instead of read, so opening is instant and pages load on demand;
+        `insert` then copies them into memory.
+        """
+        with open(os.path.join(path, "index.json")) as f:
+            settings = json.load(f)
+        mode = "r" if mmap else None
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        index = cls(metric=settings.pop("metric"), dtype=vectors.dtype, **settings)
+        index.exact = ExactIndex.from_arrays(vectors, np.load(os.path.join(path, "norms.npy")), index.metric)
+        index.graph = np.load(os.path.join(path, "graph.npy"), mmap_mode=mode)
+        index.centroids = np.load(os.path.join(path, "centroids.npy"))
+        index.entries = np.load(os.path.join(path, "entries.npy"))
+        return index
+
+
+def table_signature(conn, table, version="row_version"):
+    """
+    Signature of the content of `table` from its `version` column (a ROWVERSION, which SQL
+    Server bumps on every insert and update): server, database, row count and the highest
+    row version. Rows updated in place or deleted and inserted again raise the highest
+    version, deletes lower the count; with an index on the column both are read from that
+    index. None if the table has no such column, so its content cannot be tracked.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COL_LENGTH(?, ?)", table, version)
+        if cursor.fetchone()[0] is None:
+            return None
+        cursor.execute(f"SELECT @@SERVERNAME, DB_NAME(), COUNT_BIG(*), CONVERT(BIGINT, MAX({version})) FROM {table}")
+        return list(cursor.fetchone())
+    finally:
+        cursor.close()
+
+
+def load_graph_table(conn, path, table, columns, vector, dimensions, element_type="float32", metric="cosine",
+                     dtype=np.float32, version="row_version", **index_args):
+    """
+    LocalTable backed by a GraphIndex persisted in the directory `path` (next to the data).
+    The saved index is reused while the table's `table_signature` over its `version`
+    column and the load and index settings are those it was built from; otherwise (or
+    when the table has no such column) the table is loaded, indexed and saved again.
+    """
+    signature = table_signature(conn, table, version)
+    source = json.loads(json.dumps({
+        "signature": signature, "table": table, "columns": list(columns),
+        "vector": vector, "dimensions": dimensions, "element_type": element_type, "metric": metric,
+        "dtype": np.dtype(dtype).name, "index": index_args}, default=str))
+    header = os.path.join(path, "source.json")
+    if signature is not None and os.path.exists(header) and os.path.exists(os.path.join(path, "rows.json")):
+        with open(header) as f:
+            if json.load(f) == source:
+                return LocalTable.open(path, GraphIndex)
+    local = LocalTable.load(conn, table, columns, vector, dimensions, element_type, metric, dtype,
+                            index_factory=lambda matrix, metric, dtype: GraphIndex(matrix, metric, dtype, **index_args))
+    # The header goes last, so an interrupted save is never taken for a current index
+    if os.path.exists(header):
+        os.remove(header)
+    local.save(path)
+    with open(header, "w") as f:
+        json.dump(source, f)
+    return local
@@ -0,0 +1,161 @@
+"""
+Semantic cache of generated answers.
+
+Near-identical questions ("best coffee?", "best coffee brand?") have query embeddings
+with a cosine similarity close to 1 and usually retrieve the same rows. AnswerCache
+stores (query embedding, retrieved row ids, answer) and serves the stored answer to a new
+question whose embedding is within `threshold` of a cached one and whose search returned
+the same set of rows, so the answer is still grounded in the same data. Entries expire
+after `ttl` seconds and the least recently used ones are evicted above `max_entries`.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def result_ids(rows, columns):
+    """
+    Stable ids for search result rows: a hash of the values at the `columns` positions of each
+    row. Use columns that identify the row, not the similarity score, which depends on the query.
+    """
+    return frozenset(
+        hashlib.sha1("\x1f".join(str(row[c]) for c in columns).encode("utf-8")).hexdigest()[:16]
+        for row in rows
+    )
+
+
+def answer_scope(model, system_prompt, *settings):
+    """
+    Scope of the answers generated by the chat deployment `model` with `system_prompt` and the
+    other `settings` that shape them (e.g. the context token budget), so changing any of them
+    never serves an answer produced under the old ones.
+    """
+    prompt = hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()[:16]
+    return ":".join([model, prompt, *(str(setting) for setting in settings)])
+
+
+class CachedAnswer:
+    """
+    A cache hit: the stored `answer`, the cosine `similarity` between the new and the cached
+    question, the cached `question` text and the entry's `age` in seconds.
+    """
+
+    def __init__(self, answer, similarity, question, age):
+        self.answer = answer
+        self.similarity = similarity
+        self.question = question
+        self.age = age
+
+    def __repr__(self):
+        return f"CachedAnswer(similarity={self.similarity:.3f}, question={self.question!r}, age={self.age:.0f}s)"
+
+
+class AnswerCache:
+    """
+    Thread-safe, in-process semantic answer cache. Entries are looked up by cosine
+    similarity of the query embedding (one matrix-vector product over all entries) and are
+    only served when the retrieved ids match exactly. `scope` separates answers that must
+    not be mixed, e.g. different models or prompts.
+    """
+
+    def __init__(self, threshold=0.95, ttl=3600, max_entries=512, clock=time.monotonic):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._next_key = 0
+        # Embeddings live in the rows ("slots") of one preallocated matrix; `_slots[i]` is the
+        # key of the entry in row i, or None for a free row
+        self._matrix = None
+        self._slots = []
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "changed_results": 0, "expired": 0, "evicted": 0}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @staticmethod
+    def _normalized(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key):
+        self._slots[self._entries.pop(key)["slot"]] = None
+
+    def _expire(self):
+        if self.ttl is None:
+            return
+        deadline = self.clock() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry["created"] < deadline]
+        for key in expired:
+            self._remove(key)
+        self.stats["expired"] += len(expired)
+
+    def lookup(self, embedding, ids, scope=None):
+        """
+        The CachedAnswer of the most similar cached question at or above `threshold`, in
+        the same `scope` and with the same retrieved `ids`, or None.
+        """
+        query = self._normalized(embedding)
+        ids = frozenset(ids)
+        with self._lock:
+            self._expire()
+            if not self._entries or self._matrix.shape[1] != len(query):
+                self.stats["misses"] += 1
+                return None
+            similarities = self._matrix @ query
+            similar = False
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            for slot in candidates[np.argsort(-similarities[candidates])]:
+                key = self._slots[slot]
+                if key is None:
+                    continue
+                similarity = float(similarities[slot])
+                entry = self._entries[key]
+                if entry["scope"] != scope:
+                    continue
+                similar = True
+                if entry["ids"] == ids:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return CachedAnswer(entry["answer"], similarity, entry["question"], self.clock() - entry["created"])
+            # A similar question whose search now returns other rows (new data, other k)
+            self.stats["changed_results" if similar else "misses"] += 1
+            return None
+
+    def store(self, embedding, ids, answer, scope=None, question=None):
+        """
+        Cache `answer` for a question (its embedding and optionally its text) and the ids of
+        the rows it was generated from.
+        """
+        vector = self._normalized(embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != len(vector):
+                # First entry (or another embedding size): start over with an empty matrix
+                self._entries.clear()
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._slots = [None] * self.max_entries
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evicted"] += 1
+            slot = self._slots.index(None)
+            key = self._next_key
+            self._next_key += 1
+            self._matrix[slot] = vector
+            self._slots[slot] = key
+            self._entries[key] = {"ids": frozenset(ids), "answer": answer, "scope": scope, "question": question,
+                                  "created": self.clock(), "slot": slot}
+
+    def clear(self, scope=None):
+        """
+        Drop every entry, or only those of `scope`.
+        """
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if scope is None or e["scope"] == scope]:
+                self._remove(key)
@@ -0,0 +1,107 @@
+import struct
+import threading
+import time
+
+SQL_COPT_SS_ACCESS_TOKEN = 1256  # This connection option is defined by microsoft in msodbcsql.h
+DATABASE_SCOPE = "https://database.windows.net/.default"
+
+
+def pack_access_token(token):
+    """
+    Pack an access token into the structure expected by SQL_COPT_SS_ACCESS_TOKEN.
+    """
+    token_bytes = token.encode("UTF-16-LE")
+    return struct.pack(f'<I{len(token_bytes)}s', len(token_bytes), token_bytes)
+
+
+class AccessTokenProvider:
+    """
+    Caches the packed Entra ID access token used to open SQL connections.
+
+    The token is fetched once from `credential` (any azure-identity credential, or a
+    fake in tests) and reused until it gets within `refresh_margin` seconds of expiry.
+    A background timer refreshes it ahead of time, so connection opens normally never
+    wait for token acquisition. Concurrent callers that do need a token share a
+    single in-flight refresh; if that refresh fails, the cached token is served until
+    it actually expires.
+    """
+
+    def __init__(self, credential, scope=DATABASE_SCOPE, refresh_margin=300.0, background_refresh=True, clock=time.time):
+        self.credential = credential
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._token_struct = None
+        self._expires_on = 0.0
+        self._timer = None
+        self._closed = False
+        self.refreshes = 0
+
+    def _valid(self):
+        return self._token_struct is not None and self.clock() < self._expires_on - self.refresh_margin
+
+    def _schedule(self):
+        if not self.background_refresh or self._closed:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        remaining = self._expires_on - self.clock()
+        # Tokens shorter-lived than the margin are refreshed halfway through, never in a tight loop
+        delay = max(1.0, remaining - self.refresh_margin, remaining / 2)
+        self._timer = threading.Timer(delay, self._background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background(self):
+        try:
+            self.refresh()
+        except Exception:
+            # The next token_struct() call retries synchronously
+            pass
+
+    def _fetch(self):
+        # Called with the lock held
+        token = self.credential.get_token(self.scope)
+        self._token_struct = pack_access_token(token.token)
+        self._expires_on = float(token.expires_on)
+        self.refreshes += 1
+        self._schedule()
+        return self._token_struct
+
+    def refresh(self):
+        """
+        Fetch a new token now, regardless of the cached one.
+        """
+        with self._lock:
+            return self._fetch()
+
+    def token_struct(self):
+        """
+        Packed token for SQL_COPT_SS_ACCESS_TOKEN, fetched only when the cached one is near expiry.
+        """
+        if self._valid():
+            return self._token_struct
+        with self._lock:
+            # Another caller may have refreshed the token while we waited for the lock
+            if self._valid():
+                return self._token_struct
+            try:
+                return self._fetch()
+            except Exception:
+                # Within the refresh margin the cached token still works: serve it until it expires
+                if self._token_struct is not None and self.clock() < self._expires_on:
+                    return self._token_struct
+                raise
+
+    def attrs_before(self):
+        """
+        `attrs_before` argument for pyodbc.connect.
+        """
+        return {SQL_COPT_SS_ACCESS_TOKEN: self.token_struct()}
+
+    def close(self):
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
@@ -0,0 +1,95 @@
+import itertools
+import time
+
+
+class BulkLoadResult:
+    """
+    Outcome of a bulk load: row counts, per-batch errors and throughput.
+    """
+
+    def __init__(self):
+        self.rows_inserted = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_inserted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return (f"BulkLoadResult(rows_inserted={self.rows_inserted}, rows_failed={self.rows_failed}, "
+                f"batches={self.batches}, rows_per_second={self.rows_per_second:.0f})")
+
+
+class BulkLoader:
+    """
+    Streams rows into a table in batches through `executemany`.
+
+    With pyodbc, `fast_executemany` sends each batch as one parameter array, so a batch
+    costs a single round-trip instead of one per row. Every batch is committed on its
+    own: a failing batch is rolled back and reported in the result without undoing the
+    batches already loaded. With `isolate_failures=True` the rows of a failed batch are
+    retried one at a time, so only the bad rows are reported and skipped.
+    """
+
+    def __init__(self, conn, insert_sql, batch_size=1000, fast_executemany=True, isolate_failures=False, progress=None):
+        self.conn = conn
+        self.insert_sql = insert_sql
+        self.batch_size = batch_size
+        self.fast_executemany = fast_executemany
+        self.isolate_failures = isolate_failures
+        self.progress = progress
+
+    def _cursor(self):
+        cursor = self.conn.cursor()
+        if self.fast_executemany and hasattr(cursor, "fast_executemany"):
+            cursor.fast_executemany = True
+        return cursor
+
+    def _load_rows_individually(self, cursor, batch, first_row, result):
+        for offset, row in enumerate(batch):
+            try:
+                cursor.execute(self.insert_sql, row)
+                self.conn.commit()
+                result.rows_inserted += 1
+            except Exception as e:
+                self.conn.rollback()
+                result.rows_failed += 1
+                result.errors.append(f"Row {first_row + offset}: {e}")
+
+    def load(self, rows):
+        """
+        Insert every row (a sequence of parameters) from the iterable `rows` and return a BulkLoadResult.
+        """
+        result = BulkLoadResult()
+        cursor = self._cursor()
+        start = time.perf_counter()
+        iterator = iter(rows)
+        first_row = 0
+        try:
+            while True:
+                batch = list(itertools.islice(iterator, self.batch_size))
+                if not batch:
+                    break
+                try:
+                    cursor.executemany(self.insert_sql, batch)
+                    self.conn.commit()
+                    result.rows_inserted += len(batch)
+                except Exception as e:
+                    self.conn.rollback()
+                    if self.isolate_failures:
+                        self._load_rows_individually(cursor, batch, first_row, result)
+                    else:
+                        result.rows_failed += len(batch)
+                        result.errors.append(f"Rows {first_row}-{first_row + len(batch) - 1}: {e}")
+                result.batches += 1
+                first_row += len(batch)
+                result.elapsed = time.perf_counter() - start
+                if self.progress is not None:
+                    self.progress(result)
+        finally:
+            cursor.close()
+        result.elapsed = time.perf_counter() - start
+        return result
@@ -0,0 +1,327 @@
+"""
+Embedding updates off the write path.
+
+The trigger of Embeddings/T-SQL/04-update-embeddings-with-trigger.sql calls the embedding
+endpoint once per changed row, inside the transaction that changed it. With
+05-queue-embeddings-for-worker.sql the trigger only records the changed keys in a queue
+table, and `EmbeddingWorker` polls that queue: it claims up to `batch_size` rows, embeds
+their text with one batched, concurrent `embed` call (e.g. `EmbeddingClient.embed`) and
+writes the vectors back with one set-based UPDATE from a temp table.
+
+Every queue row has a `version` that the trigger bumps on each change. A vector is only
+written, and its queue row only removed, if the version is still the one that was
+claimed, so a row changed again while it was being embedded is simply embedded again.
+Claims are leases: rows of a worker that died are claimed again once the lease expires,
+and rows that failed `max_attempts` times are left in the queue with their last error.
+"""
+import itertools
+import threading
+import time
+
+
+class WorkerStats:
+    """
+    Counters of an EmbeddingWorker: rows claimed, vectors written, vectors discarded because
+    the row changed again (`stale`), rows whose batch failed, batches and the last errors.
+    """
+
+    def __init__(self):
+        self.claimed = 0
+        self.written = 0
+        self.stale = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.written / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return (f"WorkerStats(claimed={self.claimed}, written={self.written}, stale={self.stale}, "
+                f"failed={self.failed}, batches={self.batches}, rows_per_second={self.rows_per_second:.0f})")
+
+
+class EmbeddingWorker:
+    """
+    Drains a change queue (SqlChangeQueue or MemoryChangeQueue): claims batches of changed
+    rows, embeds their text with `embed(texts)` and writes the vectors back in bulk. Rows
+    whose text is empty or NULL get a NULL vector without being sent to the model.
+    """
+
+    def __init__(self, queue, embed, batch_size=500, max_attempts=5, lease=300, poll_interval=1.0):
+        self.queue = queue
+        self.embed = embed
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.stats = WorkerStats()
+
+    def run_once(self):
+        """
+        Process one batch; returns the number of rows claimed (0 when the queue is empty).
+        """
+        start = time.perf_counter()
+        claimed = self.queue.claim(self.batch_size, self.max_attempts, self.lease)
+        if not claimed:
+            return 0
+        self.stats.claimed += len(claimed)
+        self.stats.batches += 1
+        try:
+            texts = [text for _, _, text in claimed if text and text.strip()]
+            vectors = iter(self.embed(texts) if texts else [])
+            done = [(key, version, next(vectors) if text and text.strip() else None) for key, version, text in claimed]
+            written = self.queue.complete(done)
+        except Exception as e:
+            self.queue.fail([(key, version) for key, version, _ in claimed], repr(e))
+            self.stats.failed += len(claimed)
+            self.stats.errors = (self.stats.errors + [repr(e)])[-10:]
+        else:
+            self.stats.written += written
+            self.stats.stale += len(claimed) - written
+        self.stats.elapsed += time.perf_counter() - start
+        return len(claimed)
+
+    def run(self, stop=None, until_empty=False):
+        """
+        Poll the queue until `stop` (a threading.Event) is set, or, with `until_empty`, until
+        a poll finds nothing to do. Returns the WorkerStats.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            if self.run_once() == 0:
+                if until_empty:
+                    break
+                stop.wait(self.poll_interval)
+        return self.stats
+
+
+class SqlChangeQueue:
+    """
+    The queue table of 05-queue-embeddings-for-worker.sql on a pyodbc connection: one row
+    per changed `key` of `table` with its `version`, `attempts`, lease (`claimed_until`) and
+    `last_error`. Vectors go to the `vector` column (shaped by `config`, a VectorConfig)
+    and, if `status` is set, a JSON status like the trigger's to that column.
+    """
+
+    def __init__(self, conn, table, queue_table, config, key="id", text="content", vector="embedding",
+                 status="vectors_update_info", key_type="INT", batch_size=500):
+        self.conn = conn
+        self.table = table
+        self.queue_table = queue_table
+        self.config = config
+        self.key = key
+        self.text = text
+        self.vector = vector
+        self.status = status
+        self.key_type = key_type
+        self.batch_size = batch_size
+
+    def _status(self, status):
+        return f", t.{self.status} = JSON_OBJECT('status':'{status}', 'timestamp':CURRENT_TIMESTAMP)" if self.status else ""
+
+    def _execute(self, sql, *params):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, *params)
+            rows = cursor.fetchall()
+            self.conn.commit()
+            return rows
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def claim(self, limit, max_attempts, lease):
+        """
+        Lease up to `limit` queued rows (oldest first, skipping rows locked or leased by
+        other workers) and return their (key, version, text).
+        """
+        rows = self._execute(f"""
+        SET NOCOUNT ON;
+        DECLARE @claimed TABLE (k {self.key_type} PRIMARY KEY, ver BIGINT);
+        WITH next AS (
+            SELECT TOP (?) * FROM {self.queue_table} WITH (ROWLOCK, UPDLOCK, READPAST)
+            WHERE attempts < ? AND (claimed_until IS NULL OR claimed_until < SYSUTCDATETIME())
+            ORDER BY enqueued_at
+        )
+        UPDATE next SET claimed_until = DATEADD(second, ?, SYSUTCDATETIME()), attempts = attempts + 1
+        OUTPUT inserted.{self.key}, inserted.version INTO @claimed;
+        SELECT c.k, c.ver, t.{self.text} FROM @claimed AS c LEFT JOIN {self.table} AS t ON t.{self.key} = c.k;
+        """, limit, max_attempts, int(lease))
+        return [(row[0], row[1], row[2]) for row in rows]
+
+    def complete(self, done):
+        """
+        Write the (key, version, vector) results of a batch and remove their queue rows, except
+        for rows whose version changed since they were claimed; returns the number written.
+        """
+        # Rows with a vector go first: fast_executemany takes the parameter types from the first row
+        done = sorted(done, key=lambda row: row[2] is None)
+        cursor = self.conn.cursor()
+        if hasattr(cursor, "fast_executemany"):
+            cursor.fast_executemany = True
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS #done; CREATE TABLE #done (k {self.key_type} PRIMARY KEY, "
+                           f"ver BIGINT, v {self.config.sql_type} NULL);")
+            rows = ((key, version, None if vector is None else self.config.encode(vector)) for key, version, vector in done)
+            while True:
+                batch = list(itertools.islice(rows, self.batch_size))
+                if not batch:
+                    break
+                cursor.executemany(f"INSERT INTO #done VALUES (?, ?, {self.config.parameter()})", batch)
+            cursor.execute(f"""
+            SET NOCOUNT ON;
+            DECLARE @written INT;
+            UPDATE t SET t.{self.vector} = d.v{self._status('updated')}
+            FROM {self.table} AS t
+            INNER JOIN #done AS d ON t.{self.key} = d.k
+            INNER JOIN {self.queue_table} AS q ON q.{self.key} = d.k AND q.version = d.ver;
+            SET @written = @@ROWCOUNT;
+            DELETE q FROM {self.queue_table} AS q INNER JOIN #done AS d ON q.{self.key} = d.k AND q.version = d.ver;
+            UPDATE q SET claimed_until = NULL FROM {self.queue_table} AS q INNER JOIN #done AS d ON q.{self.key} = d.k;
+            DROP TABLE #done;
+            SELECT @written;
+            """)
+            written = cursor.fetchone()[0]
+            self.conn.commit()
+            return written
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def fail(self, claimed, error):
+        """
+        Release the (key, version) rows of a failed batch with `error`; they are retried
+        until they reach the worker's `max_attempts`.
+        """
+        cursor = self.conn.cursor()
+        if hasattr(cursor, "fast_executemany"):
+            cursor.fast_executemany = True
+        try:
+            # A row changed since it was claimed is released too, without the error of the old version
+            cursor.executemany(f"UPDATE {self.queue_table} SET claimed_until = NULL, "
+                               f"last_error = CASE WHEN version = ? THEN ? ELSE last_error END "
+                               f"WHERE {self.key} = ?", [(version, error, key) for key, version in claimed])
+            if self.status:
+                cursor.executemany(f"UPDATE t SET {self._status('error')[2:]} FROM {self.table} AS t "
+                                   f"WHERE t.{self.key} = ?", [(key,) for key, _ in claimed])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def pending(self, max_attempts=None):
+        """
+        Number of queued rows, counting only those with fewer than `max_attempts` attempts if given.
+        """
+        where = "" if max_attempts is None else f" WHERE attempts < {int(max_attempts)}"
+        return self._execute(f"SELECT COUNT(*) FROM {self.queue_table}{where}")[0][0]
+
+
+# Local stand-ins
+
+class MemoryChangeQueue:
+    """
+    In-memory table with the queueing trigger, for tests and benchmarks: `insert` and
+    `update` change `rows` (key -> {"content", "embedding", "status"}) and enqueue the keys
+    like the trigger does, in one call for any number of rows. It implements the
+    SqlChangeQueue interface; `statements` counts the calls made to it.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.rows = {}
+        self.queue = {}
+        self.statements = 0
+        self._next_key = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _enqueue(self, key):
+        entry = self.queue.get(key)
+        if entry is None:
+            self.queue[key] = {"version": 1, "attempts": 0, "claimed_until": None, "last_error": None,
+                               "enqueued_at": self.clock()}
+        else:
+            # Changed again: a new version, with a fresh retry budget
+            entry.update(version=entry["version"] + 1, attempts=0, last_error=None)
+
+    def insert(self, contents):
+        """
+        Insert rows with the given contents; returns their keys.
+        """
+        with self._lock:
+            self.statements += 1
+            keys = []
+            for content in contents:
+                key = next(self._next_key)
+                self.rows[key] = {"content": content, "embedding": None, "status": None}
+                self._enqueue(key)
+                keys.append(key)
+            return keys
+
+    def update(self, contents):
+        """
+        Set the content of existing rows from a key -> content mapping; like the trigger,
+        only rows whose content differs are queued.
+        """
+        with self._lock:
+            self.statements += 1
+            for key, content in contents.items():
+                if self.rows[key]["content"] != content:
+                    self.rows[key]["content"] = content
+                    self._enqueue(key)
+
+    def claim(self, limit, max_attempts, lease):
+        with self._lock:
+            self.statements += 1
+            now = self.clock()
+            ready = [(entry["enqueued_at"], key) for key, entry in self.queue.items()
+                     if entry["attempts"] < max_attempts and (entry["claimed_until"] is None or entry["claimed_until"] < now)]
+            claimed = []
+            for _, key in sorted(ready)[:limit]:
+                entry = self.queue[key]
+                entry.update(claimed_until=now + lease, attempts=entry["attempts"] + 1)
+                row = self.rows.get(key)
+                claimed.append((key, entry["version"], row["content"] if row else None))
+            return claimed
+
+    def complete(self, done):
+        with self._lock:
+            self.statements += 1
+            written = 0
+            for key, version, vector in done:
+                entry = self.queue.get(key)
+                if entry is None:
+                    continue
+                if entry["version"] != version:
+                    entry["claimed_until"] = None
+                    continue
+                del self.queue[key]
+                if key in self.rows:
+                    self.rows[key].update(embedding=vector, status="updated")
+                    written += 1
+            return written
+
+    def fail(self, claimed, error):
+        with self._lock:
+            self.statements += 1
+            for key, version in claimed:
+                entry = self.queue.get(key)
+                if entry is not None:
+                    entry["claimed_until"] = None
+                    if entry["version"] == version:
+                        entry["last_error"] = error
+                if key in self.rows:
+                    self.rows[key]["status"] = "error"
+
+    def pending(self, max_attempts=None):
+        with self._lock:
+            return sum(1 for entry in self.queue.values() if max_attempts is None or entry["attempts"] < max_attempts)
@@ -0,0 +1,141 @@
+import functools
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import tiktoken
+
+_SENTENCE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n+|$)|[.!?\n]+")
+_PARAGRAPH = re.compile(r"(?:(?!\n[ \t]*\n).)+", re.DOTALL)
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(name="cl100k_base"):
+    """
+    tiktoken encoding, loaded once per process.
+    """
+    return tiktoken.get_encoding(name)
+
+
+def _resolve(encoding):
+    return get_encoding(encoding) if isinstance(encoding, str) else encoding
+
+
+class Chunk:
+    """
+    A piece of a document: its text, `[start, end)` character offsets into the source
+    text and its token count.
+    """
+
+    __slots__ = ("text", "start", "end", "tokens")
+
+    def __init__(self, text, start, end, tokens):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.tokens = tokens
+
+    def __repr__(self):
+        return f"Chunk(start={self.start}, end={self.end}, tokens={self.tokens})"
+
+
+def split_segments(text, boundary="sentence"):
+    """
+    (start, end) character spans of the sentences or paragraphs of `text`, or a single
+    span with `boundary=None`.
+    """
+    if boundary is None:
+        return [(0, len(text))] if text else []
+    pattern = {"sentence": _SENTENCE, "paragraph": _PARAGRAPH}.get(boundary)
+    if pattern is None:
+        raise ValueError(f"Unknown boundary '{boundary}', expected 'sentence', 'paragraph' or None")
+    return [m.span() for m in pattern.finditer(text) if m.group().strip()]
+
+
+def _split_long_segment(encoding, text, start, tokens, max_tokens):
+    # A segment above the budget is cut on token boundaries; one decode gives every token's offset
+    _, offsets = encoding.decode_with_offsets(tokens)
+    pieces = []
+    for i in range(0, len(tokens), max_tokens):
+        piece_end = offsets[i + max_tokens] if i + max_tokens < len(tokens) else len(text)
+        pieces.append((start + offsets[i], start + piece_end, len(tokens[i:i + max_tokens])))
+    return pieces
+
+
+def _trim(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def chunk_text(text, max_tokens=500, overlap=0, boundary="sentence", encoding="cl100k_base"):
+    """
+    Split `text` into chunks of at most `max_tokens` tokens that end on sentence (or paragraph)
+    boundaries; a single sentence longer than the budget is cut on token boundaries.
+    Consecutive chunks share up to `overlap` tokens of whole segments.
+
+    All segments are tokenized in one batch and chunk texts are slices of `text`, so no
+    decoding is needed and every chunk carries its character offsets into `text`.
+    """
+    if overlap >= max_tokens:
+        raise ValueError("overlap must be smaller than max_tokens")
+    encoding = _resolve(encoding)
+    spans = split_segments(text, boundary)
+    token_lists = encoding.encode_ordinary_batch([text[s:e] for s, e in spans])
+
+    segments = []  # (start, end, token count), none above max_tokens
+    for (start, end), tokens in zip(spans, token_lists):
+        if len(tokens) > max_tokens:
+            segments.extend(_split_long_segment(encoding, text[start:end], start, tokens, max_tokens))
+        else:
+            segments.append((start, end, len(tokens)))
+
+    chunks = []
+    window = []
+    window_tokens = 0
+    for segment in segments:
+        if window and window_tokens + segment[2] > max_tokens:
+            chunks.append(window)
+            # Carry the trailing segments that fit in the overlap over to the next chunk
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(window):
+                if carried_tokens + previous[2] > overlap or carried_tokens + previous[2] + segment[2] > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[2]
+            window, window_tokens = carried, carried_tokens
+        window.append(segment)
+        window_tokens += segment[2]
+    if window:
+        chunks.append(window)
+
+    result = []
+    for window in chunks:
+        start, end = _trim(text, window[0][0], window[-1][1])
+        # Segment token counts are summed; tokenization across a segment border can differ by a token
+        result.append(Chunk(text[start:end], start, end, sum(s[2] for s in window)))
+    return result
+
+
+def _chunk_batch(texts, max_tokens, overlap, boundary, encoding):
+    return [chunk_text(text, max_tokens, overlap, boundary, encoding) for text in texts]
+
+
+def chunk_documents(texts, max_tokens=500, overlap=0, boundary="sentence", encoding="cl100k_base",
+                    processes=None, batch_size=16):
+    """
+    Chunk many documents. With `processes` > 1 the documents are sent in batches of
+    `batch_size` to a process pool; each worker loads the encoding once. Returns one list
+    of Chunk per document, in input order.
+    """
+    texts = list(texts)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if not processes or processes <= 1 or len(batches) <= 1:
+        return _chunk_batch(texts, max_tokens, overlap, boundary, encoding)
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunks in executor.map(_chunk_batch, batches, *[[arg] * len(batches) for arg in (max_tokens, overlap, boundary, encoding)]):
+            results.extend(chunks)
+    return results
@@ -0,0 +1,142 @@
+"""
+Binary wire format for the SQL Server / Azure SQL `vector` type.
+
+A vector travels as VARBINARY: an 8-byte header followed by the little-endian
+element values.
+
+    byte 0     0xA9 (magic)
+    byte 1     0x01 (format version)
+    bytes 2-3  number of dimensions, uint16 little-endian
+    byte 4     element type: 0x00 float32, 0x01 float16
+    bytes 5-7  reserved, zero
+
+Sending this payload with `CAST(? AS VECTOR(n))` avoids formatting and parsing the
+~30 KB JSON text a 1536-dimensional vector takes, and reading a vector column as
+`CAST(col AS VARBINARY(8000))` lets it be decoded straight into numpy.
+Half-precision columns (`VECTOR(n, float16)`) use 2-byte elements, so payloads are
+half the size both ways.
+"""
+import struct
+
+import numpy as np
+
+VECTOR_MAGIC = 0xA9
+VECTOR_VERSION = 0x01
+HEADER_SIZE = 8
+
+ELEMENT_TYPES = {
+    0x00: np.dtype("<f4"),
+    0x01: np.dtype("<f2"),
+}
+ELEMENT_TYPE_NAMES = {
+    0x00: "float32",
+    0x01: "float16",
+}
+
+
+def element_dtype(element_type="float32"):
+    """
+    numpy dtype of a vector column element type ("float32" or "float16").
+    """
+    for code, name in ELEMENT_TYPE_NAMES.items():
+        if name == element_type:
+            return ELEMENT_TYPES[code]
+    raise ValueError(f"Unsupported vector element type '{element_type}', expected one of "
+                     f"{tuple(ELEMENT_TYPE_NAMES.values())}")
+
+
+def _element_type(dtype):
+    dtype = np.dtype(dtype)
+    for code, candidate in ELEMENT_TYPES.items():
+        if dtype == candidate:
+            return code
+    raise ValueError(f"Unsupported vector element type: {dtype}")
+
+
+def _header(dimensions, element_type):
+    return struct.pack("<BBHB3x", VECTOR_MAGIC, VECTOR_VERSION, dimensions, element_type)
+
+
+def encode_vector(vector, dtype=np.float32):
+    """
+    Encode one vector (list or numpy array) into the native binary payload.
+    """
+    values = np.asarray(vector, dtype=np.dtype(dtype).newbyteorder("<"))
+    if values.ndim != 1:
+        raise ValueError("encode_vector expects a one-dimensional vector")
+    return _header(values.shape[0], _element_type(values.dtype)) + values.tobytes()
+
+
+def encode_vectors(matrix, dtype=np.float32):
+    """
+    Encode every row of a 2-D array into binary payloads (one bytes object per row).
+    """
+    values = np.ascontiguousarray(matrix, dtype=np.dtype(dtype).newbyteorder("<"))
+    if values.ndim != 2:
+        raise ValueError("encode_vectors expects a two-dimensional array")
+    n, dimensions = values.shape
+    rows = np.empty((n, HEADER_SIZE + values.itemsize * dimensions), dtype=np.uint8)
+    rows[:, :HEADER_SIZE] = np.frombuffer(_header(dimensions, _element_type(values.dtype)), dtype=np.uint8)
+    rows[:, HEADER_SIZE:] = values.view(np.uint8).reshape(n, -1)
+    return [row.tobytes() for row in rows]
+
+
+def _parse_header(payload):
+    magic, version, dimensions, element_type = struct.unpack_from("<BBHB", payload)
+    if magic != VECTOR_MAGIC or version != VECTOR_VERSION:
+        raise ValueError("Payload is not a binary vector")
+    if element_type not in ELEMENT_TYPES:
+        raise ValueError(f"Unsupported vector element type code: {element_type}")
+    return dimensions, ELEMENT_TYPES[element_type]
+
+
+def decode_vector(payload):
+    """
+    Decode a binary vector payload into a numpy array of its stored element type.
+    """
+    dimensions, dtype = _parse_header(payload)
+    return np.frombuffer(payload, dtype=dtype, count=dimensions, offset=HEADER_SIZE)
+
+
+def decode_vectors(payloads, dtype=np.float32):
+    """
+    Decode many payloads of the same shape into one contiguous (n, dimensions) array of `dtype`.
+    """
+    payloads = list(payloads)
+    if not payloads:
+        return np.empty((0, 0), dtype=dtype)
+    dimensions, stored = _parse_header(payloads[0])
+    width = HEADER_SIZE + stored.itemsize * dimensions
+    buffer = np.frombuffer(b"".join(payloads), dtype=np.uint8)
+    if buffer.size != width * len(payloads):
+        raise ValueError("All vectors must have the same dimensions and element type")
+    rows = buffer.reshape(len(payloads), width)
+    if (rows[:, :HEADER_SIZE] != rows[0, :HEADER_SIZE]).any():
+        raise ValueError("All vectors must have the same dimensions and element type")
+    return rows[:, HEADER_SIZE:].copy().view(stored).astype(dtype, copy=False)
+
+
+def vector_type(dimensions, element_type="float32"):
+    """
+    SQL type of a vector column: VECTOR(1536), or VECTOR(1536, float16) for half precision.
+    """
+    element_dtype(element_type)
+    if element_type == "float32":
+        return f"VECTOR({dimensions})"
+    return f"VECTOR({dimensions}, {element_type})"
+
+
+def vector_parameter(dimensions, element_type="float32"):
+    """
+    SQL expression that turns a binary parameter into a vector, e.g. CAST(? AS VECTOR(1536)).
+    The payload must be encoded with the same element type (`element_dtype(element_type)`).
+    """
+    return f"CAST(? AS {vector_type(dimensions, element_type)})"
+
+
+def vector_column(column, dimensions, element_type="float32"):
+    """
+    SQL expression that reads a vector column as a binary payload for decode_vector(s).
+    """
+    size = HEADER_SIZE + dimensions * element_dtype(element_type).itemsize
+    return f"CAST({column} AS VARBINARY({size}))"
@@ -0,0 +1,142 @@
+"""
+Token-budgeted prompt context from search results.
+
+ContextBuilder takes the result rows in rank order, drops rows whose text nearly
+duplicates a row already taken (word-shingle Jaccard similarity), and adds the rest in a
+compact, fixed format until the token budget is used up; the row that does not fit is
+cut at a token boundary if enough of the budget is left, and packing stops there.
+Tokens are counted with the same tiktoken encoding as the chunker.
+"""
+import re
+
+from .chunking import get_encoding
+from .embeddings import estimate_tokens
+
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text, size=3):
+    """
+    The set of `size`-word sequences of the lowercased text (the words themselves for short texts).
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class PackedContext:
+    """
+    The prompt `text`, its `tokens`, the rows that went in (`used`, in rank order), and the
+    number of rows dropped as near-duplicates or for lack of budget; `truncated` tells
+    whether the last row was cut.
+    """
+
+    def __init__(self, text, tokens, used, duplicates, dropped, truncated):
+        self.text = text
+        self.tokens = tokens
+        self.used = used
+        self.duplicates = duplicates
+        self.dropped = dropped
+        self.truncated = truncated
+
+    def __repr__(self):
+        return (f"PackedContext({len(self.used)} rows, {self.tokens} tokens, {self.duplicates} duplicates, "
+                f"{self.dropped} over budget{', last truncated' if self.truncated else ''})")
+
+
+class ContextBuilder:
+    """
+    Packs search result rows (dicts) into at most `max_tokens` tokens.
+
+    Each row becomes one block: a header line "[rank] Label: value | Label: value" built
+    from `fields` (a list of (label, key) pairs; floats are rounded to `precision` digits)
+    followed by "<text_label>: <row[text]>". Blocks are separated by a blank line.
+
+    - `max_item_tokens`: longest text kept for a single row (None: no per-row limit)
+    - `min_item_tokens`: a row that overflows the budget is cut if at least this many
+      text tokens still fit, otherwise packing stops before it
+    - `duplicate_threshold`: rows whose text has a shingle Jaccard similarity at least
+      this high with a row already taken are skipped (None disables the check)
+    - `encoding`: tiktoken encoding name or object; None estimates 4 characters per token
+    """
+
+    def __init__(self, fields, text, text_label="Text", max_tokens=3000, max_item_tokens=None,
+                 min_item_tokens=32, duplicate_threshold=0.8, precision=3, encoding="cl100k_base"):
+        self.fields = list(fields)
+        self.text = text
+        self.text_label = text_label
+        self.max_tokens = max_tokens
+        self.max_item_tokens = max_item_tokens
+        self.min_item_tokens = min_item_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.precision = precision
+        self.encoding = encoding
+
+    def _encoding(self):
+        return get_encoding(self.encoding) if isinstance(self.encoding, str) else self.encoding
+
+    def count_tokens(self, text):
+        encoding = self._encoding()
+        return estimate_tokens(text) if encoding is None else len(encoding.encode_ordinary(text))
+
+    def cut(self, text, max_tokens):
+        """
+        `text` shortened to at most `max_tokens` tokens.
+        """
+        encoding = self._encoding()
+        if encoding is None:
+            return text if estimate_tokens(text) <= max_tokens else text[:max(max_tokens - 1, 0) * 4]
+        tokens = encoding.encode_ordinary(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+    def _value(self, value):
+        if isinstance(value, float):
+            return f"{value:.{self.precision}f}"
+        return " ".join(str(value).split())
+
+    def header(self, rank, row):
+        return f"[{rank}] " + " | ".join(f"{label}: {self._value(row[key])}" for label, key in self.fields)
+
+    def build(self, rows):
+        """
+        Pack `rows` (best first) and return a PackedContext.
+        """
+        blocks, used, taken = [], [], []
+        tokens = duplicates = 0
+        truncated = False
+        rows = list(rows)
+        for position, row in enumerate(rows):
+            text = " ".join(str(row[self.text]).split())
+            if self.duplicate_threshold is not None:
+                signature = shingles(text)
+                if any(jaccard(signature, other) >= self.duplicate_threshold for other in taken):
+                    duplicates += 1
+                    continue
+            if self.max_item_tokens is not None:
+                text = self.cut(text, self.max_item_tokens)
+            head = f"{self.header(len(used) + 1, row)}\n{self.text_label}: "
+            # Blocks after the first are preceded by a blank line
+            overhead = self.count_tokens(head) + (2 if blocks else 0)
+            text_tokens = self.count_tokens(text)
+            remaining = self.max_tokens - tokens - overhead
+            if text_tokens > remaining:
+                if remaining < self.min_item_tokens:
+                    break
+                text = self.cut(text, remaining)
+                text_tokens = self.count_tokens(text)
+                truncated = True
+            blocks.append(head + text)
+            used.append(row)
+            if self.duplicate_threshold is not None:
+                taken.append(signature)
+            tokens += overhead + text_tokens
+            if truncated:
+                break
+        text = "\n\n".join(blocks)
+        dropped = len(rows) - len(used) - duplicates
+        return PackedContext(text, self.count_tokens(text), used, duplicates, dropped, truncated)
@@ -0,0 +1,192 @@
+import os
+
+import numpy as np
+
+from .codec import element_dtype, encode_vector, encode_vectors, vector_column, vector_parameter, vector_type
+from .exact import ExactIndex
+
+
+def truncate(vectors, dimensions):
+    """
+    Keep the first `dimensions` values of one vector or of every row of a 2-D array and
+    L2-normalize the result again. Embeddings trained with Matryoshka representation
+    learning (e.g. text-embedding-3-*) keep most of their quality when shortened this way.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.shape[-1] < dimensions:
+        raise ValueError(f"Cannot truncate {vectors.shape[-1]}-dimensional vectors to {dimensions} dimensions")
+    prefix = vectors[..., :dimensions]
+    norms = np.linalg.norm(prefix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return prefix / norms
+
+
+def supports_dimensions(model):
+    """
+    Whether the embedding `model` (or a deployment named after it) is a Matryoshka model:
+    text-embedding-3-* accept a `dimensions` request parameter and keep most of their quality
+    when shortened, while truncated text-embedding-ada-002 embeddings lose much more.
+    """
+    return bool(model) and "text-embedding-3" in model.lower()
+
+
+class VectorConfig:
+    """
+    The shape of an embedding column in one place: its `dimensions`, its element type and,
+    optionally, the size of a shorter prefix column used for two-stage search.
+
+    Every SQL type, cast, payload and column read is derived from it, so changing the
+    embedding size is a configuration change rather than an edit of SQL string literals.
+    Vectors longer than `dimensions` (e.g. full-size embeddings of a Matryoshka model) are
+    truncated and renormalized before they are encoded.
+    """
+
+    def __init__(self, dimensions=1536, element_type="float32", prefix_dimensions=None):
+        if prefix_dimensions is not None and not 0 < prefix_dimensions < dimensions:
+            raise ValueError("prefix_dimensions must be between 0 and dimensions")
+        self.dimensions = dimensions
+        self.element_type = element_type
+        self.prefix_dimensions = prefix_dimensions
+        self.dtype = element_dtype(element_type)
+
+    @classmethod
+    def from_env(cls, dimensions=1536, element_type="float32", prefix_dimensions=None):
+        """
+        Defaults overridden by the VECTOR_DIMENSIONS, VECTOR_ELEMENT_TYPE and
+        VECTOR_PREFIX_DIMENSIONS environment variables (0 disables the prefix column).
+        """
+        prefix = os.environ.get("VECTOR_PREFIX_DIMENSIONS")
+        if prefix is not None:
+            prefix_dimensions = int(prefix) or None
+        return cls(int(os.environ.get("VECTOR_DIMENSIONS", dimensions)),
+                   os.environ.get("VECTOR_ELEMENT_TYPE", element_type), prefix_dimensions)
+
+    def embedding_dimensions(self, model):
+        """
+        The `dimensions` to request from `model`: the configured size for models that support
+        shortened embeddings, None (the model's native size) for the others.
+        """
+        return self.dimensions if supports_dimensions(model) else None
+
+    def truncates(self, native_dimensions):
+        """
+        Whether vectors of `native_dimensions` values are shortened before they are stored,
+        for the vector column or the prefix column.
+        """
+        return self.dimensions < native_dimensions or bool(self.prefix_dimensions)
+
+    def __repr__(self):
+        return (f"VectorConfig(dimensions={self.dimensions}, element_type='{self.element_type}', "
+                f"prefix_dimensions={self.prefix_dimensions})")
+
+    # SQL
+
+    @property
+    def sql_type(self):
+        return vector_type(self.dimensions, self.element_type)
+
+    @property
+    def prefix_sql_type(self):
+        return vector_type(self.prefix_dimensions, self.element_type)
+
+    def parameter(self):
+        return vector_parameter(self.dimensions, self.element_type)
+
+    def prefix_parameter(self):
+        return vector_parameter(self.prefix_dimensions, self.element_type)
+
+    def column(self, name):
+        return vector_column(name, self.dimensions, self.element_type)
+
+    def column_definitions(self, column, prefix_column, suffix=""):
+        """
+        Column definitions for CREATE TABLE: the vector column, plus the prefix column when
+        `prefix_dimensions` is set, e.g. "embedding VECTOR(1536), embedding_prefix VECTOR(256)".
+        """
+        definitions = f"{column} {self.sql_type}{suffix}"
+        if self.prefix_dimensions:
+            definitions += f", {prefix_column} {self.prefix_sql_type}{suffix}"
+        return definitions
+
+    # Payloads
+
+    def truncate(self, vectors):
+        """
+        Vectors shortened to `dimensions` when they are longer, as float32.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return truncate(vectors, self.dimensions) if vectors.shape[-1] > self.dimensions else vectors
+
+    def encode(self, vector):
+        return encode_vector(self.truncate(vector), self.dtype)
+
+    def encode_many(self, matrix):
+        return encode_vectors(self.truncate(matrix), self.dtype)
+
+    def encode_prefix(self, vector):
+        return encode_vector(truncate(vector, self.prefix_dimensions), self.dtype)
+
+    def encode_prefix_many(self, matrix):
+        return encode_vectors(truncate(matrix, self.prefix_dimensions), self.dtype)
+
+
+def two_stage_search_sql(config, table, columns, vector, prefix_vector, metric="cosine"):
+    """
+    Two-stage search in one query: the candidates closest to the query's prefix in the
+    short `prefix_vector` column are reranked with exact distances on the full `vector`
+    column. Parameters, in order: config.encode_prefix(query), config.encode(query), k,
+    number of candidates (k times an oversampling factor). Returns `columns` plus the
+    full-vector distance, closest first.
+    """
+    selected = ", ".join(columns)
+    return f"""
+    DECLARE @p {config.prefix_sql_type} = {config.prefix_parameter()};
+    DECLARE @v {config.sql_type} = {config.parameter()};
+    SELECT TOP (?) {selected}, VECTOR_DISTANCE('{metric}', @v, c.{vector}) AS distance
+    FROM (
+        SELECT TOP (?) {selected}, {vector}
+        FROM {table}
+        ORDER BY VECTOR_DISTANCE('{metric}', @p, {prefix_vector})
+    ) AS c
+    ORDER BY distance
+    """
+
+
+class PrefixIndex:
+    """
+    Local two-stage search: an ExactIndex over the first `prefix_dimensions` values of
+    every vector finds `oversample * k` candidates, which are reranked with exact distances
+    on the full vectors. Same search interface as ExactIndex.
+    """
+
+    def __init__(self, vectors=None, metric="cosine", prefix_dimensions=256, oversample=4, dtype=np.float32):
+        self.prefix_dimensions = prefix_dimensions
+        self.oversample = oversample
+        self.prefix = ExactIndex(metric=metric, dtype=dtype)
+        self.full = ExactIndex(metric=metric, dtype=dtype)
+        if vectors is not None:
+            self.add(vectors)
+
+    @property
+    def metric(self):
+        return self.full.metric
+
+    def __len__(self):
+        return len(self.full)
+
+    def add(self, vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        self.prefix.add(vectors[:, :self.prefix_dimensions])
+        self.full.add(vectors)
+
+    def search(self, queries, k, oversample=None):
+        """
+        Top-k for each query: (positions, distances), two (n_queries, k) arrays sorted by
+        the full-vector distance.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self))
+        candidates = self.prefix.search(queries[:, :self.prefix_dimensions], k * (oversample or self.oversample))[0]
+        distances = np.stack([self.full.distances(query, rows) for query, rows in zip(queries, candidates)])
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(distances, order, axis=1)
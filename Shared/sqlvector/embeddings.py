@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .ratelimit import AdaptiveScheduler, check_throttled
+
+
+def embeddings_url(endpoint, deployment, api_version="2023-05-15"):
+    """
+    Build the Azure OpenAI embeddings URL for the given endpoint and deployment.
+    """
+    return f"{endpoint.rstrip('/')}/openai/deployments/{deployment}/embeddings?api-version={api_version}"
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (roughly 4 characters per token) used to size batches.
+    """
+    return len(text) // 4 + 1
+
+
+def make_batches(texts, max_batch_items, max_batch_tokens, count_tokens=estimate_tokens):
+    """
+    Group the positions of `texts` into batches that respect both the item and the token budget.
+    A single text larger than the token budget is sent on its own.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (len(current) >= max_batch_items or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingClient:
+    """
+    Batched, concurrent client for the Azure OpenAI embeddings endpoint.
+
+    Many inputs are packed into each request (up to `max_batch_items` inputs and
+    `max_batch_tokens` estimated tokens) and up to `max_workers` requests are kept
+    in flight at once. Results are always returned in input order.
+
+    Requests go through an AdaptiveScheduler, so throttled (429) batches are retried
+    after the delay requested by the service instead of being lost.
+
+    If an EmbeddingCache is given, texts already embedded with the same `model`
+    (deployment name) are served from it and only the misses are sent to the service.
+
+    `dimensions` asks models that support shortened embeddings (text-embedding-3-*) for
+    vectors of that size; cached entries are kept apart per size.
+    """
+
+    def __init__(self, url, api_key, max_batch_items=64, max_batch_tokens=32000, max_workers=4,
+                 timeout=60, count_tokens=estimate_tokens, scheduler=None, cache=None, model=None,
+                 dimensions=None):
+        self.url = url
+        self.api_key = api_key
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.count_tokens = count_tokens
+        self.scheduler = scheduler or AdaptiveScheduler(initial_concurrency=max_workers, max_concurrency=max_workers)
+        self.cache = cache
+        self.model = model or url
+        self.dimensions = dimensions
+        if dimensions:
+            self.model = f"{self.model}:{dimensions}"
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session is not guaranteed to be thread-safe, so keep one per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({"api-key": self.api_key, "Content-Type": "application/json"})
+            self._local.session = session
+        return session
+
+    def _post(self, inputs):
+        def call():
+            body = {"input": inputs}
+            if self.dimensions:
+                body["dimensions"] = self.dimensions
+            response = self._session().post(self.url, json=body, timeout=self.timeout)
+            check_throttled(response)
+            response.raise_for_status()
+            return response
+
+        tokens = sum(self.count_tokens(text) for text in inputs)
+        response = self.scheduler.run(call, tokens=tokens)
+        data = sorted(response.json()["data"], key=lambda d: d["index"])
+        if len(data) != len(inputs):
+            raise RuntimeError(f"Expected {len(inputs)} embeddings, got {len(data)}")
+        return [d["embedding"] for d in data]
+
+    def embed(self, texts, progress=None):
+        """
+        Embed a list of texts and return the embeddings in the same order.
+        `progress`, if given, is called with (completed, total) after each batch.
+        """
+        texts = list(texts)
+        results = self.cache.get_many(self.model, texts) if self.cache is not None else [None] * len(texts)
+        missing = [i for i, r in enumerate(results) if r is None]
+        batches = make_batches([texts[i] for i in missing], self.max_batch_items, self.max_batch_tokens, self.count_tokens)
+        batches = [[missing[j] for j in batch] for batch in batches]
+        completed = len(texts) - len(missing)
+        if progress is not None and completed:
+            progress(completed, len(texts))
+
+        def run(batch):
+            return batch, self._post([texts[i] for i in batch])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch, embeddings in executor.map(run, batches):
+                for i, embedding in zip(batch, embeddings):
+                    results[i] = embedding
+                if self.cache is not None:
+                    self.cache.put_many(self.model, [texts[i] for i in batch], embeddings)
+                completed += len(batch)
+                if progress is not None:
+                    progress(completed, len(texts))
+        return results
+
+    def embed_one(self, text):
+        """
+        Embed a single text.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(self.model, text)
+            if cached is not None:
+                return cached
+        embedding = self._post([text])[0]
+        if self.cache is not None:
+            self.cache.put(self.model, text, embedding)
+        return embedding
@@ -0,0 +1,184 @@
+"""
+Recall and latency measurement for vector search backends.
+
+A backend is any object with a `name` and a `search(query, k)` method returning the ids
+of the top-k rows for one query vector, closest first. The SQL backends run
+`VECTOR_DISTANCE` (exact) or `VECTOR_SEARCH` (approximate, DiskANN index) queries;
+LocalBackend wraps an ExactIndex or GraphIndex.
+"""
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .codec import element_dtype, encode_vector, vector_parameter, vector_type
+from .exact import load_table, recall_stats
+from .pool import ConnectionPool
+
+
+class LocalBackend:
+    """
+    Searches an in-process index (ExactIndex, GraphIndex, ...); `ids` maps index positions
+    to row ids (positions are used when omitted).
+    """
+
+    def __init__(self, name, index, ids=None, **search_args):
+        self.name = name
+        self.index = index
+        self.ids = ids
+        self.search_args = search_args
+
+    def search(self, query, k):
+        positions = [p for p in self.index.search(query, k, **self.search_args)[0][0].tolist() if p >= 0]
+        return positions if self.ids is None else [self.ids[p] for p in positions]
+
+
+class SqlBackend:
+    """
+    Runs one parameterized query per search on pooled connections (one per concurrent caller).
+    """
+
+    def __init__(self, name, connect, sql, element_type="float32", max_connections=16):
+        self.name = name
+        self.sql = sql
+        self.element_type = element_type
+        self.pool = ConnectionPool(connect, max_size=max_connections)
+
+    def search(self, query, k):
+        payload = encode_vector(query, element_dtype(self.element_type))
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql, payload, k)
+            rows = cursor.fetchall()
+            cursor.close()
+        return [row[0] for row in rows]
+
+    def close(self):
+        self.pool.close()
+
+
+def sql_exact_backend(connect, table, id_column, vector, dimensions, metric="cosine", element_type="float32",
+                      max_connections=16):
+    """
+    Exact k-NN with VECTOR_DISTANCE (a full scan): the ground truth on the server.
+    """
+    sql = f"""
+    DECLARE @v {vector_type(dimensions, element_type)} = {vector_parameter(dimensions, element_type)};
+    SELECT TOP (?) {id_column}
+    FROM {table}
+    ORDER BY VECTOR_DISTANCE('{metric}', @v, {vector}), {id_column}
+    """
+    return SqlBackend("sql-exact", connect, sql, element_type, max_connections)
+
+
+def sql_approximate_backend(connect, table, id_column, vector, dimensions, metric="cosine", element_type="float32",
+                            max_connections=16):
+    """
+    Approximate k-NN with VECTOR_SEARCH, which uses the table's DiskANN vector index.
+    """
+    sql = f"""
+    DECLARE @v {vector_type(dimensions, element_type)} = {vector_parameter(dimensions, element_type)};
+    SELECT TOP (?) WITH APPROXIMATE t.{id_column}
+    FROM VECTOR_SEARCH(TABLE = {table} AS t, COLUMN = {vector}, SIMILAR_TO = @v, METRIC = '{metric}') AS s
+    ORDER BY s.distance
+    """
+    return SqlBackend("sql-approximate", connect, sql, element_type, max_connections)
+
+
+def load_query_vectors(conn, table="dbo.wikipedia_search_vectors", id_column="id", vector="v", dimensions=1536,
+                       element_type="float32"):
+    """
+    Query set stored in a table, e.g. the wikipedia_search_vectors table of the DiskANN samples.
+    """
+    return load_table(conn, table, [id_column], vector, dimensions, element_type)[1]
+
+
+def percentile(latencies, q):
+    return float(np.percentile(latencies, q)) if len(latencies) else 0.0
+
+
+def measure(backend, queries, k, concurrency=1, truth=None):
+    """
+    Run every query through `backend` with `concurrency` threads.
+    Returns a result row with recall@k (when `truth` is given), latency percentiles and QPS.
+    """
+    latencies = [0.0] * len(queries)
+    found = [None] * len(queries)
+    errors = []
+    lock = threading.Lock()
+
+    def run(i):
+        start = time.perf_counter()
+        try:
+            found[i] = backend.search(queries[i], k)
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+            found[i] = []
+        latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(run, range(len(queries))))
+    else:
+        for i in range(len(queries)):
+            run(i)
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    recall, skipped = (None, 0) if truth is None else recall_stats(found, [t[:k] for t in truth], k)
+    return {
+        "backend": backend.name,
+        "k": k,
+        "concurrency": concurrency,
+        "queries": len(queries),
+        "recall": None if recall is None else round(recall, 4),
+        "recall_skipped": skipped,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "mean_ms": round(float(latencies_ms.mean()) if len(latencies_ms) else 0.0, 3),
+        "qps": round(len(queries) / elapsed, 1) if elapsed > 0 else 0.0,
+        "errors": len(errors),
+    }
+
+
+def run_benchmark(backends, queries, ks=(10, 50, 100), concurrency=(1, 4, 16), ground_truth=None, warmup=5,
+                  progress=None):
+    """
+    Measure every backend at every k and concurrency level. Recall is computed against the
+    results of `ground_truth` (a backend, typically exact search) for the largest k.
+    Returns a list of result rows.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    truth = None
+    if ground_truth is not None:
+        truth = [ground_truth.search(query, max(ks)) for query in queries]
+    results = []
+    for backend in backends:
+        for query in queries[:warmup]:
+            backend.search(query, min(ks))
+        for k in ks:
+            for level in concurrency:
+                row = measure(backend, queries, k, level, truth)
+                results.append(row)
+                if progress is not None:
+                    progress(row)
+    return results
+
+
+def write_results(results, path):
+    """
+    Write result rows as JSON or CSV, depending on the extension of `path`.
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
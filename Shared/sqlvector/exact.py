@@ -0,0 +1,238 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .codec import decode_vectors, vector_column
+
+METRICS = ("cosine", "dot", "euclidean")
+
+
+def _normalized(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ExactIndex:
+    """
+    Exact (brute-force) k-nearest-neighbor search over an in-memory matrix.
+
+    Vectors are kept in one contiguous float32 or float16 matrix (`dtype`); queries are
+    answered in batches with a BLAS matrix multiply per block of `block_rows` stored
+    vectors and `argpartition` to keep the top k, so memory stays bounded whatever the
+    table size. Query batches are split across `workers` threads (numpy releases the GIL).
+    float16 storage halves memory, but every search converts the blocks back to float32,
+    so it pays off mostly with batched queries.
+
+    Distances follow VECTOR_DISTANCE: cosine is 1 - cosine similarity, dot is the negative
+    dot product and euclidean is the L2 distance, so smaller is always closer.
+    """
+
+    def __init__(self, vectors=None, metric="cosine", dtype=np.float32, workers=None, block_rows=65536,
+                 query_block=64):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+        self.metric = metric
+        self.dtype = np.dtype(dtype)
+        self.workers = workers
+        self.block_rows = block_rows
+        self.query_block = query_block
+        self._vectors = None
+        self._norms = None
+        if vectors is not None:
+            self.add(vectors)
+
+    @classmethod
+    def from_arrays(cls, vectors, norms, metric="cosine", **kwargs):
+        """
+        Wrap vectors that were already prepared by an index (normalized for cosine) and their
+        squared norms, e.g. memory-mapped arrays, without copying them.
+        """
+        index = cls(metric=metric, dtype=vectors.dtype, **kwargs)
+        index._vectors, index._norms = vectors, norms
+        return index
+
+    def __len__(self):
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    @property
+    def dimensions(self):
+        return None if self._vectors is None else self._vectors.shape[1]
+
+    @property
+    def vectors(self):
+        return self._vectors
+
+    @property
+    def norms(self):
+        return self._norms
+
+    def add(self, vectors):
+        """
+        Append vectors (rows of a 2-D array); their positions continue after the existing ones.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.metric == "cosine":
+            vectors = _normalized(vectors)
+        norms = np.einsum("ij,ij->i", vectors, vectors)
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if self._vectors is None:
+            self._vectors, self._norms = vectors, norms
+        else:
+            self._vectors = np.concatenate([self._vectors, vectors])
+            self._norms = np.concatenate([self._norms, norms])
+
+    def distances(self, query, positions):
+        """
+        Exact distances between one query and the stored vectors at `positions`.
+        """
+        query = self._prepare(query)[:1]
+        vectors = self._vectors[positions].astype(np.float32, copy=False)
+        return self._distance(query @ vectors.T, np.einsum("ij,ij->i", query, query), self._norms[positions])[0]
+
+    def _prepare(self, queries):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        return _normalized(queries) if self.metric == "cosine" else queries
+
+    def _distance(self, scores, query_norms, norms):
+        if self.metric == "cosine":
+            return 1.0 - scores
+        if self.metric == "dot":
+            return -scores
+        return np.sqrt(np.maximum(np.add.outer(query_norms, norms) - 2.0 * scores, 0.0))
+
+    def _search_block(self, queries, k):
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_positions = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self), self.block_rows):
+            block = self._vectors[start:start + self.block_rows].astype(np.float32, copy=False)
+            distances = self._distance(queries @ block.T, query_norms, self._norms[start:start + len(block)])
+            keep = min(k, distances.shape[1])
+            positions = np.argpartition(distances, keep - 1, axis=1)[:, :keep]
+            distances = np.concatenate([best_distances, np.take_along_axis(distances, positions, axis=1)], axis=1)
+            positions = np.concatenate([best_positions, positions + start], axis=1)
+            if distances.shape[1] > k:
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                distances = np.take_along_axis(distances, top, axis=1)
+                positions = np.take_along_axis(positions, top, axis=1)
+            best_distances, best_positions = distances, positions
+        order = np.argsort(best_distances, axis=1, kind="stable")
+        return np.take_along_axis(best_positions, order, axis=1), np.take_along_axis(best_distances, order, axis=1)
+
+    def search(self, queries, k):
+        """
+        Top-k for each query (one vector or a 2-D array of them).
+        Returns (positions, distances), two (n_queries, k) arrays sorted by distance.
+        """
+        queries = self._prepare(queries)
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        blocks = [queries[i:i + self.query_block] for i in range(0, len(queries), self.query_block)]
+        if self.workers and self.workers > 1 and len(blocks) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(lambda block: self._search_block(block, k), blocks))
+        else:
+            results = [self._search_block(block, k) for block in blocks]
+        return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def recall_stats(found, expected, k=None):
+    """
+    Mean fraction of the true top-k (`expected`, e.g. from ExactIndex) present in the
+    approximate top-k (`found`); both are per-query sequences of ids or positions.
+    Queries whose ground truth is empty are left out of the mean.
+    Returns (recall, number of skipped queries).
+    """
+    total = 0.0
+    counted = 0
+    skipped = 0
+    for approximate, exact in zip(found, expected):
+        exact = list(exact)[:k] if k else list(exact)
+        if not exact:
+            skipped += 1
+            continue
+        total += len(set(list(approximate)[:len(exact)]) & set(exact)) / len(exact)
+        counted += 1
+    return total / max(counted, 1), skipped
+
+
+def recall_at_k(found, expected, k=None):
+    """
+    Mean recall of `found` against `expected` over the queries with a non-empty ground truth
+    (see recall_stats).
+    """
+    return recall_stats(found, expected, k)[0]
+
+
+def load_table(conn, table, columns, vector, dimensions, element_type="float32", dtype=np.float32, where=None,
+               batch_size=10000):
+    """
+    Read `columns` and the vector column `vector` of `table` in batches, decoding the vectors
+    from their binary form. Returns (list of row tuples, (n, dimensions) matrix of `dtype`).
+    """
+    sql = f"SELECT {', '.join(columns)}, {vector_column(vector, dimensions, element_type)} FROM {table}"
+    if where:
+        sql += f" WHERE {where}"
+    cursor = conn.cursor()
+    cursor.execute(sql)
+    rows = []
+    blocks = []
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        rows.extend(tuple(row[:-1]) for row in batch)
+        blocks.append(decode_vectors([row[-1] for row in batch], dtype))
+    cursor.close()
+    matrix = np.concatenate(blocks) if blocks else np.empty((0, dimensions), dtype=dtype)
+    return rows, matrix
+
+
+class LocalTable:
+    """
+    In-memory copy of a table (its rows plus an index over the vector column) that answers
+    vector searches without a round-trip to SQL.
+    """
+
+    def __init__(self, rows, index):
+        self.rows = rows
+        self.index = index
+
+    @classmethod
+    def load(cls, conn, table, columns, vector, dimensions, element_type="float32", metric="cosine",
+             dtype=np.float32, index_factory=ExactIndex, where=None):
+        """
+        Load a table with load_table and index it with `index_factory(matrix, metric=..., dtype=...)`.
+        """
+        rows, matrix = load_table(conn, table, columns, vector, dimensions, element_type, dtype, where)
+        return cls(rows, index_factory(matrix, metric=metric, dtype=dtype))
+
+    def search(self, query, k):
+        """
+        Top-k rows for one query vector, as a list of (row, distance) closest first.
+        """
+        positions, distances = self.index.search(query, k)
+        return [(self.rows[p], float(d)) for p, d in zip(positions[0], distances[0])]
+
+    def save(self, path):
+        """
+        Write the rows (as JSON) and the index to the directory `path`; the index class must
+        provide `save(path)`.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.index.save(path)
+        with open(os.path.join(path, "rows.json"), "w") as f:
+            json.dump([list(row) for row in self.rows], f, default=str)
+
+    @classmethod
+    def open(cls, path, index_class, mmap=True):
+        """
+        Open a LocalTable written by `save`, loading the index with `index_class.load(path, mmap)`.
+        """
+        with open(os.path.join(path, "rows.json")) as f:
+            rows = [tuple(row) for row in json.load(f)]
+        return cls(rows, index_class.load(path, mmap=mmap))
@@ -0,0 +1,294 @@
+"""
+Hybrid (full-text + vector) search fused on the client.
+
+Each leg is a separate query: a FREETEXTTABLE (BM25) query and a vector query that uses
+VECTOR_SEARCH when the column has a vector index, or an exact VECTOR_DISTANCE scan
+otherwise. HybridSearch runs the legs concurrently, times each of them, and fuses their
+rankings with weighted reciprocal rank fusion (RRF) or normalized score fusion.
+
+A leg is any object with a `name` and a `search(text, vector, k)` method returning up to
+k `(row_id, score)` pairs, best first, where a higher score is better. LocalBM25Leg and
+LocalVectorLeg are in-process stand-ins, so fusion can be exercised without a database.
+"""
+import collections
+import math
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .dimensions import VectorConfig
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+# Fusion
+
+def reciprocal_rank_fusion(rankings, weights=None, k=60):
+    """
+    Weighted RRF: every row scores sum(weight / (k + rank)) over the legs that returned it
+    (ranks start at 1). `rankings` maps a leg name to its (row_id, score) list, best first.
+    Returns (row_id, fused score) pairs, best first.
+    """
+    scores = collections.defaultdict(float)
+    for name, ranking in rankings.items():
+        weight = 1.0 if weights is None else weights.get(name, 1.0)
+        for rank, (row_id, _) in enumerate(ranking, start=1):
+            scores[row_id] += weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def _normalized(values, method):
+    values = np.asarray(values, dtype=np.float64)
+    if method == "minmax":
+        spread = values.max() - values.min()
+        return np.ones_like(values) if spread == 0 else (values - values.min()) / spread
+    if method == "zscore":
+        std = values.std()
+        return np.zeros_like(values) if std == 0 else (values - values.mean()) / std
+    raise ValueError(f"Unknown normalization '{method}', expected 'minmax' or 'zscore'")
+
+
+def score_fusion(rankings, weights=None, normalization="minmax"):
+    """
+    Weighted sum of each leg's scores after normalizing them per leg ("minmax" to [0, 1], or
+    "zscore"); a row missing from a leg gets nothing from it. Returns (row_id, fused score)
+    pairs, best first.
+    """
+    scores = collections.defaultdict(float)
+    for name, ranking in rankings.items():
+        if not ranking:
+            continue
+        weight = 1.0 if weights is None else weights.get(name, 1.0)
+        for (row_id, _), value in zip(ranking, _normalized([score for _, score in ranking], normalization).tolist()):
+            scores[row_id] += weight * value
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class HybridResult:
+    """
+    Fused `results` as (row_id, score, {leg name: rank}) tuples, best first, the raw `rankings`
+    of every leg, the latency of each leg and of the whole search in seconds, and the
+    errors of the legs that failed (the others are still fused).
+    """
+
+    def __init__(self, results, rankings, latencies, total, errors):
+        self.results = results
+        self.rankings = rankings
+        self.latencies = latencies
+        self.total = total
+        self.errors = errors
+
+    def __repr__(self):
+        timings = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.latencies.items())
+        return f"HybridResult({len(self.results)} results, {timings}, total {self.total * 1000:.1f} ms)"
+
+
+class HybridSearch:
+    """
+    Runs every leg concurrently for each search (one thread per leg), asks each for
+    `candidates` results and fuses them with `fusion="rrf"` (weighted RRF with constant
+    `rrf_k`) or `fusion="score"` (weighted normalized scores). `weights` maps leg names to
+    weights; legs default to 1.
+    """
+
+    def __init__(self, legs, fusion="rrf", weights=None, rrf_k=60, normalization="minmax", candidates=50):
+        if fusion not in ("rrf", "score"):
+            raise ValueError(f"Unknown fusion '{fusion}', expected 'rrf' or 'score'")
+        self.legs = list(legs)
+        self.fusion = fusion
+        self.weights = weights
+        self.rrf_k = rrf_k
+        self.normalization = normalization
+        self.candidates = candidates
+        self._executor = ThreadPoolExecutor(max_workers=len(self.legs), thread_name_prefix="hybrid-leg")
+
+    def fuse(self, rankings):
+        if self.fusion == "rrf":
+            return reciprocal_rank_fusion(rankings, self.weights, self.rrf_k)
+        return score_fusion(rankings, self.weights, self.normalization)
+
+    def _run(self, leg, text, vector, k):
+        start = time.perf_counter()
+        try:
+            return leg.search(text, vector, k), None, time.perf_counter() - start
+        except Exception as e:
+            return [], repr(e), time.perf_counter() - start
+
+    def search(self, text, vector, k=10):
+        """
+        Hybrid top-k for a query given as text (full-text leg) and embedding (vector leg).
+        """
+        start = time.perf_counter()
+        candidates = max(k, self.candidates)
+        futures = [(leg.name, self._executor.submit(self._run, leg, text, vector, candidates)) for leg in self.legs]
+        rankings, latencies, errors = {}, {}, {}
+        for name, future in futures:
+            rankings[name], error, latencies[name] = future.result()
+            if error is not None:
+                errors[name] = error
+        ranks = {name: {row_id: rank for rank, (row_id, _) in enumerate(ranking, start=1)} for name, ranking in rankings.items()}
+        results = [(row_id, score, {name: ranks[name][row_id] for name in ranks if row_id in ranks[name]})
+                   for row_id, score in self.fuse(rankings)[:k]]
+        return HybridResult(results, rankings, latencies, time.perf_counter() - start, errors)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+# SQL legs
+
+def has_vector_index(conn, table, column):
+    """
+    True when `column` of `table` has a vector (DiskANN) index, so VECTOR_SEARCH can use it.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT COUNT(*)
+    FROM sys.vector_indexes AS vi
+    INNER JOIN sys.index_columns AS ic ON ic.object_id = vi.object_id AND ic.index_id = vi.index_id
+    INNER JOIN sys.columns AS c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+    WHERE vi.object_id = OBJECT_ID(?) AND c.name = ?
+    """, table, column.strip("[]"))
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count > 0
+
+
+class SqlFullTextLeg:
+    """
+    Full-text leg: FREETEXTTABLE over `columns` of `table` ranked by its BM25 RANK, on a
+    connection from `pool` (a ConnectionPool).
+    """
+
+    def __init__(self, pool, table, id_column="id", columns="*", name="fulltext"):
+        self.name = name
+        self.pool = pool
+        self.sql = f"""
+        SELECT TOP (?) t.{id_column}, ftt.[RANK]
+        FROM {table} AS t
+        INNER JOIN FREETEXTTABLE({table}, {columns}, ?) AS ftt ON t.{id_column} = ftt.[KEY]
+        ORDER BY ftt.[RANK] DESC
+        """
+
+    def search(self, text, vector, k):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql, k, text)
+            rows = cursor.fetchall()
+            cursor.close()
+        return [(row[0], float(row[1])) for row in rows]
+
+
+class SqlVectorLeg:
+    """
+    Vector leg on a connection from `pool`: VECTOR_SEARCH (approximate, through the vector
+    index) when `approximate` is True, an exact VECTOR_DISTANCE scan when False, and when
+    None whichever the table supports (checked once with has_vector_index). Scores are
+    negated distances, so higher is better. `config` is the column's VectorConfig.
+    """
+
+    def __init__(self, pool, table, id_column="id", vector="embedding", config=None, metric="cosine",
+                 approximate=None, name="vector"):
+        self.name = name
+        self.pool = pool
+        self.table = table
+        self.id_column = id_column
+        self.vector = vector
+        self.config = config or VectorConfig()
+        self.metric = metric
+        self.approximate = approximate
+        self._sql = None
+
+    def _query(self, conn):
+        if self._sql is None:
+            if self.approximate is None:
+                self.approximate = has_vector_index(conn, self.table, self.vector)
+            declare = f"DECLARE @v {self.config.sql_type} = {self.config.parameter()};"
+            if self.approximate:
+                self._sql = f"""
+                {declare}
+                SELECT TOP (?) WITH APPROXIMATE t.{self.id_column}, s.distance
+                FROM VECTOR_SEARCH(TABLE = {self.table} AS t, COLUMN = {self.vector}, SIMILAR_TO = @v, METRIC = '{self.metric}') AS s
+                ORDER BY s.distance
+                """
+            else:
+                self._sql = f"""
+                {declare}
+                SELECT TOP (?) {self.id_column}, VECTOR_DISTANCE('{self.metric}', @v, {self.vector}) AS distance
+                FROM {self.table}
+                ORDER BY distance
+                """
+        return self._sql
+
+    def search(self, text, vector, k):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._query(conn), self.config.encode(vector), k)
+            rows = cursor.fetchall()
+            cursor.close()
+        return [(row[0], -float(row[1])) for row in rows]
+
+
+# Local stand-ins
+
+class LocalBM25Leg:
+    """
+    In-process BM25 full-text leg over `texts` (ids in `ids`), with an inverted index built
+    once; only documents sharing a term with the query are returned, like FREETEXTTABLE.
+    """
+
+    def __init__(self, ids, texts, k1=1.2, b=0.75, stopwords=None, name="fulltext"):
+        self.name = name
+        self.ids = list(ids)
+        self.k1 = k1
+        self.b = b
+        self.stopwords = frozenset(stopwords or ())
+        postings = collections.defaultdict(lambda: ([], []))
+        lengths = []
+        for position, text in enumerate(texts):
+            terms = [t for t in tokenize(text) if t not in self.stopwords]
+            lengths.append(len(terms))
+            for term, count in collections.Counter(terms).items():
+                postings[term][0].append(position)
+                postings[term][1].append(count)
+        self.lengths = np.array(lengths, dtype=np.float32)
+        self.average_length = float(self.lengths.mean()) if len(lengths) else 0.0
+        self.postings = {term: (np.array(docs, dtype=np.int64), np.array(counts, dtype=np.float32))
+                         for term, (docs, counts) in postings.items()}
+
+    def search(self, text, vector, k):
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(text)) - self.stopwords:
+            if term not in self.postings:
+                continue
+            docs, counts = self.postings[term]
+            idf = math.log(1 + (len(self.ids) - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[docs] / self.average_length)
+            scores[docs] += idf * counts * (self.k1 + 1) / (counts + norm)
+        matches = np.flatnonzero(scores)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return [(self.ids[p], float(scores[p])) for p in matches]
+
+
+class LocalVectorLeg:
+    """
+    In-process vector leg over an ExactIndex (or any index with the same search method);
+    `ids` maps index positions to row ids. Scores are negated distances.
+    """
+
+    def __init__(self, ids, index, name="vector"):
+        self.name = name
+        self.ids = list(ids)
+        self.index = index
+
+    def search(self, text, vector, k):
+        positions, distances = self.index.search(vector, k)
+        return [(self.ids[p], -float(d)) for p, d in zip(positions[0], distances[0]) if p >= 0]
@@ -0,0 +1,326 @@
+"""
+Incremental (re-)indexing of chunked documents.
+
+Every chunk row carries a hash of its text, and optionally every source document a hash
+of its content (e.g. the PDF bytes). `IncrementalIndexer.plan` compares the chunks of a
+run with the stored hashes and returns a ChangePlan: the new or changed chunks to embed
+and upsert and the keys of the chunks that disappeared. Only those are embedded and
+written, so the cost of a run follows the size of the change, not of the corpus, and
+documents whose hash did not change can be skipped before they are even extracted.
+
+`SqlIndexStore` applies a plan with set-based statements: the changed rows are sent in
+`executemany` batches to a temp table and merged into the target with one MERGE, the
+deleted keys are removed with one joined DELETE, in a single transaction.
+`MemoryIndexStore` is an in-process stand-in with the same interface.
+"""
+import hashlib
+import itertools
+import time
+
+from .cache import text_hash
+
+
+def document_hash(content):
+    """
+    SHA-256 of a source document: its bytes (e.g. an uploaded PDF) or its text.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+def _batches(values, size):
+    iterator = iter(values)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ChangePlan:
+    """
+    What a run changes: `upserts` are the (key, document, text, hash) tuples of new or
+    changed chunks (`new` and `changed` count them), `deletes` the keys of stored chunks
+    that are gone, `unchanged` the number of chunks left as they are, and
+    `document_hashes` the document hashes to record once the plan is applied (None
+    removes a document).
+    """
+
+    def __init__(self, upserts, deletes, unchanged, new, document_hashes):
+        self.upserts = upserts
+        self.deletes = deletes
+        self.unchanged = unchanged
+        self.new = new
+        self.changed = len(upserts) - new
+        self.document_hashes = document_hashes
+
+    @property
+    def texts(self):
+        return [text for _, _, text, _ in self.upserts]
+
+    def __repr__(self):
+        return (f"ChangePlan(new={self.new}, changed={self.changed}, deleted={len(self.deletes)}, "
+                f"unchanged={self.unchanged})")
+
+
+class SyncResult:
+    """
+    Outcome of applying a ChangePlan: rows inserted, updated and deleted, chunks left
+    unchanged, texts embedded and the elapsed time.
+    """
+
+    def __init__(self, plan, embedded, elapsed):
+        self.inserted = plan.new
+        self.updated = plan.changed
+        self.deleted = len(plan.deletes)
+        self.unchanged = plan.unchanged
+        self.embedded = embedded
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"SyncResult(inserted={self.inserted}, updated={self.updated}, deleted={self.deleted}, "
+                f"unchanged={self.unchanged}, embedded={self.embedded}, elapsed={self.elapsed:.2f}s)")
+
+
+class IncrementalIndexer:
+    """
+    Keeps a store (SqlIndexStore or MemoryIndexStore) in sync with the chunks of a run.
+    `embed(texts)` returns one vector per text, e.g. `EmbeddingClient.embed`.
+    """
+
+    def __init__(self, store, embed=None):
+        self.store = store
+        self.embed = embed
+
+    def changed_documents(self, document_hashes):
+        """
+        The subset of `document_hashes` (document -> hash) that is new or differs from the
+        stored hash; only these documents need to be extracted, chunked and planned.
+        """
+        stored = self.store.document_hashes(list(document_hashes))
+        return {d: h for d, h in document_hashes.items() if stored.get(d) != h}
+
+    def plan(self, items, documents=None, document_hashes=None):
+        """
+        Compare `items`, (key, document, text) tuples, with the stored chunks. With
+        `documents`, only the stored chunks of those documents are considered, so chunks
+        of other documents are never deleted; with None, `items` is the whole corpus.
+        """
+        existing = self.store.hashes(documents)
+        upserts, seen = [], set()
+        unchanged = new = 0
+        for key, document, text in items:
+            if key in seen:
+                raise ValueError(f"Duplicate chunk key {key!r}")
+            seen.add(key)
+            digest = text_hash(text)
+            stored = existing.get(key)
+            if stored is None:
+                new += 1
+            elif stored == (document, digest):
+                unchanged += 1
+                continue
+            upserts.append((key, document, text, digest))
+        deletes = [key for key in existing if key not in seen]
+        return ChangePlan(upserts, deletes, unchanged, new, dict(document_hashes or {}))
+
+    def apply(self, plan, vectors):
+        """
+        Write a plan, with one vector per upsert, and return a SyncResult.
+        """
+        start = time.perf_counter()
+        self.store.write(plan.upserts, vectors, plan.deletes, plan.document_hashes)
+        return SyncResult(plan, len(plan.upserts), time.perf_counter() - start)
+
+    def sync(self, items, documents=None, document_hashes=None):
+        """
+        plan, embed the new and changed texts only, and apply.
+        """
+        start = time.perf_counter()
+        plan = self.plan(items, documents, document_hashes)
+        vectors = self.embed(plan.texts) if plan.upserts else []
+        self.store.write(plan.upserts, vectors, plan.deletes, plan.document_hashes)
+        return SyncResult(plan, len(plan.upserts), time.perf_counter() - start)
+
+
+class SqlIndexStore:
+    """
+    Chunks of `table` on a pyodbc connection: one row per chunk with its `key`, `document`,
+    `text`, `hash` (CHAR(64)) and `vector` columns, plus `prefix_vector` when `config` (the
+    column's VectorConfig) has a prefix. `document=None` is for tables where every row is
+    its own document. `documents_table`, if given, holds one (document, hash) row per source
+    document. The staging temp tables live in the connection's session, so every call
+    must use the same connection.
+    """
+
+    def __init__(self, conn, table, config, key="chunkid", document="filename", text="chunk", hash="content_hash",
+                 vector="embedding", prefix_vector=None, key_type="NVARCHAR(255)", document_type="NVARCHAR(255)",
+                 documents_table=None, batch_size=500):
+        self.conn = conn
+        self.table = table
+        self.config = config
+        self.key = key
+        self.document = document
+        self.text = text
+        self.hash = hash
+        self.vector = vector
+        self.prefix_vector = prefix_vector if config.prefix_dimensions else None
+        self.key_type = key_type
+        self.document_type = document_type
+        self.documents_table = documents_table
+        self.batch_size = batch_size
+
+    def _cursor(self):
+        cursor = self.conn.cursor()
+        if hasattr(cursor, "fast_executemany"):
+            cursor.fast_executemany = True
+        return cursor
+
+    def _select(self, sql, values):
+        # Filtered in batches to stay under the 2100 parameters of a SQL Server statement
+        cursor = self.conn.cursor()
+        rows = []
+        try:
+            if values is None:
+                cursor.execute(sql)
+                rows = cursor.fetchall()
+            else:
+                for batch in _batches(values, self.batch_size):
+                    cursor.execute(f"{sql} WHERE {self.document} IN ({', '.join('?' * len(batch))})", *batch)
+                    rows.extend(cursor.fetchall())
+        finally:
+            cursor.close()
+        return rows
+
+    def hashes(self, documents=None):
+        """
+        key -> (document, hash) of the stored chunks, of `documents` only if given.
+        """
+        document = self.document or "NULL"
+        if documents is not None and self.document is None:
+            raise ValueError("The table has no document column to filter on")
+        rows = self._select(f"SELECT {self.key}, {document}, {self.hash} FROM {self.table}", documents)
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def document_hashes(self, documents):
+        if self.documents_table is None or not documents:
+            return {}
+        return dict(self._select(f"SELECT {self.document}, {self.hash} FROM {self.documents_table}", documents))
+
+    def _stage(self, cursor, name, columns, insert, rows):
+        cursor.execute(f"DROP TABLE IF EXISTS {name}; CREATE TABLE {name} ({columns});")
+        for batch in _batches(rows, self.batch_size):
+            cursor.executemany(f"INSERT INTO {name} VALUES ({insert})", batch)
+
+    def _merge_chunks(self, cursor, upserts, vectors):
+        if len(vectors) != len(upserts):
+            raise ValueError(f"{len(upserts)} chunks to upsert but {len(vectors)} vectors")
+        columns = [self.key, self.text, self.hash, self.vector]
+        staged = [f"k {self.key_type} PRIMARY KEY", "t NVARCHAR(MAX)", "h CHAR(64)", f"v {self.config.sql_type}"]
+        params = ["?", "?", "?", self.config.parameter()]
+        payloads = [self.config.encode_many(vectors)]
+        if self.prefix_vector:
+            columns.append(self.prefix_vector)
+            staged.append(f"p {self.config.prefix_sql_type}")
+            params.append(self.config.prefix_parameter())
+            payloads.append(self.config.encode_prefix_many(vectors))
+        rows = [(key, text, digest) for key, _, text, digest in upserts]
+        if self.document:
+            columns.insert(1, self.document)
+            staged.insert(1, f"d {self.document_type}")
+            params.insert(1, "?")
+            rows = [(key, document, text, digest) for key, document, text, digest in upserts]
+        self._stage(cursor, "#upserts", ", ".join(staged), ", ".join(params),
+                    (row + tuple(vector) for row, *vector in zip(rows, *payloads)))
+        source = [column.split()[0] for column in staged]
+        # Keys duplicated by an earlier insert-only load keep one row, which the MERGE then updates
+        cursor.execute(f"""
+        WITH duplicates AS (
+            SELECT ROW_NUMBER() OVER (PARTITION BY {self.key} ORDER BY (SELECT NULL)) AS n
+            FROM {self.table} WHERE {self.key} IN (SELECT k FROM #upserts)
+        )
+        DELETE FROM duplicates WHERE n > 1;
+        MERGE {self.table} WITH (HOLDLOCK) AS t
+        USING #upserts AS s ON t.{self.key} = s.k
+        WHEN MATCHED THEN UPDATE SET {', '.join(f't.{c} = s.{s}' for c, s in zip(columns[1:], source[1:]))}
+        WHEN NOT MATCHED BY TARGET THEN INSERT ({', '.join(columns)}) VALUES ({', '.join(f's.{s}' for s in source)});
+        DROP TABLE #upserts;
+        """)
+
+    def _delete_chunks(self, cursor, deletes):
+        self._stage(cursor, "#deletes", f"k {self.key_type} PRIMARY KEY", "?", ((key,) for key in deletes))
+        cursor.execute(f"""
+        DELETE t FROM {self.table} AS t INNER JOIN #deletes AS d ON t.{self.key} = d.k;
+        DROP TABLE #deletes;
+        """)
+
+    def _merge_documents(self, cursor, document_hashes):
+        self._stage(cursor, "#documents", f"d {self.document_type} PRIMARY KEY, h CHAR(64) NULL", "?, ?",
+                    document_hashes.items())
+        cursor.execute(f"""
+        MERGE {self.documents_table} WITH (HOLDLOCK) AS t
+        USING #documents AS s ON t.{self.document} = s.d
+        WHEN MATCHED AND s.h IS NULL THEN DELETE
+        WHEN MATCHED THEN UPDATE SET t.{self.hash} = s.h
+        WHEN NOT MATCHED BY TARGET AND s.h IS NOT NULL THEN INSERT ({self.document}, {self.hash}) VALUES (s.d, s.h);
+        DROP TABLE #documents;
+        """)
+
+    def write(self, upserts=(), vectors=(), deletes=(), document_hashes=None):
+        """
+        Upsert chunks (with their vectors), delete keys and record document hashes in one
+        transaction; on failure it is rolled back and the error raised.
+        """
+        cursor = self._cursor()
+        try:
+            if upserts:
+                self._merge_chunks(cursor, upserts, vectors)
+            if deletes:
+                self._delete_chunks(cursor, deletes)
+            if document_hashes and self.documents_table is not None:
+                self._merge_documents(cursor, document_hashes)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+# Local stand-ins
+
+class MemoryIndexStore:
+    """
+    In-memory store with the interface of SqlIndexStore: `rows` maps each key to
+    (document, text, hash, vector) and `documents` each document to its hash.
+    `writes` counts write calls and `rows_written` the rows upserted or deleted.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.documents = {}
+        self.writes = 0
+        self.rows_written = 0
+
+    def hashes(self, documents=None):
+        wanted = None if documents is None else set(documents)
+        return {key: (row[0], row[2]) for key, row in self.rows.items() if wanted is None or row[0] in wanted}
+
+    def document_hashes(self, documents):
+        return {d: self.documents[d] for d in documents if d in self.documents}
+
+    def write(self, upserts=(), vectors=(), deletes=(), document_hashes=None):
+        if len(vectors) != len(upserts):
+            raise ValueError(f"{len(upserts)} chunks to upsert but {len(vectors)} vectors")
+        for (key, document, text, digest), vector in zip(upserts, vectors):
+            self.rows[key] = (document, text, digest, vector)
+        for key in deletes:
+            self.rows.pop(key, None)
+        for document, digest in (document_hashes or {}).items():
+            if digest is None:
+                self.documents.pop(document, None)
+            else:
+                self.documents[document] = digest
+        self.writes += 1
+        self.rows_written += len(upserts) + len(deletes)
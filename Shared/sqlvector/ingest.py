@@ -0,0 +1,102 @@
+import queue
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .bulk import BulkLoader
+
+_DONE = object()
+
+
+def parse_vectors(values, dimensions=None, min_dimensions=None, first_row=1):
+    """
+    Parse a sequence of JSON-array strings ("[0.1, -0.2, ...]") into one float32 matrix.
+
+    Every vector must have `dimensions` values (by default, as many as the first one) and at
+    least `min_dimensions` (e.g. the configured column size, when longer vectors are truncated
+    before they are stored). A ValueError names the offending row, counting from `first_row`.
+    """
+    values = list(values)
+    matrix = None
+    for i, value in enumerate(values):
+        try:
+            vector = np.array(value.strip().strip("[]").split(","), dtype=np.float32)
+        except (AttributeError, ValueError) as e:
+            raise ValueError(f"Row {first_row + i}: cannot parse the vector ({e})") from None
+        if matrix is None:
+            dimensions = dimensions or vector.size
+            if min_dimensions and dimensions < min_dimensions:
+                raise ValueError(f"Row {first_row + i}: vectors have {dimensions} dimensions, "
+                                 f"at least {min_dimensions} are needed")
+            matrix = np.empty((len(values), dimensions), dtype=np.float32)
+        if vector.size != dimensions:
+            raise ValueError(f"Row {first_row + i}: expected {dimensions} dimensions, found {vector.size}")
+        matrix[i] = vector
+    if matrix is None:
+        return np.empty((0, dimensions or 0), dtype=np.float32)
+    return matrix
+
+
+def read_csv_chunks(source, vector_column="vector", chunksize=5000, dimensions=None, min_dimensions=None,
+                    **read_csv_args):
+    """
+    Read a CSV with a JSON-array vector column in chunks.
+    Yields (DataFrame without the vector column, float32 matrix of the vectors); errors in the
+    vector column report the data row number (1 for the first row after the header).
+    """
+    first_row = 1
+    for chunk in pd.read_csv(source, chunksize=chunksize, **read_csv_args):
+        vectors = parse_vectors(chunk[vector_column], dimensions, min_dimensions, first_row)
+        first_row += len(chunk)
+        yield chunk.drop(columns=[vector_column]), vectors
+
+
+def stream_csv_to_table(source, conn, insert_sql, build_rows, vector_column="vector", chunksize=5000,
+                        max_pending_chunks=4, batch_size=1000, progress=None, **read_csv_args):
+    """
+    Load a CSV with embeddings into a table with flat memory use.
+
+    A reader thread parses the CSV chunk by chunk (vectors are parsed once, into float32)
+    and hands the rows built by `build_rows(frame, vectors)` to the database writer through
+    a queue holding at most `max_pending_chunks` chunks, so parsing and inserting overlap.
+    Returns the BulkLoadResult of the writer.
+    """
+    pending = queue.Queue(maxsize=max_pending_chunks)
+    stop = threading.Event()
+
+    def offer(item):
+        # Give up once the writer has stopped, so the reader never blocks on a full queue
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for frame, vectors in read_csv_chunks(source, vector_column, chunksize, **read_csv_args):
+                if not offer(list(build_rows(frame, vectors))):
+                    return
+            offer(_DONE)
+        except BaseException as e:
+            offer(e)
+
+    def rows():
+        while True:
+            item = pending.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield from item
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        return BulkLoader(conn, insert_sql, batch_size=batch_size, progress=progress).load(rows())
+    finally:
+        stop.set()
+        reader.join()
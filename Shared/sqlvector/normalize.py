@@ -0,0 +1,109 @@
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+    # The Arrow kernels use RE2, whose \b, \w and \s are ASCII-only: the single-string path matches them
+    _REGEX_FLAGS = re.ASCII
+except ImportError:
+    STRING_DTYPE = "string"
+    _REGEX_FLAGS = 0
+
+_WHITESPACE = re.compile(r"\s+", _REGEX_FLAGS)
+
+# Same word list as nltk.corpus.stopwords.words('english'), so NLTK is not needed
+ENGLISH_STOPWORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves
+he him his himself she she's her hers herself it it's its itself they them their theirs themselves
+what which who whom this that that'll these those am is are was were be been being have has had
+having do does did doing a an the and but if or because as until while of at by for with about
+against between into through during before after above below to from up down in out on off over
+under again further then once here there when where why how all any both each few more most other
+some such no nor not only own same so than too very s t can will just don don't should should've
+now d ll m o re ve y ain aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn
+hasn't haven haven't isn isn't ma mightn mightn't mustn mustn't needn needn't shan shan't shouldn
+shouldn't wasn wasn't weren weren't won won't wouldn wouldn't
+""".split())
+
+
+class TextNormalizer:
+    """
+    Configurable text cleanup applied to a whole pandas column at once.
+
+    Every step is one vectorized string operation over the column (Arrow compute kernels
+    when pyarrow is installed) instead of a Python function per row:
+
+    - `lowercase`
+    - `ascii_only`: drop non-ASCII characters (accents, emojis)
+    - `strip_punctuation`: drop `string.punctuation`
+    - `alphanumeric_only`: drop everything but ASCII letters, digits and whitespace
+    - `stopwords`: drop these words (matched case-insensitively on word boundaries, before
+      punctuation is stripped, so contractions like "don't" are matched whole)
+    - `collapse_whitespace`: turn runs of whitespace into one space and trim the ends
+    """
+
+    def __init__(self, lowercase=True, ascii_only=True, strip_punctuation=True, alphanumeric_only=False,
+                 stopwords=None, collapse_whitespace=True):
+        self.lowercase = lowercase
+        self.ascii_only = ascii_only
+        self.strip_punctuation = strip_punctuation
+        self.alphanumeric_only = alphanumeric_only
+        self.stopwords = sorted(stopwords, key=len, reverse=True) if stopwords else None
+        self.collapse_whitespace = collapse_whitespace
+        # Compiled once for normalize(), which works on a single string without pandas
+        self._regexes = [re.compile(pattern, _REGEX_FLAGS) for pattern in self._patterns()]
+
+    def _patterns(self):
+        # Removal patterns, in the order they are applied
+        if self.ascii_only:
+            yield r"[^\x00-\x7F]+"
+        if self.stopwords:
+            yield r"(?i)\b(?:" + "|".join(re.escape(w) for w in self.stopwords) + r")\b"
+        if self.alphanumeric_only:
+            yield r"[^a-zA-Z0-9\s]+"
+        elif self.strip_punctuation:
+            yield "[" + re.escape(string.punctuation) + "]+"
+
+    def normalize_series(self, series, processes=None, chunk_size=100_000):
+        """
+        Normalize a column of strings; missing values stay missing. With `processes` > 1,
+        the column is split into chunks of `chunk_size` rows normalized on a process pool.
+        """
+        if processes and processes > 1 and len(series) > chunk_size:
+            chunks = [series.iloc[i:i + chunk_size] for i in range(0, len(series), chunk_size)]
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                return pd.concat(list(executor.map(self.normalize_series, chunks)))
+
+        result = series.astype(STRING_DTYPE)
+        if self.lowercase:
+            result = result.str.lower()
+        for pattern in self._patterns():
+            result = result.str.replace(pattern, "", regex=True)
+        if self.collapse_whitespace:
+            result = result.str.replace(r"\s+", " ", regex=True).str.strip()
+        return result.astype(object) if series.dtype == object else result
+
+    def normalize(self, text):
+        """
+        Normalize a single string with the same rules; a missing value is returned as is.
+        """
+        if not isinstance(text, str):
+            return text
+        if self.lowercase:
+            text = text.lower()
+        for regex in self._regexes:
+            text = regex.sub("", text)
+        if self.collapse_whitespace:
+            text = _WHITESPACE.sub(" ", text).strip()
+        return text
+
+    def normalize_column(self, df, column, target=None, processes=None, chunk_size=100_000):
+        """
+        Normalize `df[column]` into `df[target or column]` and return `df`.
+        """
+        df[target or column] = self.normalize_series(df[column], processes=processes, chunk_size=chunk_size)
+        return df
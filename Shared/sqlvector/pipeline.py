@@ -0,0 +1,183 @@
+import queue
+import threading
+import time
+
+_END = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    `fn` receives one item and returns an iterable of output items (so a stage can
+    drop, transform or fan out items). With `batch_size`, `fn` receives a list of up
+    to `batch_size` items instead, waiting at most `batch_wait` seconds to fill it.
+    `workers` threads run the stage concurrently.
+    """
+
+    def __init__(self, name, fn, workers=1, batch_size=None, batch_wait=0.05):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+
+
+class PipelineError(Exception):
+    """
+    Raised by Pipeline.run when a stage failed; the original exception is chained.
+    """
+
+
+class Pipeline:
+    """
+    Runs stages concurrently, connected by bounded queues of `queue_size` items, so
+    later stages start working on the first items while earlier stages are still busy
+    and memory stays bounded.
+
+    `progress(stats)` is called from the thread running `run()` (safe for Streamlit)
+    whenever the per-stage counters change; `stats` maps each stage name to a dict
+    with the number of items received and produced.
+    """
+
+    def __init__(self, stages, queue_size=16, progress=None, poll_interval=0.1):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.progress = progress
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error = None
+        self.stats = {}
+
+    def _put(self, q, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._stop.is_set():
+            wait = self.poll_interval if deadline is None else min(self.poll_interval, deadline - time.monotonic())
+            if wait <= 0:
+                raise queue.Empty
+            try:
+                return q.get(timeout=wait)
+            except queue.Empty:
+                continue
+        raise queue.Empty
+
+    def _fail(self, error):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _count(self, stage, key, n):
+        with self._lock:
+            self.stats[stage.name][key] += n
+
+    def _next_input(self, stage, inbox):
+        """
+        Next item (or batch) for a worker, or _END once the upstream is exhausted.
+        """
+        item = self._get(inbox)
+        if item is _END or stage.batch_size is None:
+            return item
+        batch = [item]
+        deadline = time.monotonic() + stage.batch_wait
+        while len(batch) < stage.batch_size:
+            try:
+                item = self._get(inbox, timeout=deadline - time.monotonic())
+            except queue.Empty:
+                break
+            if item is _END:
+                inbox.put(_END)  # leave the end marker for the next read
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self, stage, inbox, outbox, remaining):
+        try:
+            while True:
+                item = self._next_input(stage, inbox)
+                if item is _END:
+                    inbox.put(_END)  # let sibling workers see the end marker too
+                    break
+                self._count(stage, "in", len(item) if stage.batch_size else 1)
+                for output in stage.fn(item):
+                    if not self._put(outbox, output):
+                        return
+                    self._count(stage, "out", 1)
+        except queue.Empty:
+            return
+        except BaseException as e:
+            self._fail(e)
+            return
+        with self._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            self._put(outbox, _END)
+
+    def run(self, items):
+        """
+        Push `items` through every stage and return the outputs of the last stage
+        (in completion order, which can differ from the input order).
+        """
+        self._stop.clear()
+        self._error = None
+        self.stats = {stage.name: {"in": 0, "out": 0} for stage in self.stages}
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        def feed():
+            try:
+                for item in items:
+                    if not self._put(queues[0], item):
+                        return
+                self._put(queues[0], _END)
+            except BaseException as e:
+                self._fail(e)
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for i, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(target=self._worker, args=(stage, queues[i], queues[i + 1], remaining), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        results = []
+        reported = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = queues[-1].get(timeout=self.poll_interval)
+                except queue.Empty:
+                    reported = self._report(reported)
+                    continue
+                if item is _END:
+                    break
+                results.append(item)
+                reported = self._report(reported)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        self._report(reported)
+        if self._error is not None:
+            raise PipelineError(f"Pipeline stage failed: {self._error}") from self._error
+        return results
+
+    def _report(self, reported):
+        if self.progress is None:
+            return reported
+        with self._lock:
+            snapshot = {name: dict(counts) for name, counts in self.stats.items()}
+        if snapshot != reported:
+            self.progress(snapshot)
+        return snapshot
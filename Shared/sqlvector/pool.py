@@ -0,0 +1,208 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """
+    Raised when no connection became available within the acquire timeout.
+    """
+
+
+class PoolClosedError(Exception):
+    """
+    Raised when a connection is requested from a pool that was closed.
+    """
+
+
+class PooledConnection:
+    """
+    Wrapper around a pooled DB-API connection: `close()` hands it back to the pool
+    instead of closing it, everything else is delegated to the real connection.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        # Read _conn from __dict__: if __init__ failed before setting it, self._conn would
+        # call __getattr__ again (e.g. from __del__) and recurse
+        if self.__dict__.get("_conn") is None:
+            raise AttributeError(f"Connection was returned to the pool; cannot access '{name}'")
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+    def discard(self):
+        """
+        Close the underlying connection for good, e.g. after a network error.
+        """
+        if self._conn is not None:
+            self._pool.release(self._conn, discard=True)
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Safety net for code paths that never call close() (e.g. an exception before it):
+        # the connection is dropped rather than leaking a pool slot
+        if getattr(self, "_conn", None) is not None:
+            self.discard()
+
+
+class ConnectionPool:
+    """
+    Thread-safe, process-wide pool of DB-API connections created by `connect()`.
+
+    - at most `max_size` connections are open at once; callers wait (up to `timeout`) for a free one
+    - connections idle for more than `idle_timeout` seconds are closed
+    - a connection idle for more than `check_after` seconds is validated with `health_check`
+      before reuse, and replaced by a new one if the check fails (automatic reconnect)
+    - returned connections are rolled back, so no transaction leaks to the next user
+    """
+
+    def __init__(self, connect, max_size=5, idle_timeout=300.0, check_after=30.0, health_check="SELECT 1",
+                 timeout=30.0, clock=time.monotonic):
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.health_check = health_check
+        self.timeout = timeout
+        self.clock = clock
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "reused": 0, "discarded": 0}
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.health_check)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self):
+        # Called with the lock held; returns the connections to close outside of it
+        now = self.clock()
+        expired = [c for c, t in self._idle if now - t > self.idle_timeout]
+        if expired:
+            self._idle = [(c, t) for c, t in self._idle if now - t <= self.idle_timeout]
+            self._open -= len(expired)
+            self.stats["discarded"] += len(expired)
+            self._cond.notify_all()
+        return expired
+
+    def acquire(self, timeout=None):
+        """
+        Check out a connection. Call `close()` on the returned PooledConnection to return it.
+        Raises PoolClosedError once the pool is closed.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                expired = self._evict_idle()
+                candidate = None
+                while candidate is None:
+                    if self._closed:
+                        raise PoolClosedError("The connection pool is closed")
+                    if self._idle:
+                        candidate = self._idle.pop()
+                    elif self._open < self.max_size:
+                        self._open += 1
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeoutError(f"No connection available within {timeout} seconds")
+                        self._cond.wait(remaining)
+            for conn in expired:
+                self._close_quietly(conn)
+
+            if candidate is None:
+                try:
+                    conn = self.connect()
+                except BaseException:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify_all()
+                    raise
+                with self._cond:
+                    self.stats["created"] += 1
+                return PooledConnection(self, conn)
+
+            conn, returned_at = candidate
+            if self.clock() - returned_at <= self.check_after or self._is_healthy(conn):
+                with self._cond:
+                    self.stats["reused"] += 1
+                return PooledConnection(self, conn)
+            # Broken connection: drop it and try again (a new one is opened if none is idle)
+            self.release(conn, discard=True)
+
+    def release(self, conn, discard=False):
+        if self._closed:
+            discard = True
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._close_quietly(conn)
+        with self._cond:
+            if discard:
+                self._open -= 1
+                self.stats["discarded"] += 1
+            else:
+                self._idle.append((conn, self.clock()))
+            self._cond.notify_all()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that checks out a connection and returns it afterwards.
+        """
+        pooled = self.acquire(timeout)
+        try:
+            yield pooled
+        finally:
+            pooled.close()
+
+    def close(self):
+        """
+        Close all idle connections. Checked-out connections are closed when returned, and
+        callers waiting in `acquire()` (or calling it later) get PoolClosedError.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, open=self._open, idle=len(self._idle))
@@ -0,0 +1,212 @@
+import json
+import os
+
+import numpy as np
+
+from .exact import ExactIndex
+
+MODES = ("int8", "binary")
+
+# Bits set in each byte value, for NumPy 1.x, which has no np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _hamming(codes, code):
+    # Number of differing bits between each row of `codes` and `code` (uint64 words)
+    diff = codes ^ code
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(diff).sum(axis=1, dtype=np.int32)
+    return _BYTE_POPCOUNT[diff.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def _top(distances, positions, k):
+    # The k smallest distances of each row (unsorted), with their positions
+    if distances.shape[1] > k:
+        keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        return np.take_along_axis(distances, keep, axis=1), np.take_along_axis(positions, keep, axis=1)
+    return distances, positions
+
+
+class QuantizedIndex:
+    """
+    Two-step vector search over compressed codes with exact rescoring.
+
+    Every vector is also stored as a small code, scanned to find candidates:
+
+    - `int8`: one signed byte per dimension, with a symmetric scale per dimension
+      (4x smaller than float32); the scan uses the decoded vectors' distances.
+    - `binary`: one bit per dimension, the sign of the value after subtracting the mean
+      vector (32x smaller); the scan ranks by Hamming distance (XOR + popcount), which
+      approximates the angle between vectors, so it suits cosine best.
+
+    The `oversample * k` best candidates of the scan are then rescored with exact float32
+    distances against the full-precision vectors (an ExactIndex in `dtype`), which only
+    reads the candidates' rows: after `save`/`load(mmap=True)` the full vectors can stay on
+    disk while only the codes are kept in memory. Distances follow VECTOR_DISTANCE, like
+    ExactIndex; with `rescore=False`, they are the scan's approximate distances (int8) or
+    Hamming distances (binary).
+    """
+
+    def __init__(self, vectors=None, metric="cosine", mode="int8", oversample=4, dtype=np.float32,
+                 block_rows=16384):
+        if mode not in MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}', expected one of {MODES}")
+        self.full = ExactIndex(metric=metric, dtype=dtype)
+        self.mode = mode
+        self.oversample = oversample
+        self.block_rows = block_rows
+        self.scale = None
+        self.center = None
+        self.codes = None
+        self.code_norms = None
+        if vectors is not None:
+            self.add(vectors)
+
+    @property
+    def metric(self):
+        return self.full.metric
+
+    def __len__(self):
+        return len(self.full)
+
+    @property
+    def nbytes(self):
+        """
+        Size of the codes scanned by every search.
+        """
+        return 0 if self.codes is None else self.codes.nbytes
+
+    def memory(self):
+        """
+        Bytes used by the codes and by the full-precision vectors kept for rescoring.
+        """
+        return {"codes": self.nbytes, "full": 0 if self.full.vectors is None else self.full.vectors.nbytes}
+
+    # Codes
+
+    def _fit(self, vectors):
+        if self.mode == "int8":
+            scale = np.abs(vectors).max(axis=0) / 127.0
+            scale[scale == 0] = 1.0
+            self.scale = scale.astype(np.float32)
+        else:
+            self.center = vectors.mean(axis=0).astype(np.float32)
+
+    def _encode(self, vectors):
+        if self.mode == "int8":
+            return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        bits = np.packbits(vectors > self.center, axis=1)
+        # Pad to whole 64-bit words, so popcounts run on uint64
+        padding = -bits.shape[1] % 8
+        return np.pad(bits, ((0, 0), (0, padding))).view(np.uint64)
+
+    def add(self, vectors):
+        """
+        Append vectors; the quantization parameters are fitted on the first vectors added.
+        """
+        start = len(self)
+        self.full.add(vectors)
+        prepared = self.full.vectors[start:].astype(np.float32)
+        if self.scale is None and self.center is None:
+            self._fit(prepared)
+        codes = self._encode(prepared)
+        norms = None
+        if self.mode == "int8":
+            decoded = codes.astype(np.float32) * self.scale
+            norms = np.einsum("ij,ij->i", decoded, decoded)
+        if self.codes is None:
+            self.codes, self.code_norms = codes, norms
+        else:
+            self.codes = np.concatenate([self.codes, codes])
+            if norms is not None:
+                self.code_norms = np.concatenate([self.code_norms, norms])
+
+    # Search
+
+    def _int8_scores(self, scaled, block):
+        if len(scaled) >= 8:
+            # Converting the block once is amortized over a batch of queries (BLAS matmul)
+            return scaled @ block.T.astype(np.float32)
+        # A few queries: quantize them too and multiply in integers, without converting the block
+        query_scale = np.abs(scaled).max(axis=1, keepdims=True) / 127.0
+        query_scale[query_scale == 0] = 1.0
+        query_codes = np.rint(scaled / query_scale).astype(np.int8)
+        return np.einsum("ij,kj->ik", query_codes, block, dtype=np.int32) * query_scale
+
+    def _scan(self, queries, count):
+        # Approximate top `count` of each query over the codes, block by block
+        best_distances = np.empty((len(queries), 0), dtype=np.float32)
+        best_positions = np.empty((len(queries), 0), dtype=np.int64)
+        if self.mode == "int8":
+            scaled = queries * self.scale
+            query_norms = np.einsum("ij,ij->i", queries, queries)
+        else:
+            query_codes = self._encode(queries)
+        for start in range(0, len(self), self.block_rows):
+            block = self.codes[start:start + self.block_rows]
+            if self.mode == "int8":
+                distances = self.full._distance(self._int8_scores(scaled, block), query_norms,
+                                                self.code_norms[start:start + len(block)])
+            else:
+                distances = np.stack([_hamming(block, code) for code in query_codes]).astype(np.float32)
+            positions = np.broadcast_to(np.arange(start, start + len(block)), distances.shape)
+            distances, positions = _top(distances, positions, count)
+            best_distances, best_positions = _top(np.concatenate([best_distances, distances], axis=1),
+                                                  np.concatenate([best_positions, positions], axis=1), count)
+        return best_positions, best_distances
+
+    def search(self, queries, k, oversample=None, rescore=True):
+        """
+        Top-k for each query, same shape as ExactIndex.search: (positions, distances), two
+        (n_queries, k) arrays sorted by distance. `oversample` overrides the number of
+        candidates (times k) rescored exactly; `rescore=False` returns the scan's ranking.
+        """
+        queries = self.full._prepare(queries)
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        count = min(len(self), k * (oversample or self.oversample)) if rescore else k
+        candidates, distances = self._scan(queries, count)
+        if rescore:
+            # Rows are read in storage order, which keeps memory-mapped reads sequential
+            candidates = np.sort(candidates, axis=1)
+            distances = np.stack([self.full.distances(query, rows) for query, rows in zip(queries, candidates)])
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(distances, order, axis=1)
+
+    # Persistence
+
+    def save(self, path):
+        """
+        Write the index to the directory `path` as .npy arrays plus a small JSON header.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.full.vectors)
+        np.save(os.path.join(path, "norms.npy"), self.full.norms)
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        np.save(os.path.join(path, "quantizer.npy"), self.scale if self.mode == "int8" else self.center)
+        if self.code_norms is not None:
+            np.save(os.path.join(path, "code_norms.npy"), self.code_norms)
+        with open(os.path.join(path, "index.json"), "w") as f:
+            json.dump({"metric": self.metric, "mode": self.mode, "oversample": self.oversample,
+                       "block_rows": self.block_rows}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Open an index written by `save`. The codes are read into memory; with `mmap`, the
+        full-precision vectors are memory-mapped and only the candidates' pages are read.
+        """
+        with open(os.path.join(path, "index.json")) as f:
+            settings = json.load(f)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        index = cls(metric=settings.pop("metric"), dtype=vectors.dtype, **settings)
+        index.full = ExactIndex.from_arrays(vectors, np.load(os.path.join(path, "norms.npy")), index.metric)
+        index.codes = np.load(os.path.join(path, "codes.npy"))
+        quantizer = np.load(os.path.join(path, "quantizer.npy"))
+        if index.mode == "int8":
+            index.scale = quantizer
+            index.code_norms = np.load(os.path.join(path, "code_norms.npy"))
+        else:
+            index.center = quantizer
+        return index
@@ -0,0 +1,108 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU mapping.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def discard_if(self, predicate):
+        with self._lock:
+            for key in [k for k in self._items if predicate(k)]:
+                del self._items[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+def embedding_hash(embedding):
+    return hashlib.sha1(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+class SearchCache:
+    """
+    Two-tier, in-process cache in front of a vector search.
+
+    - tier 1 maps (embedding model, dimensions, query text) to its embedding, so a query is embedded
+      once per model, as in EmbeddingCache
+    - tier 2 maps (query embedding hash, table, table version, backend) to the top-k rows; a result
+      fetched for a larger k also serves any smaller k
+
+    `invalidate(table)` bumps the table version after new data was written, so stale results
+    are never served. The version is tracked in this process only.
+    """
+
+    def __init__(self, max_queries=1024, max_results=256):
+        self.embeddings = LRUCache(max_queries)
+        self.results = LRUCache(max_results)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.stats = {"embedding_hits": 0, "embedding_misses": 0, "result_hits": 0, "result_misses": 0}
+
+    def version(self, table):
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def invalidate(self, table):
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+        self.results.discard_if(lambda key: key[1] == table)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def embedding(self, text, compute, model=None, dimensions=None):
+        """
+        Return the cached embedding of `text` for `model` (deployment name) and `dimensions`
+        (None for the model's native size), or `compute()` it and cache it.
+        """
+        key = (model, dimensions, text)
+        embedding = self.embeddings.get(key)
+        if embedding is not None:
+            self._count("embedding_hits")
+            return embedding
+        self._count("embedding_misses")
+        embedding = compute()
+        self.embeddings.put(key, embedding)
+        return embedding
+
+    def search(self, embedding, k, run_query, table, backend=None):
+        """
+        Return the top-k rows for `embedding`, calling `run_query(k)` only when no cached
+        result for at least k rows exists for the current version of `table`. Results of
+        different search `backend`s (e.g. SQL and a local index) are cached separately.
+        """
+        key = (embedding_hash(embedding), table, self.version(table), backend)
+        cached = self.results.get(key)
+        if cached is not None and cached[0] >= k:
+            self._count("result_hits")
+            return cached[1][:k]
+        self._count("result_misses")
+        rows = list(run_query(k))
+        self.results.put(key, (k, rows))
+        return rows
@@ -0,0 +1,212 @@
+import random
+import threading
+import time
+
+
+class ThrottledError(Exception):
+    """
+    Raised by a scheduled call when the service answered with HTTP 429 (or 503).
+    `retry_after` is the delay in seconds requested by the service, if any.
+    """
+
+    def __init__(self, retry_after=None, message="Request was throttled by the service"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after_from_headers(headers):
+    """
+    Read the delay (in seconds) requested by Azure OpenAI from the response headers.
+    """
+    if headers is None:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value is not None:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def check_throttled(response):
+    """
+    Raise ThrottledError if a `requests` response says the call was throttled.
+    """
+    if response.status_code in (429, 503):
+        raise ThrottledError(retry_after_from_headers(response.headers),
+                             f"Service returned HTTP {response.status_code}")
+
+
+def as_throttled(fn):
+    """
+    Call `fn` and turn SDK errors carrying an HTTP 429 status (e.g. openai.RateLimitError)
+    into ThrottledError, so the scheduler can back off and retry them.
+    """
+    try:
+        return fn()
+    except Exception as e:
+        if getattr(e, "status_code", None) == 429:
+            response = getattr(e, "response", None)
+            raise ThrottledError(retry_after_from_headers(getattr(response, "headers", None)), str(e)) from e
+        raise
+
+
+class TokenBucket:
+    """
+    Per-minute budget that refills continuously.
+    """
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """
+        Seconds to wait before `amount` can be taken (0 if available now).
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        # Tolerate rounding in the refill: a wait shorter than the clock's resolution would never end
+        if self.level >= amount - 1e-9:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def drain(self):
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+class AdaptiveScheduler:
+    """
+    Admission control for calls against a rate-limited deployment.
+
+    Calls are admitted only when the optional tokens-per-minute and requests-per-minute
+    budgets allow it. Concurrency grows by one after a run of successful calls and is
+    halved on every throttled call (AIMD), so throughput converges to what the quota allows.
+    A `Retry-After` delay pauses every caller sharing the scheduler, not just the one
+    that was throttled. `clock` and `sleep` can be injected for deterministic tests.
+    """
+
+    def __init__(self, tokens_per_minute=None, requests_per_minute=None, initial_concurrency=4,
+                 min_concurrency=1, max_concurrency=16, max_retries=8, base_backoff=1.0, max_backoff=60.0,
+                 clock=time.monotonic, sleep=time.sleep, seed=None):
+        self.tokens = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        self.requests = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self._random = random.Random(seed)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        self.stats = {"calls": 0, "throttled": 0, "retries": 0, "waited": 0.0}
+
+    def _wait(self, seconds):
+        if seconds > 0:
+            with self._cond:
+                self.stats["waited"] += seconds
+            self.sleep(seconds)
+
+    def _admit(self, tokens):
+        with self._cond:
+            while self._active >= self.concurrency:
+                self._cond.wait()
+            self._active += 1
+        # Honor a shared Retry-After pause, then wait for budget
+        while True:
+            with self._cond:
+                delay = max(0.0, self._resume_at - self.clock())
+                if delay == 0.0:
+                    delay = max(self.tokens.wait_time(tokens) if self.tokens else 0.0,
+                                self.requests.wait_time(1) if self.requests else 0.0)
+                    if delay == 0.0:
+                        if self.tokens:
+                            self.tokens.take(tokens)
+                        if self.requests:
+                            self.requests.take(1)
+                        return
+            self._wait(delay)
+
+    def _release(self, throttled=False, retry_after=None, failed=False):
+        with self._cond:
+            self._active -= 1
+            if throttled:
+                self.stats["throttled"] += 1
+                self._successes = 0
+                self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+                if retry_after is not None:
+                    self._resume_at = max(self._resume_at, self.clock() + retry_after)
+                if self.tokens:
+                    self.tokens.drain()
+                if self.requests:
+                    self.requests.drain()
+            elif not failed:
+                self._successes += 1
+                if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def _backoff(self, attempt):
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay * (0.5 + self._random.random() / 2)
+
+    def run(self, fn, tokens=1):
+        """
+        Call `fn()` once admitted, retrying it when it raises ThrottledError.
+        `tokens` is the estimated token cost of the call, charged against the TPM budget.
+        """
+        attempt = 0
+        while True:
+            self._admit(tokens)
+            try:
+                result = fn()
+            except ThrottledError as e:
+                self._release(throttled=True, retry_after=e.retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                with self._cond:
+                    self.stats["retries"] += 1
+                if e.retry_after is None:
+                    self._wait(self._backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self._release(failed=True)
+                raise
+            self._release()
+            with self._cond:
+                self.stats["calls"] += 1
+            return result
+
+    def snapshot(self):
+        """
+        Current concurrency limit and counters, for display or logging.
+        """
+        with self._cond:
+            return dict(self.stats, concurrency=self.concurrency, active=self._active)
@@ -0,0 +1,168 @@
+"""
+Reranking stage for vector search results.
+
+The search fetches `oversample` times more candidates than needed; Reranker sends their
+text, truncated to a token budget and split into batches, to a scorer concurrently and
+reorders the candidates by relevance. When the scorer fails or does not answer within
+`timeout`, the candidates are returned in their original (vector) order.
+
+A scorer is any object with `score(query, documents)` returning one relevance score per
+document (higher is more relevant); it may also provide a coroutine `ascore` with the
+same arguments, which is then used instead. CohereReranker calls a Cohere rerank
+deployment over HTTP; CrossEncoderScorer runs a sentence-transformers cross-encoder locally.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .chunking import get_encoding
+
+
+class CohereReranker:
+    """
+    Scorer for the Cohere v2 rerank API, e.g. Cohere-rerank-v4.0-fast deployed in Azure AI
+    Foundry (`url` like https://<endpoint>.services.ai.azure.com/providers/cohere/v2/rerank).
+    """
+
+    def __init__(self, url, api_key, model="Cohere-rerank-v4.0-fast", timeout=30):
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session is not guaranteed to be thread-safe, so keep one per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({"Api-Key": self.api_key, "Content-Type": "application/json"})
+            self._local.session = session
+        return session
+
+    def score(self, query, documents):
+        body = {"model": self.model, "query": query, "documents": documents, "top_n": len(documents)}
+        response = self._session().post(self.url, json=body, timeout=self.timeout)
+        response.raise_for_status()
+        scores = [0.0] * len(documents)
+        for result in response.json()["results"]:
+            scores[result["index"]] = result["relevance_score"]
+        return scores
+
+
+class CrossEncoderScorer:
+    """
+    Local scorer: a sentence-transformers CrossEncoder (`model` is a model name or an
+    already loaded CrossEncoder), e.g. cross-encoder/ms-marco-MiniLM-L-6-v2.
+    """
+
+    def __init__(self, model="cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size=32):
+        if isinstance(model, str):
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model)
+        self.model = model
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+
+    def score(self, query, documents):
+        # One model instance is shared by the worker threads
+        with self._lock:
+            return [float(s) for s in self.model.predict([(query, d) for d in documents], batch_size=self.batch_size)]
+
+
+class RerankResult:
+    """
+    The reranked `items` (at most k, most relevant first) and their relevance `scores`
+    (None when falling back to the original order), whether the scorer's order was used
+    (`reranked`), the `error` that caused a fallback, if any, and the latency in seconds.
+    """
+
+    def __init__(self, items, scores, reranked, error, latency):
+        self.items = items
+        self.scores = scores
+        self.reranked = reranked
+        self.error = error
+        self.latency = latency
+
+    def __repr__(self):
+        state = "reranked" if self.reranked else f"original order ({self.error})"
+        return f"RerankResult({len(self.items)} items, {state}, {self.latency * 1000:.1f} ms)"
+
+
+class Reranker:
+    """
+    Reorders search candidates with `scorer`.
+
+    - `oversample`: callers fetch `candidates(k)` = k * oversample results to rerank
+    - `max_document_tokens`: every document is truncated to this many tokens (tiktoken
+      `encoding`, or about 4 characters per token when `encoding` is None)
+    - `batch_size`: documents per scorer call; up to `max_concurrency` calls run at once
+    - `timeout`: seconds to wait for all batches before falling back to the original order
+    """
+
+    def __init__(self, scorer, oversample=5, batch_size=16, max_document_tokens=512, timeout=5.0,
+                 max_concurrency=4, encoding="cl100k_base"):
+        self.scorer = scorer
+        self.oversample = oversample
+        self.batch_size = batch_size
+        self.max_document_tokens = max_document_tokens
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.encoding = encoding
+        # Own worker threads rather than the loop's default executor, so that a timed-out call
+        # left running does not hold up asyncio.run in `rerank`
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="rerank")
+
+    def candidates(self, k):
+        return k * self.oversample
+
+    def truncate(self, text):
+        """
+        `text` cut to at most `max_document_tokens` tokens.
+        """
+        if self.encoding is None:
+            return text[:self.max_document_tokens * 4]
+        encoding = get_encoding(self.encoding) if isinstance(self.encoding, str) else self.encoding
+        tokens = encoding.encode_ordinary(text)
+        return text if len(tokens) <= self.max_document_tokens else encoding.decode(tokens[:self.max_document_tokens])
+
+    async def _score_batch(self, semaphore, query, documents):
+        async with semaphore:
+            if hasattr(self.scorer, "ascore"):
+                return await self.scorer.ascore(query, documents)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self.scorer.score, query, documents)
+
+    async def _score(self, query, documents):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [documents[i:i + self.batch_size] for i in range(0, len(documents), self.batch_size)]
+        results = await asyncio.gather(*(self._score_batch(semaphore, query, batch) for batch in batches))
+        return [score for batch in results for score in batch]
+
+    async def arerank(self, query, items, k, text=str):
+        """
+        Rerank `items` (search results in vector order; `text(item)` gives the document text)
+        and keep the k most relevant. Returns a RerankResult.
+        """
+        start = time.perf_counter()
+        items = list(items)
+        documents = [self.truncate(text(item)) for item in items]
+        try:
+            scores = await asyncio.wait_for(self._score(query, documents), self.timeout)
+        except Exception as e:
+            error = "timeout" if isinstance(e, asyncio.TimeoutError) else repr(e)
+            return RerankResult(items[:k], None, False, error, time.perf_counter() - start)
+        order = sorted(range(len(items)), key=lambda i: -scores[i])[:k]
+        return RerankResult([items[i] for i in order], [scores[i] for i in order], True, None,
+                            time.perf_counter() - start)
+
+    def rerank(self, query, items, k, text=str):
+        """
+        Blocking version of `arerank`, for callers without an event loop (scripts, Streamlit).
+        """
+        return asyncio.run(self.arerank(query, items, k, text))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
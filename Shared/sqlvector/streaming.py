@@ -0,0 +1,175 @@
+"""
+Streaming chat completions.
+
+CompletionStream wraps the chunks of a chat completion requested with `stream=True`,
+whether they come from the openai SDK or from ChatClient, yields the text as it arrives
+(so it can be passed straight to `st.write_stream`) and measures the time to first token
+and the generation speed. ChatClient is a small requests-based client for the Azure
+OpenAI chat completions endpoint that parses the server-sent events itself.
+"""
+import json
+import threading
+import time
+
+import requests
+
+from .embeddings import estimate_tokens
+from .ratelimit import AdaptiveScheduler, check_throttled
+
+
+def chat_completions_url(endpoint, deployment, api_version="2024-06-01"):
+    """
+    Build the Azure OpenAI chat completions URL for the given endpoint and deployment.
+    """
+    return f"{endpoint.rstrip('/')}/openai/deployments/{deployment}/chat/completions?api-version={api_version}"
+
+
+class StreamStats:
+    """
+    Timings of one streamed completion, in seconds from the moment the request was sent:
+    `time_to_first_token` (None if no text came back) and `duration` (last chunk received),
+    plus the number of completion `tokens` (from the usage chunk when the service sends
+    one, else the number of text chunks, which carry about one token each).
+    """
+
+    def __init__(self, time_to_first_token, duration, tokens):
+        self.time_to_first_token = time_to_first_token
+        self.duration = duration
+        self.tokens = tokens
+
+    @property
+    def tokens_per_second(self):
+        # Generation speed once the first token arrived; the wait for it is the TTFT
+        if self.time_to_first_token is None or self.tokens < 2:
+            return None
+        generating = self.duration - self.time_to_first_token
+        return (self.tokens - 1) / generating if generating > 0 else None
+
+    def describe(self):
+        """
+        One line for the UI, e.g. "First token after 640 ms, 212 tokens in 4.9 s, 49.8 tokens/s".
+        """
+        if self.time_to_first_token is None:
+            return f"No text received in {self.duration:.1f} s"
+        speed = f", {self.tokens_per_second:.1f} tokens/s" if self.tokens_per_second else ""
+        return f"First token after {self.time_to_first_token * 1000:.0f} ms, {self.tokens} tokens in {self.duration:.1f} s{speed}"
+
+    def __repr__(self):
+        return f"StreamStats({self.describe()})"
+
+
+def _field(value, name):
+    return value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+
+
+class CompletionStream:
+    """
+    Iterate to get the text pieces of a streamed completion as they arrive. `chunks` are
+    openai SDK ChatCompletionChunk objects or the equivalent dicts; `start` is the
+    perf_counter time the request was sent (now by default). Once the iteration is over,
+    `text` is the whole answer and `stats` a StreamStats; `chunks` is closed then, also when
+    the consumer stops early.
+    """
+
+    def __init__(self, chunks, start=None):
+        self.chunks = chunks
+        self.start = time.perf_counter() if start is None else start
+        self.parts = []
+        self.stats = None
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def __iter__(self):
+        first = None
+        pieces = 0
+        usage_tokens = None
+        try:
+            for chunk in self.chunks:
+                usage = _field(chunk, "usage")
+                if usage:
+                    usage_tokens = _field(usage, "completion_tokens")
+                choices = _field(chunk, "choices")
+                if not choices:
+                    continue
+                content = _field(_field(choices[0], "delta") or {}, "content")
+                if not content:
+                    continue
+                if first is None:
+                    first = time.perf_counter() - self.start
+                pieces += 1
+                self.parts.append(content)
+                yield content
+        finally:
+            self.stats = StreamStats(first, time.perf_counter() - self.start, usage_tokens or pieces)
+            # A consumer that stops early closes this generator: pass it on so the HTTP response
+            # (iter_sse, or the openai SDK Stream) is released instead of left open
+            close = getattr(self.chunks, "close", None)
+            if close is not None:
+                close()
+
+
+def iter_sse(response):
+    """
+    JSON payloads of the `data:` server-sent events of a streamed requests response, up to `[DONE]`.
+    """
+    try:
+        # chunk_size=None hands over each chunk as it arrives instead of waiting to fill a buffer
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            yield json.loads(data)
+    finally:
+        response.close()
+
+
+class ChatClient:
+    """
+    Azure OpenAI chat completions over plain HTTP, for scripts without the openai SDK.
+    Requests go through `scheduler` (an AdaptiveScheduler), so 429 answers are retried.
+    """
+
+    def __init__(self, url, api_key, timeout=60, scheduler=None):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.scheduler = scheduler or AdaptiveScheduler()
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session is not guaranteed to be thread-safe, so keep one per thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({"api-key": self.api_key, "Content-Type": "application/json"})
+            self._local.session = session
+        return session
+
+    def _post(self, body, stream):
+        def call():
+            response = self._session().post(self.url, json=body, timeout=self.timeout, stream=stream)
+            check_throttled(response)
+            response.raise_for_status()
+            return response
+
+        return self.scheduler.run(call, tokens=sum(estimate_tokens(m["content"]) for m in body["messages"]))
+
+    def stream(self, messages, **params):
+        """
+        Start a streamed completion and return its CompletionStream; the extra `params`
+        (temperature, max_tokens, ...) are sent as they are.
+        """
+        start = time.perf_counter()
+        response = self._post(dict(params, messages=messages, stream=True), stream=True)
+        return CompletionStream(iter_sse(response), start)
+
+    def complete(self, messages, **params):
+        """
+        The whole answer at once, without streaming.
+        """
+        response = self._post(dict(params, messages=messages), stream=False)
+        return response.json()["choices"][0]["message"]["content"]
@@ -0,0 +1,404 @@
+"""
+Local stand-ins for the Azure services used by the samples, so the shared
+helpers can be exercised offline.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .embeddings import estimate_tokens
+
+
+def fake_embedding(text, dimensions=1536):
+    """
+    Deterministic, unit-length pseudo embedding derived from the text.
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rnd = random.Random(seed)
+    vector = [rnd.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector]
+
+
+class _Server(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections when more clients connect at once
+    request_queue_size = 64
+
+
+class _FakeServer:
+    """
+    Runs a ThreadingHTTPServer on a random local port in a background thread.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def respond(self, body):
+        raise NotImplementedError
+
+    def _handler(self):
+        # POSTed JSON bodies are recorded in `requests` and answered by `respond`. A payload
+        # that is not a dict is an iterable of server-sent events, each written as it comes
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 for chunked streaming; every other answer carries a Content-Length
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; with Nagle's algorithm each keep-alive request waits for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests.append(body)
+                status, headers, payload = server.respond(body)
+                if not isinstance(payload, dict):
+                    # Chunked transfer encoding, one chunk per event, like the Azure services
+                    self.send_response(status)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for event in payload:
+                        data = f"data: {event}\n\n".encode("utf-8")
+                        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                content = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeEmbeddingServer(_FakeServer):
+    """
+    Minimal HTTP server speaking the Azure OpenAI embeddings protocol.
+
+    Every request body is recorded in `requests`; use `url` as the embeddings URL. Every
+    request waits `delay` seconds first, to simulate the service latency.
+    """
+
+    def __init__(self, dimensions=1536, deployment="text-embedding-ada-002", delay=0.0):
+        super().__init__()
+        self.dimensions = dimensions
+        self.deployment = deployment
+        self.delay = delay
+
+    @property
+    def url(self):
+        return f"{self.endpoint}openai/deployments/{self.deployment}/embeddings?api-version=2023-05-15"
+
+    def respond(self, body):
+        """
+        Build the (status, headers, payload) answer for an embeddings request. A `dimensions`
+        field shortens the vectors like the text-embedding-3 models do (the same prefix, renormalized).
+        """
+        time.sleep(self.delay)
+        dimensions = body.get("dimensions", self.dimensions)
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions)}
+            for i, text in enumerate(body["input"])
+        ]
+        return 200, {}, {"object": "list", "data": data, "model": self.deployment}
+
+
+class FakeRerankServer(_FakeServer):
+    """
+    Minimal HTTP server speaking the Cohere v2 rerank protocol (as deployed in Azure AI
+    Foundry). A document's relevance is the fraction of the query's words it contains;
+    every request waits `delay` seconds first, to simulate a slow model.
+    """
+
+    def __init__(self, delay=0.0, model="Cohere-rerank-v4.0-fast"):
+        super().__init__()
+        self.delay = delay
+        self.model = model
+
+    @property
+    def url(self):
+        return f"{self.endpoint}providers/cohere/v2/rerank"
+
+    def respond(self, body):
+        time.sleep(self.delay)
+        words = set(body["query"].lower().split())
+        results = []
+        for i, document in enumerate(body["documents"]):
+            found = words & set(document.lower().split())
+            results.append({"index": i, "relevance_score": len(found) / max(len(words), 1)})
+        results.sort(key=lambda r: -r["relevance_score"])
+        top_n = body.get("top_n") or len(results)
+        return 200, {}, {"id": "fake", "results": results[:top_n]}
+
+
+class FakeChatServer(_FakeServer):
+    """
+    Minimal HTTP server speaking the Azure OpenAI chat completions protocol. The answer is
+    `reply` (by default it repeats the last user message), split into word tokens; with
+    `"stream": true` each token is sent as a server-sent event, the first one after
+    `first_token_delay` seconds and the next ones `token_delay` seconds apart.
+    """
+
+    def __init__(self, reply=None, first_token_delay=0.0, token_delay=0.0, deployment="gpt-4.1"):
+        super().__init__()
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.deployment = deployment
+
+    @property
+    def url(self):
+        return f"{self.endpoint}openai/deployments/{self.deployment}/chat/completions?api-version=2024-06-01"
+
+    def respond(self, body):
+        user_messages = [m["content"] for m in body["messages"] if m["role"] == "user"]
+        reply = self.reply if self.reply is not None else f"You asked: {user_messages[-1] if user_messages else ''}"
+        tokens = re.findall(r"\s*\S+", reply)
+        usage = {"prompt_tokens": sum(estimate_tokens(m["content"]) for m in body["messages"]),
+                 "completion_tokens": len(tokens)}
+        if not body.get("stream"):
+            time.sleep(self.first_token_delay + self.token_delay * max(len(tokens) - 1, 0))
+            choice = {"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}
+            return 200, {}, {"id": "fake", "object": "chat.completion", "model": self.deployment,
+                             "choices": [choice], "usage": usage}
+        return 200, {}, self._events(tokens, usage, body.get("stream_options", {}).get("include_usage"))
+
+    def _events(self, tokens, usage, include_usage):
+        def chunk(delta, finish_reason=None):
+            return json.dumps({"id": "fake", "object": "chat.completion.chunk", "model": self.deployment,
+                               "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]})
+
+        time.sleep(self.first_token_delay)
+        yield chunk({"role": "assistant", "content": ""})
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            yield chunk({"content": token})
+        yield chunk({}, "stop")
+        if include_usage:
+            yield json.dumps({"id": "fake", "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        yield "[DONE]"
+
+
+class ThrottlingEmbeddingServer(FakeEmbeddingServer):
+    """
+    FakeEmbeddingServer that enforces a request and token quota per time window and
+    answers HTTP 429 with `Retry-After` once it is exhausted, like a busy Azure OpenAI
+    deployment. `throttled` counts the rejected requests.
+    """
+
+    def __init__(self, max_requests=None, max_tokens=None, window=60.0, clock=time.monotonic, **kwargs):
+        super().__init__(**kwargs)
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.window = window
+        self.clock = clock
+        self.throttled = 0
+        self._window_start = clock()
+        self._window_requests = 0
+        self._window_tokens = 0
+
+    def respond(self, body):
+        tokens = sum(estimate_tokens(text) for text in body["input"])
+        with self._lock:
+            now = self.clock()
+            if now - self._window_start >= self.window:
+                self._window_start, self._window_requests, self._window_tokens = now, 0, 0
+            over_requests = self.max_requests is not None and self._window_requests + 1 > self.max_requests
+            over_tokens = self.max_tokens is not None and self._window_tokens + tokens > self.max_tokens
+            if over_requests or over_tokens:
+                self.throttled += 1
+                retry_after = max(0.0, self._window_start + self.window - now)
+                headers = {"Retry-After": str(math.ceil(retry_after)), "retry-after-ms": str(int(retry_after * 1000))}
+                error = {"error": {"code": "429", "message": "Requests to the Embeddings API have exceeded the rate limit."}}
+                return 429, headers, error
+            self._window_requests += 1
+            self._window_tokens += tokens
+        return super().respond(body)
+
+
+class SimulatedCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.fast_executemany = False
+
+    def _apply(self, rows):
+        for row in rows:
+            if self.conn.fail is not None and self.conn.fail(row):
+                raise ValueError(f"Simulated failure for row {row!r}")
+        self.conn.pending.extend(rows)
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (tuple, list)):
+            params = tuple(params[0])
+        self.conn.round_trip(1)
+        self._apply([params])
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        rows = [tuple(p) for p in seq_of_params]
+        if self.fast_executemany:
+            self.conn.round_trip(len(rows))
+        else:
+            for _ in rows:
+                self.conn.round_trip(1)
+        self._apply(rows)
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class SimulatedConnection:
+    """
+    DB-API stand-in for a pyodbc connection that charges `latency` seconds per
+    round-trip plus `per_row` seconds per row sent. Committed rows end up in `rows`;
+    rows for which `fail(row)` is true make the statement fail.
+    """
+
+    def __init__(self, latency=0.002, per_row=0.00002, fail=None):
+        self.latency = latency
+        self.per_row = per_row
+        self.fail = fail
+        self.rows = []
+        self.pending = []
+        self.round_trips = 0
+
+    def round_trip(self, rows):
+        self.round_trips += 1
+        time.sleep(self.latency + self.per_row * rows)
+
+    def cursor(self):
+        return SimulatedCursor(self)
+
+    def commit(self):
+        self.rows.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class FakeAccessToken:
+    def __init__(self, token, expires_on):
+        self.token = token
+        self.expires_on = expires_on
+
+
+class FakeCredential:
+    """
+    Offline stand-in for an azure-identity credential. Each `get_token` call takes
+    `delay` seconds and returns a new token valid for `lifetime` seconds; `calls` counts them.
+    """
+
+    def __init__(self, lifetime=3600, delay=0.0, clock=time.time):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.clock = clock
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes, **kwargs):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        return FakeAccessToken(f"fake-token-{n}", int(self.clock() + self.lifetime))
+
+
+class FakeClock:
+    """
+    Manual clock for deterministic tests: call it for the current time and pass `sleep`
+    wherever a sleep function is injected. Sleeping advances the time at once instead of
+    waiting; `sleeps` records every requested delay.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.sleeps = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.sleeps.append(seconds)
+            self.now += max(0.0, seconds)
+
+    def advance(self, seconds):
+        with self._lock:
+            self.now += seconds
+
+
+class WordEncoding:
+    """
+    Offline stand-in for a tiktoken encoding, for the chunker and ContextBuilder: every word
+    with its leading whitespace is one token, and tokens are the text pieces themselves.
+    """
+
+    _TOKEN = re.compile(r"\s*\S+|\s+")
+
+    def encode_ordinary(self, text):
+        return self._TOKEN.findall(text)
+
+    def encode_ordinary_batch(self, texts):
+        return [self.encode_ordinary(text) for text in texts]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+    def decode_with_offsets(self, tokens):
+        offsets = []
+        position = 0
+        for token in tokens:
+            offsets.append(position)
+            position += len(token)
+        return self.decode(tokens), offsets
@@ -0,0 +1,305 @@
+"""
+Lightweight tracing for the RAG request path.
+
+`Tracer.trace` starts a trace for one request; inside it, `span("name")` blocks (and
+functions decorated with `traced`) are timed and nested under the span that was active
+when they started. When a trace ends its spans feed per-name latency histograms and the
+tracer's exporters: `JsonLinesExporter` writes OpenTelemetry-shaped span records to a
+file, `OpenTelemetryExporter` replays them into the OpenTelemetry SDK, if installed.
+
+Outside a trace, `span` is one context variable lookup that returns a shared no-op
+object, so instrumented code costs close to nothing when tracing is off.
+"""
+import bisect
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+
+_current = contextvars.ContextVar("sqlvector_span", default=None)
+
+
+class _NoopSpan:
+    trace = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """
+    One timed stage of a trace. `duration` is in seconds; `error` holds the repr of the
+    exception that escaped the block, if any.
+    """
+
+    def __init__(self, trace, name, parent, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = None
+        self.end_ns = None
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self.duration * 1e9)
+        if exc is not None:
+            self.error = repr(exc)
+        _current.reset(self._token)
+        self.trace._finish(self)
+        return False
+
+    def to_dict(self):
+        """
+        The span in the OpenTelemetry (OTLP JSON) field layout.
+        """
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+class Trace:
+    """
+    The spans of one request, in the order they finished; the root span finishes last.
+    """
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans = []
+        self.root = Span(self, name, None, attributes)
+
+    @property
+    def duration(self):
+        return self.root.duration
+
+    def _finish(self, span):
+        self.spans.append(span)
+        if span is self.root:
+            self.tracer._record(self)
+
+    def breakdown(self):
+        """
+        One row per span in start order: its name indented by depth, the offset from the
+        start of the request and the duration in milliseconds, and its error, if any.
+        """
+        rows = []
+        for span in sorted(self.spans, key=lambda s: (s.start_ns, s.depth)):
+            rows.append({
+                "stage": "  " * span.depth + span.name,
+                "start_ms": round((span.start_ns - self.root.start_ns) / 1e6, 2),
+                "duration_ms": round(span.duration * 1000, 2),
+                "error": span.error or "",
+            })
+        return rows
+
+
+def span(name, **attributes):
+    """
+    Time a block as a child of the active span: `with span("sql.query"): ...`. Does
+    nothing outside a trace.
+    """
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent.trace, name, parent, attributes)
+
+
+def traced(name=None):
+    """
+    Decorator running every call of the function in a span (named after the function by default).
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return function(*args, **kwargs)
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class LatencyHistogram:
+    """
+    Explicit-bucket histogram of durations in milliseconds, like an OpenTelemetry histogram:
+    count, sum, min, max and a count per bucket, with percentiles estimated from the buckets.
+    """
+
+    BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, milliseconds):
+        self.counts[bisect.bisect_left(self.bounds, milliseconds)] += 1
+        self.count += 1
+        self.sum += milliseconds
+        self.min = milliseconds if self.min is None else min(self.min, milliseconds)
+        self.max = milliseconds if self.max is None else max(self.max, milliseconds)
+
+    def percentile(self, p):
+        # Linear interpolation inside the bucket holding the p-th value, clamped to min/max
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = max(self.bounds[i - 1] if i else 0.0, self.min)
+                high = min(self.bounds[i] if i < len(self.bounds) else self.max, self.max)
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count, 2) if self.count else None,
+            "p50_ms": round(self.percentile(50), 2) if self.count else None,
+            "p95_ms": round(self.percentile(95), 2) if self.count else None,
+            "p99_ms": round(self.percentile(99), 2) if self.count else None,
+            "max_ms": round(self.max, 2) if self.count else None,
+        }
+
+
+class JsonLinesExporter:
+    """
+    Appends every finished span to `path`, one JSON object per line (see Span.to_dict).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in trace.spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class OpenTelemetryExporter:
+    """
+    Replays finished traces into the OpenTelemetry SDK (with their original timestamps and
+    parent links), so they reach whatever span processor and exporter it is configured with.
+    """
+
+    def __init__(self, tracer=None):
+        from opentelemetry import trace as otel_trace
+        self._otel_trace = otel_trace
+        self.tracer = tracer or otel_trace.get_tracer("sqlvector")
+
+    def export(self, trace):
+        started = {}
+        for s in sorted(trace.spans, key=lambda s: (s.start_ns, s.depth)):
+            parent = started.get(s.parent_id)
+            context = self._otel_trace.set_span_in_context(parent) if parent is not None else None
+            started[s.span_id] = self.tracer.start_span(s.name, context=context, start_time=s.start_ns,
+                                                        attributes={k: str(v) for k, v in s.attributes.items()})
+            if s.error:
+                started[s.span_id].set_status(self._otel_trace.Status(self._otel_trace.StatusCode.ERROR, s.error))
+        for s in trace.spans:
+            started[s.span_id].end(end_time=s.end_ns)
+
+
+class Tracer:
+    """
+    Starts request traces and aggregates them. With `enabled=False`, `trace` records only
+    when asked to (`record=True`, e.g. for a per-request timing panel) and is otherwise a no-op.
+    """
+
+    def __init__(self, enabled=True, exporters=()):
+        self.enabled = enabled
+        self.exporters = list(exporters)
+        self.export_errors = 0
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        TRACING=1 records every request, TRACE_LOG=<path> writes the spans as JSON lines and
+        TRACE_OTEL=1 forwards them to the OpenTelemetry SDK.
+        """
+        exporters = []
+        if os.environ.get("TRACE_LOG"):
+            exporters.append(JsonLinesExporter(os.environ["TRACE_LOG"]))
+        if os.environ.get("TRACE_OTEL", "").lower() in ("1", "true", "yes"):
+            exporters.append(OpenTelemetryExporter())
+        return cls(os.environ.get("TRACING", "").lower() in ("1", "true", "yes"), exporters)
+
+    def trace(self, name, record=False, **attributes):
+        """
+        Root span of one request: `with tracer.trace("search") as request: ...`, then
+        `request.trace.breakdown()` (request.trace is None when nothing was recorded).
+        Inside another trace, this is a plain child span.
+        """
+        if _current.get() is not None:
+            return span(name, **attributes)
+        if not (self.enabled or record):
+            return _NOOP
+        return Trace(self, name, attributes).root
+
+    def _record(self, trace):
+        with self._lock:
+            for s in trace.spans:
+                histogram = self._histograms.get(s.name)
+                if histogram is None:
+                    histogram = self._histograms[s.name] = LatencyHistogram()
+                histogram.record(s.duration * 1000)
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace)
+            except Exception:
+                # Telemetry must never fail the request it describes
+                self.export_errors += 1
+
+    def stats(self):
+        """
+        Latency summary (count, mean, p50/p95/p99, max in milliseconds) of every span name seen.
+        """
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
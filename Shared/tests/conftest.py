@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Like the samples, the tests import sqlvector from the Shared folder instead of an installed package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
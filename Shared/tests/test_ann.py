@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from sqlvector import ann
+from sqlvector.ann import GraphIndex, load_graph_table
+from sqlvector.exact import ExactIndex, LocalTable, recall_at_k
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32))
+    return (centers[rng.integers(0, 20, 3000)] + 0.3 * rng.standard_normal((3000, 32))).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def index(vectors):
+    return GraphIndex(vectors[:2500], degree=16)
+
+
+def recall(index, vectors, queries, k=10):
+    exact, _ = ExactIndex(vectors).search(queries, k)
+    found, _ = index.search(queries, k)
+    return recall_at_k(found, exact)
+
+
+def test_search_recall(index, vectors):
+    assert recall(index, vectors[:2500], vectors[2500:2600]) >= 0.9
+
+
+def test_distances_are_exact_and_sorted(index, vectors):
+    positions, distances = index.search(vectors[2500:2505], 5)
+    for query, row, found in zip(vectors[2500:2505], positions, distances):
+        expected = ExactIndex(vectors[:2500]).distances(query, row)
+        np.testing.assert_allclose(found, expected, rtol=1e-5, atol=1e-6)
+        assert list(found) == sorted(found)
+
+
+def test_insert_then_search(vectors):
+    index = GraphIndex(vectors[:2000], degree=16)
+    index.insert(vectors[2000:2500])
+    assert len(index) == 2500
+    assert recall(index, vectors[:2500], vectors[2500:2600]) >= 0.9
+
+
+def test_save_and_load(index, vectors, tmp_path):
+    index.save(tmp_path)
+    loaded = GraphIndex.load(tmp_path)
+    for a, b in zip(index.search(vectors[2500:2520], 10), loaded.search(vectors[2500:2520], 10)):
+        np.testing.assert_array_equal(a, b)
+
+
+class SignatureConnection:
+    """
+    Answers the two queries of table_signature: COL_LENGTH and the count/max row version.
+    """
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.queries = 0
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def execute(self, sql, *params):
+                self.sql = sql
+                conn.queries += 1
+
+            def fetchone(self):
+                if "COL_LENGTH" in self.sql:
+                    return [None if conn.signature is None else 8]
+                return ["server", "db"] + list(conn.signature)
+
+            def close(self):
+                pass
+
+        return Cursor()
+
+
+def test_load_graph_table_rebuilds_when_the_signature_changes(vectors, tmp_path, monkeypatch):
+    builds = []
+
+    def load(conn, table, columns, vector, dimensions, element_type, metric, dtype, index_factory):
+        builds.append(table)
+        return LocalTable([(i,) for i in range(200)], index_factory(vectors[:200], metric, dtype))
+    monkeypatch.setattr(LocalTable, "load", staticmethod(load))
+
+    conn = SignatureConnection((200, 1000))
+    load_graph_table(conn, tmp_path, "t", ["id"], "v", 32, degree=8)
+    reused = load_graph_table(conn, tmp_path, "t", ["id"], "v", 32, degree=8)
+    assert len(builds) == 1 and len(reused.rows) == 200
+
+    conn.signature = (200, 1001)  # a row updated in place: same count, higher row version
+    load_graph_table(conn, tmp_path, "t", ["id"], "v", 32, degree=8)
+    load_graph_table(conn, tmp_path, "t", ["id"], "v", 32, degree=16)  # other index settings
+    assert len(builds) == 3
+
+    conn.signature = None  # no row_version column: rebuilt every time
+    load_graph_table(conn, tmp_path, "t", ["id"], "v", 32, degree=16)
+    load_graph_table(conn, tmp_path, "t", ["id"], "v", 32, degree=16)
+    assert len(builds) == 5
+
+
+def test_table_signature_without_version_column():
+    assert ann.table_signature(SignatureConnection(None), "t") is None
+    assert ann.table_signature(SignatureConnection((3, 7)), "t") == ["server", "db", 3, 7]
@@ -0,0 +1,78 @@
+import numpy as np
+
+from sqlvector.answer_cache import AnswerCache, answer_scope, result_ids
+from sqlvector.testing import FakeClock
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+ROWS = [("B001", "Great coffee", 0.91), ("B002", "Bitter beans", 0.87)]
+
+
+def test_result_ids_ignore_order_and_scores():
+    rescored = [("B002", "Bitter beans", 0.5), ("B001", "Great coffee", 0.4)]
+    assert result_ids(ROWS, (0, 1)) == result_ids(rescored, (0, 1))
+    assert result_ids(ROWS, (0, 1)) != result_ids(ROWS[:1], (0, 1))
+
+
+def test_similar_question_with_same_results_hits():
+    cache = AnswerCache(threshold=0.95)
+    ids = result_ids(ROWS, (0, 1))
+    cache.store(unit(1, 0, 0), ids, "Buy B001", question="best coffee?")
+    hit = cache.lookup(unit(1, 0.1, 0), ids)
+    assert hit.answer == "Buy B001" and hit.question == "best coffee?"
+    assert hit.similarity > 0.99
+    assert cache.lookup(unit(0, 1, 0), ids) is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_changed_results_or_scope_miss():
+    cache = AnswerCache()
+    ids = result_ids(ROWS, (0, 1))
+    cache.store(unit(1, 0), ids, "Buy B001", scope="a")
+    assert cache.lookup(unit(1, 0), result_ids(ROWS[:1], (0, 1)), scope="a") is None
+    assert cache.stats["changed_results"] == 1
+    assert cache.lookup(unit(1, 0), ids, scope="b") is None
+    assert cache.lookup(unit(1, 0), ids, scope="a").answer == "Buy B001"
+
+
+def test_expiry_and_eviction():
+    clock = FakeClock()
+    cache = AnswerCache(ttl=60, max_entries=2, clock=clock)
+    cache.store(unit(1, 0, 0), {"a"}, "first")
+    clock.advance(30)
+    cache.store(unit(0, 1, 0), {"b"}, "second")
+    assert cache.lookup(unit(1, 0, 0), {"a"}).age == 30
+    cache.store(unit(0, 0, 1), {"c"}, "third")
+    # "second" was the least recently used entry
+    assert cache.lookup(unit(0, 1, 0), {"b"}) is None
+    assert cache.stats["evicted"] == 1
+    clock.advance(31)
+    assert cache.lookup(unit(1, 0, 0), {"a"}) is None
+    assert cache.lookup(unit(0, 0, 1), {"c"}).answer == "third"
+    assert cache.stats["expired"] == 1 and len(cache) == 1
+
+
+def test_clear_scope_and_embedding_size_change():
+    cache = AnswerCache()
+    cache.store(unit(1, 0), {"a"}, "x", scope="gpt")
+    cache.store(unit(0, 1), {"b"}, "y", scope="other")
+    cache.clear("gpt")
+    assert len(cache) == 1
+    assert cache.lookup(unit(1, 0, 0), {"b"}, scope="other") is None
+    cache.store(unit(1, 0, 0), {"a"}, "z")
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_answer_scope():
+    scope = answer_scope("gpt-4.1", "Answer from the reviews.", 3000, 400)
+    assert scope.startswith("gpt-4.1:") and scope.endswith(":3000:400")
+    assert scope == answer_scope("gpt-4.1", "Answer from the reviews.", 3000, 400)
+    assert scope != answer_scope("gpt-4.1", "Answer from the resumes.", 3000, 400)
+    assert scope != answer_scope("gpt-4.1-mini", "Answer from the reviews.", 3000, 400)
+    assert scope != answer_scope("gpt-4.1", "Answer from the reviews.", 2000, 400)
@@ -0,0 +1,124 @@
+import struct
+import threading
+
+import pytest
+
+from sqlvector.auth import DATABASE_SCOPE, SQL_COPT_SS_ACCESS_TOKEN, AccessTokenProvider, pack_access_token
+from sqlvector.testing import FakeClock, FakeCredential
+
+
+class FailingCredential(FakeCredential):
+    """FakeCredential whose get_token raises while `failing` is set."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.failing = False
+        self.scopes = []
+
+    def get_token(self, *scopes, **kwargs):
+        self.scopes.append(scopes)
+        if self.failing:
+            raise ConnectionError("token endpoint unavailable")
+        return super().get_token(*scopes, **kwargs)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(start=1_000_000.0)
+
+
+@pytest.fixture
+def credential(clock):
+    return FailingCredential(lifetime=3600, clock=clock)
+
+
+def provider_for(credential, clock, **kwargs):
+    return AccessTokenProvider(credential, refresh_margin=300.0, clock=clock, **kwargs)
+
+
+def test_pack_access_token():
+    packed = pack_access_token("abc")
+    assert packed == struct.pack("<I", 6) + "abc".encode("utf-16-le")
+    assert packed == b"\x06\x00\x00\x00a\x00b\x00c\x00"
+    assert pack_access_token("") == b"\x00\x00\x00\x00"
+
+
+def test_token_reused_before_refresh_margin(credential, clock):
+    provider = provider_for(credential, clock, background_refresh=False)
+    first = provider.token_struct()
+    assert first == pack_access_token("fake-token-1")
+    assert credential.scopes == [(DATABASE_SCOPE,)]
+    clock.advance(3600 - 301)
+    assert provider.token_struct() is first
+    assert provider.attrs_before() == {SQL_COPT_SS_ACCESS_TOKEN: first}
+    assert credential.calls == 1
+    # Within the margin the next caller fetches a new token
+    clock.advance(2)
+    assert provider.token_struct() == pack_access_token("fake-token-2")
+    assert provider.refreshes == 2
+
+
+def test_background_refresh_inside_margin(credential, clock):
+    provider = provider_for(credential, clock)
+    try:
+        provider.token_struct()
+        timer = provider._timer
+        # Due when the token enters the refresh margin
+        assert timer.interval == 3600 - 300
+        clock.advance(3600 - 300)
+        timer.function()
+        assert credential.calls == 2
+        assert provider.token_struct() == pack_access_token("fake-token-2")
+        assert credential.calls == 2
+        assert provider._timer is not timer and timer.finished.is_set()
+    finally:
+        provider.close()
+    assert provider._timer.finished.is_set()
+
+
+def test_short_lived_token_refreshed_halfway(clock):
+    provider = provider_for(FakeCredential(lifetime=200, clock=clock), clock)
+    try:
+        provider.token_struct()
+        assert provider._timer.interval == 100
+    finally:
+        provider.close()
+
+
+def test_cached_token_served_when_refresh_fails(credential, clock):
+    provider = provider_for(credential, clock)
+    try:
+        first = provider.token_struct()
+        clock.advance(3600 - 100)
+        credential.failing = True
+        # The background refresh fails quietly...
+        provider._timer.function()
+        # ...and so does the synchronous retry, but the token is valid for another 100 seconds
+        assert provider.token_struct() is first
+        assert provider.attrs_before() == {SQL_COPT_SS_ACCESS_TOKEN: first}
+        clock.advance(100)
+        with pytest.raises(ConnectionError):
+            provider.token_struct()
+        credential.failing = False
+        assert provider.token_struct() == pack_access_token("fake-token-2")
+    finally:
+        provider.close()
+
+
+def test_first_fetch_failure_raises(credential, clock):
+    credential.failing = True
+    with pytest.raises(ConnectionError):
+        provider_for(credential, clock, background_refresh=False).token_struct()
+
+
+def test_concurrent_callers_share_one_fetch(clock):
+    credential = FakeCredential(lifetime=3600, delay=0.05, clock=clock)
+    provider = provider_for(credential, clock, background_refresh=False)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(provider.token_struct())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert credential.calls == 1
+    assert len(set(results)) == 1
@@ -0,0 +1,85 @@
+from sqlvector.bulk import BulkLoader
+from sqlvector.testing import SimulatedConnection
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.fast_executemany = False
+        self.closed = False
+
+    def executemany(self, sql, rows):
+        self.conn.calls += 1
+        if self.conn.calls in self.conn.failing_batches:
+            raise RuntimeError(f"batch {self.conn.calls} rejected")
+        self.conn.pending.extend(rows)
+
+    def execute(self, sql, row):
+        if row in self.conn.bad_rows:
+            raise RuntimeError(f"row {row} rejected")
+        self.conn.pending.append(row)
+
+    def close(self):
+        self.closed = True
+
+
+class Connection:
+    """Fails the executemany calls whose (1-based) number is in `failing_batches`."""
+
+    def __init__(self, failing_batches=(), bad_rows=()):
+        self.failing_batches = set(failing_batches)
+        self.bad_rows = set(bad_rows)
+        self.calls = 0
+        self.pending = []
+        self.committed = []
+        self.rollbacks = 0
+        self.cursors = []
+
+    def cursor(self):
+        self.cursors.append(Cursor(self))
+        return self.cursors[-1]
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+        self.rollbacks += 1
+
+
+ROWS = [(i, f"row {i}") for i in range(25)]
+
+
+def test_failed_batch_is_reported_and_others_committed():
+    conn = Connection(failing_batches={2})
+    result = BulkLoader(conn, "INSERT", batch_size=10).load(iter(ROWS))
+    assert result.batches == 3
+    assert result.rows_inserted == 15 and result.rows_failed == 10
+    assert result.errors == ["Rows 10-19: batch 2 rejected"]
+    assert conn.committed == ROWS[:10] + ROWS[20:]
+    assert conn.rollbacks == 1
+    assert conn.cursors[0].fast_executemany and conn.cursors[0].closed
+
+
+def test_isolate_failures_skips_only_bad_rows():
+    conn = Connection(failing_batches={1}, bad_rows={ROWS[3]})
+    result = BulkLoader(conn, "INSERT", batch_size=10, isolate_failures=True).load(ROWS)
+    assert result.rows_inserted == 24 and result.rows_failed == 1
+    assert result.errors == ["Row 3: row (3, 'row 3') rejected"]
+    assert conn.committed == ROWS[:3] + ROWS[4:]
+
+
+def test_progress_after_every_batch():
+    seen = []
+    result = BulkLoader(Connection(), "INSERT", batch_size=10,
+                        progress=lambda r: seen.append((r.batches, r.rows_inserted))).load(ROWS)
+    assert seen == [(1, 10), (2, 20), (3, 25)]
+    assert result.rows_per_second > 0
+
+
+def test_one_round_trip_per_batch():
+    conn = SimulatedConnection(latency=0, per_row=0, fail=lambda row: row[0] == 12)
+    result = BulkLoader(conn, "INSERT", batch_size=5).load(ROWS)
+    assert conn.round_trips == 5
+    assert result.rows_inserted == 20 and [row[0] for row in conn.rows] == list(range(10)) + list(range(15, 25))
@@ -0,0 +1,113 @@
+import pytest
+
+from sqlvector.changefeed import EmbeddingWorker, MemoryChangeQueue
+from sqlvector.testing import FakeClock
+
+
+def embed(texts):
+    return [[float(len(t))] for t in texts]
+
+
+@pytest.fixture
+def table():
+    return MemoryChangeQueue(clock=FakeClock())
+
+
+def test_worker_embeds_queued_rows_in_batches(table):
+    keys = table.insert([f"row {i}" for i in range(25)])
+    stats = EmbeddingWorker(table, embed, batch_size=10).run(until_empty=True)
+
+    assert (stats.claimed, stats.written, stats.stale, stats.failed, stats.batches) == (25, 25, 0, 0, 3)
+    assert all(table.rows[k]["embedding"] == [float(len(table.rows[k]["content"]))] for k in keys)
+    assert table.pending() == 0
+
+
+def test_only_changed_content_is_queued(table):
+    keys = table.insert(["a", "b", None])
+    EmbeddingWorker(table, embed).run(until_empty=True)
+
+    table.update({keys[0]: "a", keys[1]: "B", keys[2]: None})
+    assert list(table.queue) == [keys[1]]
+
+
+def test_empty_text_gets_a_null_vector_without_a_request(table):
+    key, = table.insert(["   "])
+    sent = []
+    EmbeddingWorker(table, lambda texts: sent.extend(texts) or embed(texts)).run(until_empty=True)
+    assert sent == []
+    assert table.rows[key]["embedding"] is None and table.rows[key]["status"] == "updated"
+
+
+def test_row_changed_while_embedding_is_embedded_again(table):
+    key, other = table.insert(["old text", "other"])
+    calls = []
+
+    def embed_while_changing(texts):
+        calls.append(list(texts))
+        if len(calls) == 1:
+            table.update({key: "new text"})
+        return embed(texts)
+
+    stats = EmbeddingWorker(table, embed_while_changing).run(until_empty=True)
+
+    # The vector of "old text" is discarded, not written over the new content
+    assert calls == [["old text", "other"], ["new text"]]
+    assert (stats.claimed, stats.written, stats.stale) == (3, 2, 1)
+    assert table.rows[key]["embedding"] == [float(len("new text"))]
+    assert table.pending() == 0
+
+
+def test_failed_batch_is_retried(table):
+    key, = table.insert(["text"])
+    failures = iter([RuntimeError("429"), RuntimeError("timeout")])
+
+    def flaky(texts):
+        error = next(failures, None)
+        if error:
+            raise error
+        return embed(texts)
+
+    stats = EmbeddingWorker(table, flaky, max_attempts=5).run(until_empty=True)
+    assert (stats.failed, stats.written) == (2, 1)
+    assert stats.errors == ["RuntimeError('429')", "RuntimeError('timeout')"]
+    assert table.rows[key]["status"] == "updated" and table.pending() == 0
+
+
+def test_rows_stay_queued_after_max_attempts(table):
+    key, = table.insert(["text"])
+
+    def broken(texts):
+        raise RuntimeError("bad deployment")
+
+    stats = EmbeddingWorker(table, broken, max_attempts=3).run(until_empty=True)
+    assert stats.failed == 3
+    assert table.pending() == 1 and table.pending(max_attempts=3) == 0
+    assert table.queue[key]["last_error"] == "RuntimeError('bad deployment')"
+    assert table.rows[key]["status"] == "error"
+
+    # A new change gives the row a fresh retry budget
+    table.update({key: "fixed text"})
+    assert table.pending(max_attempts=3) == 1
+
+
+def test_failed_batch_of_a_changed_row_keeps_the_new_version(table):
+    key, = table.insert(["old text"])
+
+    def change_then_fail(texts):
+        table.update({key: "new text"})
+        raise RuntimeError("timeout")
+
+    EmbeddingWorker(table, change_then_fail, max_attempts=5).run_once()
+    assert table.queue[key]["version"] == 2 and table.queue[key]["last_error"] is None
+    assert EmbeddingWorker(table, embed).run(until_empty=True).written == 1
+    assert table.rows[key]["embedding"] == [float(len("new text"))]
+
+
+def test_lease_of_a_dead_worker_expires(table):
+    key, = table.insert(["text"])
+    assert table.claim(10, max_attempts=5, lease=30) == [(key, 1, "text")]
+
+    # Leased: another worker finds nothing until the lease expires
+    assert EmbeddingWorker(table, embed, lease=30).run_once() == 0
+    table.clock.advance(31)
+    assert EmbeddingWorker(table, embed, lease=30).run(until_empty=True).written == 1
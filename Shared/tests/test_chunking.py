@@ -0,0 +1,83 @@
+import pytest
+
+from sqlvector.chunking import chunk_documents, chunk_text, get_encoding, split_segments
+from sqlvector.testing import WordEncoding
+
+WORDS = WordEncoding()
+
+TEXT = ("The index was rebuilt overnight. Queries are faster now! Did recall change? "
+        "It stayed the same.\n\nA second paragraph follows here. It has two sentences.")
+
+
+def tokens(text):
+    return len(WORDS.encode_ordinary(text))
+
+
+def test_split_segments():
+    sentences = [TEXT[s:e].strip() for s, e in split_segments(TEXT)]
+    assert sentences == ["The index was rebuilt overnight.", "Queries are faster now!", "Did recall change?",
+                         "It stayed the same.", "A second paragraph follows here.", "It has two sentences."]
+    paragraphs = split_segments(TEXT, "paragraph")
+    assert len(paragraphs) == 2 and TEXT[paragraphs[1][0]:paragraphs[1][1]].strip().startswith("A second")
+    assert split_segments(TEXT, None) == [(0, len(TEXT))]
+    assert split_segments("", None) == []
+    with pytest.raises(ValueError):
+        split_segments(TEXT, "page")
+
+
+def test_chunks_end_on_sentences_within_budget():
+    chunks = chunk_text(TEXT, max_tokens=9, encoding=WORDS)
+    assert [c.text for c in chunks] == [
+        "The index was rebuilt overnight. Queries are faster now!",
+        "Did recall change? It stayed the same.",
+        "A second paragraph follows here. It has two sentences.",
+    ]
+    for chunk in chunks:
+        assert TEXT[chunk.start:chunk.end] == chunk.text
+        assert chunk.tokens == tokens(chunk.text) <= 9
+
+
+def test_overlap_repeats_whole_sentences():
+    chunks = chunk_text(TEXT, max_tokens=9, overlap=4, encoding=WORDS)
+    assert [c.text for c in chunks] == [
+        "The index was rebuilt overnight. Queries are faster now!",
+        "Queries are faster now! Did recall change?",
+        "Did recall change? It stayed the same.",
+        "It stayed the same.\n\nA second paragraph follows here.",
+        # A 5-token sentence does not fit in the 4-token overlap
+        "It has two sentences.",
+    ]
+    with pytest.raises(ValueError):
+        chunk_text(TEXT, max_tokens=4, overlap=4, encoding=WORDS)
+
+
+def test_long_sentence_cut_on_token_boundaries():
+    text = "word " * 23 + "end."
+    chunks = chunk_text(text, max_tokens=10, encoding=WORDS)
+    assert [c.tokens for c in chunks] == [10, 10, 4]
+    assert "".join(text[c.start:c.end] + " " for c in chunks).split() == text.split()
+    assert all(c.text == text[c.start:c.end] and not c.text[0].isspace() for c in chunks)
+
+
+def test_paragraph_boundary():
+    chunks = chunk_text(TEXT, max_tokens=20, boundary="paragraph", encoding=WORDS)
+    assert [c.text for c in chunks] == TEXT.split("\n\n")
+
+
+def test_chunk_documents_keeps_order_across_processes():
+    documents = [f"Document {i} first sentence. Document {i} second sentence." for i in range(6)]
+    expected = [[c.text for c in chunks] for chunks in chunk_documents(documents, max_tokens=4, encoding=WORDS)]
+    assert expected[3] == ["Document 3 first sentence.", "Document 3 second sentence."]
+    pooled = chunk_documents(documents, max_tokens=4, encoding=WORDS, processes=2, batch_size=2)
+    assert [[c.text for c in chunks] for chunks in pooled] == expected
+    assert chunk_documents([], encoding=WORDS) == []
+
+
+def test_real_encoding_token_counts():
+    try:
+        encoding = get_encoding("cl100k_base")
+    except Exception:
+        pytest.skip("the cl100k_base encoding cannot be downloaded")
+    for chunk in chunk_text(TEXT * 5, max_tokens=40, overlap=10):
+        assert abs(chunk.tokens - len(encoding.encode_ordinary(chunk.text))) <= 2
+        assert chunk.tokens <= 40
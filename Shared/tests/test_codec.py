@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from sqlvector.codec import (HEADER_SIZE, decode_vector, decode_vectors, element_dtype, encode_vector,
+                             encode_vectors, vector_column, vector_parameter, vector_type)
+
+# CAST(CAST('[1, 2, 3]' AS VECTOR(3)) AS VARBINARY(20)) on SQL Server
+VECTOR_1_2_3 = bytes.fromhex("a901030000000000" "0000803f" "00000040" "00004040")
+# The same for VECTOR(2, float16) holding [1, -2]
+VECTOR_F16_1_M2 = bytes.fromhex("a901020001000000" "003c" "00c0")
+
+
+def test_known_payloads():
+    assert encode_vector([1.0, 2.0, 3.0]) == VECTOR_1_2_3
+    assert encode_vector([1.0, -2.0], np.float16) == VECTOR_F16_1_M2
+    decoded = decode_vector(VECTOR_1_2_3)
+    assert decoded.dtype == np.float32 and decoded.tolist() == [1.0, 2.0, 3.0]
+    decoded = decode_vector(VECTOR_F16_1_M2)
+    assert decoded.dtype == np.float16 and decoded.tolist() == [1.0, -2.0]
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float16])
+def test_round_trip(dtype):
+    matrix = np.random.default_rng(0).standard_normal((5, 1536)).astype(dtype)
+    payloads = encode_vectors(matrix, dtype)
+    assert payloads[2] == encode_vector(matrix[2], dtype)
+    assert len(payloads[0]) == HEADER_SIZE + 1536 * np.dtype(dtype).itemsize
+    np.testing.assert_array_equal(decode_vector(payloads[3]), matrix[3])
+    decoded = decode_vectors(payloads)
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, matrix.astype(np.float32))
+    assert decode_vectors([]).shape == (0, 0)
+
+
+def test_invalid_payloads():
+    with pytest.raises(ValueError):
+        decode_vector(b"\x00" + VECTOR_1_2_3[1:])
+    with pytest.raises(ValueError):
+        decode_vector(VECTOR_1_2_3[:4] + b"\x07" + VECTOR_1_2_3[5:])
+    with pytest.raises(ValueError):
+        decode_vectors([VECTOR_1_2_3, encode_vector([1.0, 2.0])])
+    with pytest.raises(ValueError):
+        # Same size, other element type
+        decode_vectors([VECTOR_1_2_3, encode_vector(np.ones(6), np.float16)])
+    with pytest.raises(ValueError):
+        encode_vector(np.ones((2, 2)))
+    with pytest.raises(ValueError):
+        encode_vectors(np.ones(3))
+    with pytest.raises(ValueError):
+        encode_vector([1.0], np.float64)
+
+
+def test_sql_expressions():
+    assert element_dtype("float16") == np.dtype("<f2")
+    with pytest.raises(ValueError):
+        element_dtype("int8")
+    assert vector_type(1536) == "VECTOR(1536)"
+    assert vector_type(1536, "float16") == "VECTOR(1536, float16)"
+    assert vector_parameter(3) == "CAST(? AS VECTOR(3))"
+    assert vector_column("embedding", 1536) == "CAST(embedding AS VARBINARY(6152))"
+    assert vector_column("embedding", 1536, "float16") == "CAST(embedding AS VARBINARY(3080))"
@@ -0,0 +1,94 @@
+import pytest
+
+from sqlvector.context import ContextBuilder, jaccard, shingles
+from sqlvector.testing import WordEncoding
+
+FIELDS = [("Title", "title"), ("Score", "score")]
+
+
+def words(prefix, count):
+    return " ".join(f"{prefix}{j}" for j in range(count))
+
+
+def make_rows(count, length=12):
+    return [{"title": f"Doc {i}", "score": 0.91234 - i / 10, "text": words(f"d{i}w", length)} for i in range(count)]
+
+
+def builder(**kwargs):
+    kwargs.setdefault("encoding", WordEncoding())
+    return ContextBuilder(FIELDS, "text", **kwargs)
+
+
+def test_block_format():
+    row = {"title": "  Kitchen\n knife ", "score": 0.123456, "text": "Sharp   steel\nblade"}
+    packed = builder().build([row])
+    assert packed.text == "[1] Title: Kitchen knife | Score: 0.123\nText: Sharp steel blade"
+    assert packed.used == [row] and packed.duplicates == packed.dropped == 0 and not packed.truncated
+    assert builder(precision=1).header(3, row) == "[3] Title: Kitchen knife | Score: 0.1"
+
+
+def test_everything_fits():
+    rows = make_rows(3)
+    packed = builder(max_tokens=1000).build(rows)
+    assert packed.used == rows
+    assert packed.text.count("\n\n") == 2
+    assert packed.tokens == builder().count_tokens(packed.text)
+
+
+def test_last_row_cut_at_token_boundary():
+    # Header and "Text: " take 9 tokens, so the first block is 21 tokens; the second gets
+    # 40 - 21 - 9 - 2 (blank line) = 8 text tokens and packing stops after it
+    packed = builder(max_tokens=40, min_item_tokens=5).build(make_rows(4))
+    assert [row["title"] for row in packed.used] == ["Doc 0", "Doc 1"]
+    assert packed.truncated and packed.dropped == 2
+    assert packed.text.endswith("[2] Title: Doc 1 | Score: 0.812\nText: " + words("d1w", 8))
+    assert packed.tokens <= 40
+
+
+def test_row_below_min_item_tokens_stops_packing():
+    packed = builder(max_tokens=40, min_item_tokens=9).build(make_rows(4))
+    assert len(packed.used) == 1 and packed.dropped == 3
+    assert not packed.truncated
+    assert packed.text.endswith(words("d0w", 12))
+
+
+@pytest.mark.parametrize("max_tokens", [15, 30, 50, 80, 200])
+def test_budget_is_respected(max_tokens):
+    packed = builder(max_tokens=max_tokens, min_item_tokens=1).build(make_rows(10))
+    assert packed.tokens <= max_tokens
+    assert len(packed.used) + packed.dropped == 10
+
+
+def test_max_item_tokens():
+    packed = builder(max_item_tokens=5).build(make_rows(2))
+    assert packed.text.split("\n\n")[1].endswith("Text: " + words("d1w", 5))
+    assert not packed.truncated
+
+
+def test_near_duplicates_are_skipped_and_ranks_renumbered():
+    rows = [{"title": "A", "score": 0.9, "text": "the quick brown fox jumps over the lazy dog today"},
+            {"title": "B", "score": 0.8, "text": "The quick brown fox jumps over the lazy dog, today!"},
+            {"title": "C", "score": 0.7, "text": "an entirely different passage about cooking pasta"}]
+    packed = builder().build(rows)
+    assert [row["title"] for row in packed.used] == ["A", "C"]
+    assert packed.duplicates == 1 and packed.dropped == 0
+    assert "[2] Title: C" in packed.text
+    assert len(builder(duplicate_threshold=None).build(rows).used) == 3
+
+
+def test_shingles_and_jaccard():
+    assert shingles("One two") == {("one", "two")}
+    assert shingles("a b c d") == {("a", "b", "c"), ("b", "c", "d")}
+    assert jaccard(shingles("a b c d"), shingles("a b c e")) == pytest.approx(1 / 3)
+    assert jaccard(set(), set()) == 1.0
+
+
+def test_estimated_tokens_without_encoding():
+    b = ContextBuilder(FIELDS, "text", encoding=None)
+    assert b.count_tokens("x" * 40) == 11
+    assert b.cut("x" * 40, 5) == "x" * 16
+    assert b.count_tokens(b.cut("x" * 40, 5)) == 5
+    assert b.cut("short", 5) == "short"
+    packed = ContextBuilder(FIELDS, "text", max_tokens=60, min_item_tokens=4, encoding=None).build(
+        [{"title": "A", "score": 1.0, "text": "y" * 400}])
+    assert packed.truncated and packed.tokens <= 60
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from sqlvector.codec import decode_vector
+from sqlvector.dimensions import PrefixIndex, VectorConfig, supports_dimensions, truncate, two_stage_search_sql
+from sqlvector.exact import ExactIndex, recall_at_k
+
+
+def test_truncate_renormalizes():
+    vectors = np.array([[3.0, 4.0, 12.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    np.testing.assert_allclose(truncate(vectors, 2), [[0.6, 0.8], [0.0, 0.0]])
+    with pytest.raises(ValueError):
+        truncate(vectors, 4)
+
+
+def test_config_sql_and_payloads():
+    config = VectorConfig(256, "float16", prefix_dimensions=64)
+    assert config.sql_type == "VECTOR(256, float16)"
+    assert config.parameter() == "CAST(? AS VECTOR(256, float16))"
+    assert config.column("v") == "CAST(v AS VARBINARY(520))"
+    assert config.column_definitions("v", "p", " NULL") == "v VECTOR(256, float16) NULL, p VECTOR(64, float16) NULL"
+    vector = np.random.default_rng(0).standard_normal(1536).astype(np.float32)
+    stored = decode_vector(config.encode(vector))
+    assert stored.dtype == np.float16 and stored.shape == (256,)
+    np.testing.assert_allclose(stored, truncate(vector, 256), atol=1e-3)
+    assert decode_vector(config.encode_prefix(vector)).shape == (64,)
+    # Vectors of the configured size are stored unchanged
+    np.testing.assert_array_equal(VectorConfig(3).truncate([1.0, 2.0, 3.0]), [1.0, 2.0, 3.0])
+
+
+def test_config_validation_and_env(monkeypatch):
+    with pytest.raises(ValueError):
+        VectorConfig(256, prefix_dimensions=256)
+    with pytest.raises(ValueError):
+        VectorConfig(256, "int8")
+    monkeypatch.setenv("VECTOR_DIMENSIONS", "512")
+    monkeypatch.setenv("VECTOR_PREFIX_DIMENSIONS", "0")
+    config = VectorConfig.from_env(1536, prefix_dimensions=128)
+    assert (config.dimensions, config.element_type, config.prefix_dimensions) == (512, "float32", None)
+
+
+def test_embedding_dimensions_per_model():
+    assert supports_dimensions("text-embedding-3-small") and supports_dimensions("Text-Embedding-3-Large-prod")
+    assert not supports_dimensions("text-embedding-ada-002") and not supports_dimensions(None)
+    config = VectorConfig(512)
+    assert config.embedding_dimensions("text-embedding-3-large") == 512
+    assert config.embedding_dimensions("text-embedding-ada-002") is None
+    assert config.truncates(1536) and not VectorConfig(1536).truncates(1536)
+    assert VectorConfig(1536, prefix_dimensions=256).truncates(1536)
+
+
+def test_two_stage_search_sql():
+    sql = two_stage_search_sql(VectorConfig(1536, prefix_dimensions=256), "dbo.docs", ["id", "title"], "v", "p")
+    assert "DECLARE @p VECTOR(256) = CAST(? AS VECTOR(256));" in sql
+    assert "ORDER BY VECTOR_DISTANCE('cosine', @p, p)" in sql
+    assert "VECTOR_DISTANCE('cosine', @v, c.v) AS distance" in sql
+
+
+def test_prefix_index_recall():
+    rng = np.random.default_rng(0)
+    # Matryoshka-like: most of the signal in the leading dimensions
+    vectors = (rng.standard_normal((2000, 128)) * np.linspace(3.0, 0.2, 128)).astype(np.float32)
+    queries = vectors[:50] + 0.05 * rng.standard_normal((50, 128)).astype(np.float32)
+    expected, _ = ExactIndex(vectors).search(queries, 10)
+    index = PrefixIndex(vectors, prefix_dimensions=48, oversample=8)
+    found, distances = index.search(queries, 10)
+    assert recall_at_k(found, expected) >= 0.95
+    # Reranking more candidates recovers what the prefix alone misses
+    assert recall_at_k(index.search(queries, 10, oversample=1)[0], expected) < 0.8
+    assert (np.diff(distances, axis=1) >= 0).all()
+    assert len(index) == 2000 and index.metric == "cosine"
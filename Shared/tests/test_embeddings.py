@@ -0,0 +1,52 @@
+import pytest
+
+from sqlvector import EmbeddingClient
+from sqlvector.embeddings import estimate_tokens, make_batches
+from sqlvector.testing import FakeEmbeddingServer, fake_embedding
+
+
+@pytest.fixture
+def server():
+    with FakeEmbeddingServer(dimensions=8) as server:
+        yield server
+
+
+def test_make_batches_respects_item_and_token_budgets():
+    texts = ["a" * 40] * 7  # 11 estimated tokens each
+    assert make_batches(texts, max_batch_items=3, max_batch_tokens=1000) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert make_batches(texts, max_batch_items=100, max_batch_tokens=25) == [[0, 1], [2, 3], [4, 5], [6]]
+
+
+def test_make_batches_sends_an_oversized_text_alone():
+    texts = ["short", "x" * 400, "short"]
+    assert estimate_tokens(texts[1]) > 50
+    assert make_batches(texts, max_batch_items=10, max_batch_tokens=50) == [[0], [1], [2]]
+
+
+def test_embed_packs_inputs_and_preserves_order(server):
+    texts = [f"Review number {i}: great coffee." for i in range(95)]
+    client = EmbeddingClient(server.url, "not-needed", max_batch_items=10, max_workers=4)
+
+    assert client.embed(texts) == [fake_embedding(t, 8) for t in texts]
+    assert len(server.requests) == 10
+    assert all(len(body["input"]) <= 10 for body in server.requests)
+    assert sorted(t for body in server.requests for t in body["input"]) == sorted(texts)
+
+
+def test_embed_reports_progress(server):
+    texts = [f"text {i}" for i in range(25)]
+    calls = []
+    EmbeddingClient(server.url, "not-needed", max_batch_items=10, max_workers=2).embed(
+        texts, progress=lambda done, total: calls.append((done, total)))
+    assert calls == [(10, 25), (20, 25), (25, 25)]
+
+
+def test_embed_one_and_dimensions(server):
+    client = EmbeddingClient(server.url, "not-needed", dimensions=4)
+    assert client.embed_one("hello") == fake_embedding("hello", 4)
+    assert server.requests == [{"input": ["hello"], "dimensions": 4}]
+
+
+def test_embed_of_nothing_sends_no_request(server):
+    assert EmbeddingClient(server.url, "not-needed").embed([]) == []
+    assert server.requests == []
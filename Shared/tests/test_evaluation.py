@@ -0,0 +1,76 @@
+import csv
+import json
+
+import numpy as np
+
+from sqlvector.evaluation import LocalBackend, measure, run_benchmark, write_results
+from sqlvector.exact import ExactIndex
+
+
+class ListBackend:
+    """Returns canned ids per query (looked up by the query's first element)."""
+
+    def __init__(self, name, answers, fail=()):
+        self.name = name
+        self.answers = answers
+        self.fail = set(fail)
+        self.calls = 0
+
+    def search(self, query, k):
+        self.calls += 1
+        i = int(query[0])
+        if i in self.fail:
+            raise RuntimeError(f"query {i} failed")
+        return self.answers[i][:k]
+
+
+def queries(n):
+    return np.array([[i, 0.0] for i in range(n)], dtype=np.float32)
+
+
+def test_measure_recall_and_skipped_queries():
+    backend = ListBackend("approx", [[1, 2], [3, 4], [5, 6]])
+    truth = [[1, 9], [], [5, 6]]
+    for concurrency in (1, 3):
+        row = measure(backend, queries(3), 2, concurrency, truth)
+        assert row["recall"] == 0.75
+        assert row["recall_skipped"] == 1
+        assert row["queries"] == 3 and row["concurrency"] == concurrency and row["errors"] == 0
+    assert measure(backend, queries(3), 2)["recall"] is None
+
+
+def test_measure_counts_errors_as_empty_results():
+    backend = ListBackend("flaky", [[1], [2]], fail={1})
+    row = measure(backend, queries(2), 1, truth=[[1], [2]])
+    assert row["errors"] == 1
+    assert row["recall"] == 0.5
+
+
+def test_run_benchmark_rows_and_warmup():
+    answers = [[i, i + 1, i + 2] for i in range(4)]
+    backend = ListBackend("approx", answers)
+    truth = ListBackend("exact", answers)
+    seen = []
+    results = run_benchmark([backend], queries(4), ks=(1, 3), concurrency=(1, 2), ground_truth=truth, warmup=2,
+                            progress=seen.append)
+    assert [(r["k"], r["concurrency"]) for r in results] == [(1, 1), (1, 2), (3, 1), (3, 2)]
+    assert all(r["recall"] == 1.0 for r in results)
+    assert seen == results
+    assert backend.calls == 2 + 4 * 4
+    assert truth.calls == 4
+
+
+def test_local_backend_maps_positions_to_ids():
+    vectors = np.eye(4, dtype=np.float32)
+    backend = LocalBackend("local", ExactIndex(vectors), ids=["a", "b", "c", "d"])
+    assert backend.search(vectors[2], 1) == ["c"]
+    assert LocalBackend("local", ExactIndex(vectors)).search(vectors[1], 1) == [1]
+
+
+def test_write_results(tmp_path):
+    results = [{"backend": "a", "k": 10, "recall": 0.5}, {"backend": "b", "k": 10, "recall": None}]
+    write_results(results, str(tmp_path / "results.json"))
+    assert json.loads((tmp_path / "results.json").read_text()) == results
+    write_results(results, str(tmp_path / "results.csv"))
+    with open(tmp_path / "results.csv", newline="") as f:
+        assert [row["backend"] for row in csv.DictReader(f)] == ["a", "b"]
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from sqlvector.codec import encode_vectors
+from sqlvector.exact import ExactIndex, LocalTable, load_table, recall_at_k, recall_stats
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((500, 24)).astype(np.float32)
+
+
+def naive(vectors, queries, metric, k):
+    if metric == "cosine":
+        a = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        q = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        distances = 1.0 - q @ a.T
+    elif metric == "dot":
+        distances = -(queries @ vectors.T)
+    else:
+        distances = np.linalg.norm(queries[:, None, :] - vectors[None, :, :], axis=2)
+    order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    return order, np.take_along_axis(distances, order, axis=1)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "euclidean"])
+def test_search_matches_naive_scan(vectors, metric):
+    queries = vectors[:7] + 0.1
+    positions, distances = ExactIndex(vectors, metric=metric, block_rows=64).search(queries, 10)
+    expected_positions, expected_distances = naive(vectors, queries, metric, 10)
+    np.testing.assert_array_equal(positions, expected_positions)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-4, atol=1e-4)
+
+
+def test_query_blocks_and_workers(vectors):
+    queries = vectors[:100]
+    expected = ExactIndex(vectors).search(queries, 5)
+    found = ExactIndex(vectors, workers=4, query_block=16).search(queries, 5)
+    np.testing.assert_array_equal(found[0], expected[0])
+    np.testing.assert_allclose(found[1], expected[1], rtol=1e-5, atol=1e-6)
+
+
+def test_float16_storage(vectors):
+    index = ExactIndex(vectors, dtype=np.float16)
+    assert index.vectors.dtype == np.float16
+    positions, _ = index.search(vectors[:20], 10)
+    expected, _ = ExactIndex(vectors).search(vectors[:20], 10)
+    assert recall_at_k(positions, expected) >= 0.9
+
+
+def test_add_and_distances(vectors):
+    index = ExactIndex(vectors[:300], metric="euclidean")
+    index.add(vectors[300:])
+    assert len(index) == 500 and index.dimensions == 24
+    distances = index.distances(vectors[0], [0, 450])
+    np.testing.assert_allclose(distances, [0.0, np.linalg.norm(vectors[0] - vectors[450])], rtol=1e-5, atol=1e-3)
+
+
+def test_k_larger_than_index_and_empty_index(vectors):
+    positions, distances = ExactIndex(vectors[:3]).search(vectors[0], 10)
+    assert positions.shape == (1, 3) and positions[0, 0] == 0
+    positions, distances = ExactIndex().search(vectors[0], 10)
+    assert positions.shape == (1, 0) and distances.shape == (1, 0)
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        ExactIndex(metric="manhattan")
+
+
+def test_recall_skips_queries_without_ground_truth():
+    found = [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    expected = [[1, 2, 9], [], [7, 8, 9]]
+    recall, skipped = recall_stats(found, expected)
+    assert recall == pytest.approx((2 / 3 + 1.0) / 2)
+    assert skipped == 1
+    assert recall_at_k(found, expected) == recall
+    assert recall_stats([[1]], [[]]) == (0.0, 1)
+    assert recall_at_k([[1, 2, 3]], [[3, 1, 2]], k=2) == 0.5
+
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.sql = None
+        self.closed = False
+
+    def execute(self, sql):
+        self.sql = sql
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class Connection:
+    def __init__(self, rows):
+        self.cursor_ = Cursor(rows)
+
+    def cursor(self):
+        return self.cursor_
+
+
+def test_load_table_decodes_batches(vectors):
+    payloads = encode_vectors(vectors[:25])
+    conn = Connection([(i, f"doc {i}", payload) for i, payload in enumerate(payloads)])
+    rows, matrix = load_table(conn, "dbo.docs", ["id", "title"], "embedding", 24, where="id < 25", batch_size=10)
+    assert conn.cursor_.sql == ("SELECT id, title, CAST(embedding AS VARBINARY(104)) FROM dbo.docs "
+                                "WHERE id < 25")
+    assert conn.cursor_.closed
+    assert rows == [(i, f"doc {i}") for i in range(25)]
+    np.testing.assert_array_equal(matrix, vectors[:25])
+
+
+def test_local_table_search(vectors):
+    table = LocalTable.load(Connection([(i, encode_vectors(vectors[i:i + 1])[0]) for i in range(50)]),
+                            "dbo.docs", ["id"], "embedding", 24)
+    assert table.search(vectors[7], 1)[0][0] == (7,)
+    assert load_table(Connection([]), "dbo.docs", ["id"], "embedding", 24)[1].shape == (0, 24)
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from sqlvector.exact import ExactIndex
+from sqlvector.hybrid import (HybridSearch, LocalBM25Leg, LocalVectorLeg, reciprocal_rank_fusion, score_fusion,
+                              tokenize)
+
+
+class Leg:
+    """In-memory leg with a canned ranking; records the k it was asked for."""
+
+    def __init__(self, name, ranking, error=None):
+        self.name = name
+        self.ranking = ranking
+        self.error = error
+        self.requested = []
+
+    def search(self, text, vector, k):
+        self.requested.append(k)
+        if self.error is not None:
+            raise self.error
+        return self.ranking[:k]
+
+
+FULLTEXT = [("a", 10.0), ("b", 5.0), ("c", 0.0)]
+VECTOR = [("c", -0.1), ("a", -0.4), ("d", -0.9)]
+
+
+def test_rrf_order():
+    fused = reciprocal_rank_fusion({"fulltext": FULLTEXT, "vector": VECTOR})
+    expected = {"a": 1 / 61 + 1 / 62, "b": 1 / 62, "c": 1 / 63 + 1 / 61, "d": 1 / 63}
+    assert [row for row, _ in fused] == ["a", "c", "b", "d"]
+    assert dict(fused) == pytest.approx(expected)
+
+
+def test_weighted_rrf_order():
+    fused = reciprocal_rank_fusion({"fulltext": FULLTEXT, "vector": VECTOR}, weights={"vector": 2.0}, k=60)
+    # c: 1/63 + 2/61 edges out a: 1/61 + 2/62, and d: 2/63 overtakes b: 1/62
+    assert [row for row, _ in fused] == ["c", "a", "d", "b"]
+
+
+def test_minmax_score_fusion_order():
+    fused = score_fusion({"fulltext": FULLTEXT, "vector": VECTOR})
+    # fulltext normalizes to a 1, b 0.5, c 0; vector to c 1, a 0.625, d 0
+    assert dict(fused) == pytest.approx({"a": 1.625, "b": 0.5, "c": 1.0, "d": 0.0})
+    assert [row for row, _ in fused] == ["a", "c", "b", "d"]
+    weighted = score_fusion({"fulltext": FULLTEXT, "vector": VECTOR}, weights={"fulltext": 0.3})
+    # a: 0.3 + 0.625 now trails c: 1.0
+    assert [row for row, _ in weighted] == ["c", "a", "b", "d"]
+
+
+def test_zscore_score_fusion_order():
+    fused = dict(score_fusion({"fulltext": FULLTEXT, "vector": VECTOR}, normalization="zscore"))
+    fulltext = (np.array([10.0, 5.0, 0.0]) - 5.0) / np.std([10.0, 5.0, 0.0])
+    vector = (np.array([-0.1, -0.4, -0.9]) - np.mean([-0.1, -0.4, -0.9])) / np.std([-0.1, -0.4, -0.9])
+    assert fused == pytest.approx({"a": fulltext[0] + vector[1], "b": fulltext[1], "c": fulltext[2] + vector[0],
+                                   "d": vector[2]})
+    with pytest.raises(ValueError):
+        score_fusion({"fulltext": FULLTEXT}, normalization="rank")
+
+
+def test_search_fuses_legs_and_reports_ranks():
+    search = HybridSearch([Leg("fulltext", FULLTEXT), Leg("vector", VECTOR)])
+    try:
+        result = search.search("coffee", [0.0], k=3)
+    finally:
+        search.close()
+    assert [(row, ranks) for row, _, ranks in result.results] == [
+        ("a", {"fulltext": 1, "vector": 2}), ("c", {"fulltext": 3, "vector": 1}), ("b", {"fulltext": 2})]
+    assert result.rankings == {"fulltext": FULLTEXT, "vector": VECTOR}
+    assert set(result.latencies) == {"fulltext", "vector"} and result.total >= 0
+    assert result.errors == {}
+
+
+def test_failing_leg_is_reported_and_the_other_used():
+    search = HybridSearch([Leg("fulltext", FULLTEXT, error=RuntimeError("full-text catalog offline")),
+                           Leg("vector", VECTOR)], fusion="score")
+    try:
+        result = search.search("coffee", [0.0], k=10)
+    finally:
+        search.close()
+    assert result.errors == {"fulltext": "RuntimeError('full-text catalog offline')"}
+    assert result.rankings["fulltext"] == []
+    assert [row for row, _, _ in result.results] == ["c", "a", "d"]
+
+
+def test_candidates_oversampling():
+    legs = [Leg("fulltext", [(i, float(100 - i)) for i in range(100)]), Leg("vector", [])]
+    search = HybridSearch(legs, candidates=50)
+    try:
+        assert len(search.search("q", [0.0], k=5).results) == 5
+        assert len(search.search("q", [0.0], k=80).results) == 80
+    finally:
+        search.close()
+    # Each leg is asked for max(k, candidates) rows; only the fused top k are returned
+    assert legs[0].requested == [50, 80] and legs[1].requested == [50, 80]
+
+
+def test_unknown_fusion():
+    with pytest.raises(ValueError):
+        HybridSearch([Leg("fulltext", FULLTEXT)], fusion="max")
+
+
+def test_local_legs():
+    texts = ["Dark roast coffee beans", "Green tea leaves", "Coffee grinder for beans", "Tea kettle"]
+    bm25 = LocalBM25Leg(range(4), texts, stopwords={"for"})
+    assert tokenize("Coffee, beans!") == ["coffee", "beans"]
+    assert [row for row, _ in bm25.search("coffee beans", None, 10)] in ([0, 2], [2, 0])
+    assert [row for row, _ in bm25.search("tea", None, 1)] in ([1], [3])
+    assert bm25.search("for", None, 10) == []
+
+    vectors = np.eye(4, dtype=np.float32)
+    leg = LocalVectorLeg(["w", "x", "y", "z"], ExactIndex(vectors))
+    found = leg.search(None, vectors[2], 2)
+    assert found[0][0] == "y" and found[0][1] == pytest.approx(0.0, abs=1e-6)
+    assert found[1][1] == pytest.approx(-1.0)
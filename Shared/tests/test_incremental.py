@@ -0,0 +1,83 @@
+import pytest
+
+from sqlvector.incremental import IncrementalIndexer, MemoryIndexStore, document_hash
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t))] for t in texts]
+
+
+def items(documents):
+    return [(f"{name}_{i}", name, text) for name, chunks in documents.items() for i, text in enumerate(chunks)]
+
+
+@pytest.fixture
+def indexer():
+    indexer = IncrementalIndexer(MemoryIndexStore(), CountingEmbedder())
+    indexer.sync(items({"a.pdf": ["one", "two", "three"], "b.pdf": ["four", "five"]}))
+    indexer.embed.texts.clear()
+    return indexer
+
+
+def test_first_run_inserts_everything():
+    indexer = IncrementalIndexer(MemoryIndexStore(), CountingEmbedder())
+    plan = indexer.plan(items({"a.pdf": ["one", "two"]}))
+    assert (plan.new, plan.changed, len(plan.deletes), plan.unchanged) == (2, 0, 0, 0)
+
+
+def test_plan_counts_new_changed_deleted_and_unchanged(indexer):
+    plan = indexer.plan(items({"a.pdf": ["one", "TWO", "three", "three and a half"], "c.pdf": ["six"]}))
+
+    assert (plan.new, plan.changed, len(plan.deletes), plan.unchanged) == (2, 1, 2, 2)
+    assert sorted(key for key, _, _, _ in plan.upserts) == ["a.pdf_1", "a.pdf_3", "c.pdf_0"]
+    assert sorted(plan.deletes) == ["b.pdf_0", "b.pdf_1"]
+
+
+def test_sync_embeds_only_new_and_changed_chunks(indexer):
+    result = indexer.sync(items({"a.pdf": ["one", "TWO", "three"], "b.pdf": ["four"]}))
+
+    assert indexer.embed.texts == ["TWO"]
+    assert (result.inserted, result.updated, result.deleted, result.unchanged, result.embedded) == (0, 1, 1, 3, 1)
+    assert {key: row[1] for key, row in indexer.store.rows.items()} == {
+        "a.pdf_0": "one", "a.pdf_1": "TWO", "a.pdf_2": "three", "b.pdf_0": "four"}
+
+
+def test_same_corpus_plans_nothing(indexer):
+    plan = indexer.plan(items({"a.pdf": ["one", "two", "three"], "b.pdf": ["four", "five"]}))
+    assert (plan.new, plan.changed, len(plan.deletes), plan.unchanged) == (0, 0, 0, 5)
+
+
+def test_moving_a_chunk_to_another_document_is_a_change(indexer):
+    plan = indexer.plan([("a.pdf_0", "b.pdf", "one")], documents=["a.pdf", "b.pdf"])
+    assert (plan.new, plan.changed) == (0, 1)
+
+
+def test_documents_limit_deletes_to_those_documents(indexer):
+    # Only a.pdf is re-indexed: the chunks of b.pdf are not deleted
+    plan = indexer.plan(items({"a.pdf": ["one"]}), documents=["a.pdf"])
+    assert (plan.new, plan.changed, len(plan.deletes), plan.unchanged) == (0, 0, 2, 1)
+    assert sorted(plan.deletes) == ["a.pdf_1", "a.pdf_2"]
+
+
+def test_changed_documents_and_document_hashes(indexer):
+    hashes = {"a.pdf": document_hash(b"a v1"), "b.pdf": document_hash(b"b v1")}
+    indexer.sync([], documents=[], document_hashes=hashes)
+
+    changed = indexer.changed_documents({"a.pdf": document_hash(b"a v1"), "b.pdf": document_hash(b"b v2"),
+                                         "c.pdf": document_hash(b"c v1")})
+    assert sorted(changed) == ["b.pdf", "c.pdf"]
+
+    # A None hash removes the document, with its chunks
+    result = indexer.sync([], documents=["b.pdf"], document_hashes={"b.pdf": None})
+    assert result.deleted == 2
+    assert indexer.store.documents == {"a.pdf": hashes["a.pdf"]}
+
+
+def test_duplicate_keys_are_rejected(indexer):
+    with pytest.raises(ValueError):
+        indexer.plan([("k", "a.pdf", "one"), ("k", "a.pdf", "two")])
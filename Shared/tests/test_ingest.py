@@ -0,0 +1,65 @@
+import io
+
+import numpy as np
+import pytest
+
+from sqlvector.ingest import parse_vectors, read_csv_chunks, stream_csv_to_table
+from sqlvector.testing import SimulatedConnection
+
+
+def csv_file(vectors):
+    lines = ["id,text,vector"]
+    lines += [f'{i},"row {i}","[{", ".join(str(v) for v in vector)}]"' for i, vector in enumerate(vectors)]
+    return io.StringIO("\n".join(lines) + "\n")
+
+
+def test_parse_vectors():
+    matrix = parse_vectors(["[0.5, -1.25, 3]", " [2.5e-1,2,-0.0] "])
+    assert matrix.dtype == np.float32
+    np.testing.assert_array_equal(matrix, [[0.5, -1.25, 3.0], [0.25, 2.0, 0.0]])
+    assert parse_vectors([], dimensions=4).shape == (0, 4)
+
+
+def test_parse_vectors_reports_the_row():
+    with pytest.raises(ValueError, match="Row 2: expected 3 dimensions, found 2"):
+        parse_vectors(["[1, 2, 3]", "[1, 2]"])
+    with pytest.raises(ValueError, match="Row 11: expected 2 dimensions, found 3"):
+        parse_vectors(["[1, 2, 3]"], dimensions=2, first_row=11)
+    with pytest.raises(ValueError, match="Row 1: cannot parse"):
+        parse_vectors(["[1, oops]"])
+    with pytest.raises(ValueError, match="Row 1: vectors have 3 dimensions, at least 4"):
+        parse_vectors(["[1, 2, 3]"], min_dimensions=4)
+    assert parse_vectors(["[1, 2, 3]"], min_dimensions=2).shape == (1, 3)
+
+
+def test_read_csv_chunks_counts_rows_across_chunks():
+    vectors = np.arange(12, dtype=np.float32).reshape(6, 2)
+    chunks = list(read_csv_chunks(csv_file(vectors), chunksize=4))
+    assert [len(frame) for frame, _ in chunks] == [4, 2]
+    assert list(chunks[0][0].columns) == ["id", "text"]
+    np.testing.assert_array_equal(np.concatenate([v for _, v in chunks]), vectors)
+
+    source = csv_file(vectors)
+    text = source.getvalue().replace("[10.0, 11.0]", "[10.0]")
+    with pytest.raises(ValueError, match="Row 6"):
+        list(read_csv_chunks(io.StringIO(text), chunksize=4))
+
+
+def test_stream_csv_to_table():
+    vectors = np.random.default_rng(0).standard_normal((25, 4)).astype(np.float32)
+    conn = SimulatedConnection(latency=0, per_row=0)
+    result = stream_csv_to_table(csv_file(vectors), conn, "INSERT", lambda frame, v: zip(frame["id"], v.tolist()),
+                                 chunksize=7, max_pending_chunks=1, batch_size=10)
+    assert result.rows_inserted == 25 and result.batches == 3 and not result.errors
+    assert [row[0] for row in conn.rows] == list(range(25))
+    np.testing.assert_allclose([row[1] for row in conn.rows], vectors)
+
+
+def test_stream_csv_to_table_raises_parse_errors():
+    text = csv_file(np.ones((20, 3))).getvalue().replace("[1.0, 1.0, 1.0]\"\n15", "[1.0]\"\n15")
+    conn = SimulatedConnection(latency=0, per_row=0)
+    with pytest.raises(ValueError, match="Row 15"):
+        stream_csv_to_table(io.StringIO(text), conn, "INSERT", lambda frame, v: zip(frame["id"]), chunksize=5,
+                            batch_size=5)
+    # The chunks before the bad one were committed
+    assert len(conn.rows) == 10
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from sqlvector.normalize import ENGLISH_STOPWORDS, TextNormalizer
+
+TEXTS = [
+    "Don't buy it, it's NOT what you're looking for!!",
+    "  Café   crème — très bon :)  ",
+    "The coffee isn't bad\tat all",
+    "",
+]
+
+
+@pytest.fixture
+def normalizer():
+    return TextNormalizer(stopwords=ENGLISH_STOPWORDS)
+
+
+def test_contractions_are_removed_as_stopwords(normalizer):
+    assert normalizer.normalize(TEXTS[0]) == "buy looking"
+    assert normalizer.normalize(TEXTS[2]) == "coffee bad"
+
+
+def test_defaults_lowercase_and_strip_non_ascii_and_punctuation():
+    assert TextNormalizer().normalize(TEXTS[1]) == "caf crme trs bon"
+
+
+def test_alphanumeric_only_keeps_case_when_asked():
+    normalizer = TextNormalizer(lowercase=False, ascii_only=False, strip_punctuation=False, alphanumeric_only=True)
+    assert normalizer.normalize("Hello, World! (2024)") == "Hello World 2024"
+
+
+def test_series_and_scalar_paths_agree(normalizer):
+    series = normalizer.normalize_series(pd.Series(TEXTS + [None], dtype=object))
+    assert list(series[:-1]) == [normalizer.normalize(text) for text in TEXTS]
+    assert pd.isna(series.iloc[-1])
+    assert normalizer.normalize(None) is None
+
+
+def test_normalize_column_on_a_process_pool(normalizer):
+    df = pd.DataFrame({"text": TEXTS * 50})
+    normalizer.normalize_column(df, "text", target="clean", processes=2, chunk_size=40)
+    assert list(df["clean"]) == [normalizer.normalize(text) for text in TEXTS] * 50
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+from sqlvector.pipeline import Pipeline, PipelineError, Stage
+
+
+def run_with_timeout(pipeline, items, timeout=10.0):
+    """Run in a thread so a deadlock fails the test instead of hanging it."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["results"] = pipeline.run(items)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not finish"
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["results"]
+
+
+def test_stages_transform_drop_and_fan_out():
+    pipeline = Pipeline([
+        Stage("double", lambda x: [x * 2]),
+        Stage("even-only", lambda x: [x] if x % 4 == 0 else []),
+        Stage("split", lambda x: [x, -x]),
+    ], queue_size=4)
+    results = run_with_timeout(pipeline, range(10))
+    assert sorted(results) == sorted([y for x in range(0, 20, 4) for y in (x, -x)])
+    assert pipeline.stats == {"double": {"in": 10, "out": 10}, "even-only": {"in": 10, "out": 5},
+                              "split": {"in": 5, "out": 10}}
+
+
+def test_queues_are_bounded():
+    release = threading.Event()
+    pulled = []
+
+    def items():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    def blocked(x):
+        release.wait(10)
+        return [x]
+
+    pipeline = Pipeline([Stage("blocked", blocked)], queue_size=2, poll_interval=0.01)
+    thread = threading.Thread(target=lambda: pipeline.run(items()), daemon=True)
+    thread.start()
+    time.sleep(0.3)
+    # One item in the worker, two in the queue and one the feeder is waiting to put
+    assert len(pulled) <= 4
+    release.set()
+    thread.join(10)
+    assert len(pulled) == 100
+
+
+def test_batches_wait_at_most_batch_wait():
+    batches = []
+
+    def slow_items():
+        for i in range(7):
+            yield i
+        time.sleep(0.3)
+        yield 7
+
+    pipeline = Pipeline([Stage("batch", lambda batch: batches.append(list(batch)) or batch, batch_size=5,
+                               batch_wait=0.1)], poll_interval=0.01)
+    results = run_with_timeout(pipeline, slow_items())
+    assert sorted(results) == list(range(8))
+    # The first batch fills up; the second is flushed after batch_wait instead of waiting for item 7
+    assert batches == [[0, 1, 2, 3, 4], [5, 6], [7]]
+    assert pipeline.stats["batch"] == {"in": 8, "out": 8}
+
+
+def test_multiple_workers_run_concurrently():
+    active = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def work(x):
+        with lock:
+            active.append(x)
+            peak[0] = max(peak[0], len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(x)
+        return [x]
+
+    pipeline = Pipeline([Stage("work", work, workers=4), Stage("tail", lambda x: [x], workers=2)])
+    start = time.perf_counter()
+    results = run_with_timeout(pipeline, range(16))
+    assert sorted(results) == list(range(16))
+    assert peak[0] == 4
+    assert time.perf_counter() - start < 16 * 0.05
+
+
+def test_stage_error_is_raised_and_stops_every_thread():
+    def fail_on_13(x):
+        if x == 13:
+            raise ValueError("bad item 13")
+        return [x]
+
+    before = threading.active_count()
+    pipeline = Pipeline([Stage("first", lambda x: [x], workers=2), Stage("check", fail_on_13, workers=3),
+                         Stage("last", lambda x: [x])], queue_size=2, poll_interval=0.01)
+    with pytest.raises(PipelineError, match="bad item 13") as error:
+        run_with_timeout(pipeline, range(1000))
+    assert isinstance(error.value.__cause__, ValueError)
+    assert threading.active_count() == before
+
+
+def test_feeder_error_is_raised():
+    def items():
+        yield 1
+        raise OSError("cannot read file")
+
+    with pytest.raises(PipelineError, match="cannot read file"):
+        run_with_timeout(Pipeline([Stage("copy", lambda x: [x])]), items())
+
+
+def test_progress_and_reuse():
+    reports = []
+    pipeline = Pipeline([Stage("copy", lambda x: [x])], progress=reports.append)
+    assert sorted(run_with_timeout(pipeline, range(5))) == list(range(5))
+    assert reports[-1] == {"copy": {"in": 5, "out": 5}}
+    # run() can be called again; counters start over
+    assert run_with_timeout(pipeline, []) == []
+    assert pipeline.stats == {"copy": {"in": 0, "out": 0}}
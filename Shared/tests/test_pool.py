@@ -0,0 +1,187 @@
+import threading
+
+import pytest
+
+from sqlvector.pool import ConnectionPool, PoolClosedError, PooledConnection, PoolTimeoutError
+from sqlvector.testing import FakeClock
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise ConnectionError("connection is broken")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class Connection:
+    def __init__(self, number):
+        self.number = number
+        self.broken = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return Cursor(self)
+
+    def rollback(self):
+        if self.broken:
+            raise ConnectionError("connection is broken")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def pool(clock, opened):
+    def connect():
+        opened.append(Connection(len(opened)))
+        return opened[-1]
+    return ConnectionPool(connect, max_size=2, idle_timeout=300.0, check_after=30.0, timeout=0.05, clock=clock)
+
+
+def test_reuse_and_rollback(pool, opened):
+    with pool.connection() as conn:
+        assert conn.number == 0
+    with pool.connection() as conn:
+        assert conn.number == 0
+    assert len(opened) == 1
+    assert opened[0].rollbacks == 2
+    assert pool.snapshot() == {"created": 1, "reused": 1, "discarded": 0, "open": 1, "idle": 1}
+
+
+def test_closed_wrapper_rejects_use(pool):
+    conn = pool.acquire()
+    conn.close()
+    conn.close()
+    with pytest.raises(AttributeError):
+        conn.cursor()
+
+
+def test_timeout_when_exhausted(pool):
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    second.close()
+    assert pool.acquire() is not None
+    first.close()
+
+
+def test_waiter_gets_released_connection(pool, opened):
+    held = [pool.acquire(), pool.acquire()]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=5.0)))
+    waiter.start()
+    held[0].close()
+    waiter.join(5.0)
+    assert got and got[0].number == 0
+    assert len(opened) == 2
+
+
+def test_idle_eviction(pool, clock, opened):
+    pool.acquire().close()
+    clock.advance(301.0)
+    with pool.connection() as conn:
+        assert conn.number == 1
+    assert opened[0].closed
+
+
+def test_health_check_replaces_broken_connection(pool, clock, opened):
+    pool.acquire().close()
+    opened[0].broken = True
+    clock.advance(10.0)
+    with pool.connection() as conn:
+        # Checked only after check_after seconds idle
+        assert conn.number == 0
+    opened[0].broken = True
+    clock.advance(31.0)
+    with pool.connection() as conn:
+        assert conn.number == 1
+    assert opened[0].closed
+
+
+def test_failed_rollback_discards(pool, opened):
+    conn = pool.acquire()
+    opened[0].broken = True
+    conn.close()
+    assert opened[0].closed
+    assert pool.snapshot()["open"] == 0
+
+
+def test_discard(pool, opened):
+    conn = pool.acquire()
+    conn.discard()
+    assert opened[0].closed
+    assert pool.snapshot()["discarded"] == 1
+
+
+def test_connect_failure_frees_slot(clock):
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        raise ConnectionError("server unavailable")
+
+    pool = ConnectionPool(connect, max_size=1, clock=clock)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            pool.acquire(timeout=0.05)
+    assert len(attempts) == 3
+    assert pool.snapshot()["open"] == 0
+
+
+def test_acquire_after_close_raises(pool, opened):
+    checked_out = pool.acquire()
+    pool.acquire().close()
+    pool.close()
+    assert opened[1].closed
+    with pytest.raises(PoolClosedError):
+        pool.acquire()
+    checked_out.close()
+    assert opened[0].closed
+    assert len(opened) == 2
+
+
+def test_close_wakes_waiters(pool):
+    held = [pool.acquire(), pool.acquire()]
+    errors = []
+
+    def wait():
+        try:
+            pool.acquire(timeout=5.0)
+        except PoolClosedError as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    pool.close()
+    waiter.join(5.0)
+    assert len(errors) == 1
+    for conn in held:
+        conn.close()
+
+
+def test_wrapper_without_connection_does_not_recurse():
+    # __init__ failing before _conn is set must not make __getattr__/__del__ recurse
+    conn = PooledConnection.__new__(PooledConnection)
+    with pytest.raises(AttributeError):
+        conn.cursor
+    conn.__del__()
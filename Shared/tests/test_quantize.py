@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from sqlvector import quantize
+from sqlvector.exact import ExactIndex
+from sqlvector.quantize import QuantizedIndex
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((2000, 96)).astype(np.float32)
+
+
+def test_hamming_without_bitwise_count(monkeypatch):
+    codes = np.random.default_rng(1).integers(0, 2 ** 63, (50, 3), dtype=np.uint64)
+    expected = [sum(bin(int(a ^ b)).count("1") for a, b in zip(row, codes[0])) for row in codes]
+    assert quantize._hamming(codes, codes[0]).tolist() == expected
+    # NumPy 1.x
+    monkeypatch.delattr(np, "bitwise_count", raising=False)
+    assert quantize._hamming(codes, codes[0]).tolist() == expected
+
+
+def test_binary_search_without_bitwise_count(vectors, monkeypatch):
+    index = QuantizedIndex(vectors, mode="binary")
+    expected = index.search(vectors[:20], 10)
+    monkeypatch.delattr(np, "bitwise_count", raising=False)
+    for found, wanted in zip(index.search(vectors[:20], 10), expected):
+        np.testing.assert_array_equal(found, wanted)
+
+
+def test_int8_rescored_search_finds_the_exact_neighbors(vectors):
+    queries = vectors[:20] + 0.1
+    exact, _ = ExactIndex(vectors).search(queries, 10)
+    found, _ = QuantizedIndex(vectors, mode="int8").search(queries, 10)
+    assert np.mean([len(set(a) & set(b)) / 10 for a, b in zip(found, exact)]) >= 0.9
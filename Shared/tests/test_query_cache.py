@@ -0,0 +1,59 @@
+from sqlvector.query_cache import LRUCache, SearchCache
+
+
+def counting(value):
+    calls = []
+
+    def compute(*args):
+        calls.append(args)
+        return value
+    return compute, calls
+
+
+def test_embedding_cached_per_model_and_dimensions():
+    cache = SearchCache()
+    compute, calls = counting([0.1, 0.2])
+    assert cache.embedding("red shoes", compute, model="text-embedding-3-small") == [0.1, 0.2]
+    assert cache.embedding("red shoes", compute, model="text-embedding-3-small") == [0.1, 0.2]
+    assert len(calls) == 1
+    cache.embedding("red shoes", compute, model="text-embedding-3-small", dimensions=256)
+    cache.embedding("red shoes", compute, model="text-embedding-ada-002")
+    assert len(calls) == 3
+    assert cache.stats["embedding_hits"] == 1 and cache.stats["embedding_misses"] == 3
+
+
+def test_results_serve_smaller_k():
+    cache = SearchCache()
+    run, calls = counting([("a",), ("b",), ("c",)])
+    assert cache.search([1.0, 0.0], 3, run, "docs") == [("a",), ("b",), ("c",)]
+    assert cache.search([1.0, 0.0], 2, run, "docs") == [("a",), ("b",)]
+    assert calls == [(3,)]
+    cache.search([1.0, 0.0], 5, run, "docs")
+    assert calls == [(3,), (5,)]
+
+
+def test_results_per_backend_and_invalidation():
+    cache = SearchCache()
+    run, calls = counting([("a",)])
+    cache.search([1.0], 1, run, "docs", backend="sql")
+    cache.search([1.0], 1, run, "docs", backend="local")
+    cache.search([1.0], 1, run, "other")
+    assert len(calls) == 3
+    cache.invalidate("docs")
+    assert cache.version("docs") == 1 and cache.version("other") == 0
+    assert len(cache.results) == 1
+    cache.search([1.0], 1, run, "docs", backend="sql")
+    cache.search([1.0], 1, run, "other")
+    assert len(calls) == 4
+
+
+def test_lru_eviction():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    cache.discard_if(lambda key: key == "a")
+    assert len(cache) == 1
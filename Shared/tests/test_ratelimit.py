@@ -0,0 +1,160 @@
+import pytest
+
+from sqlvector import AdaptiveScheduler, EmbeddingClient
+from sqlvector.ratelimit import ThrottledError, TokenBucket, retry_after_from_headers
+from sqlvector.testing import FakeClock, ThrottlingEmbeddingServer, fake_embedding
+
+
+def throttled(times, retry_after=None):
+    """
+    A call that raises ThrottledError `times` times, then returns "ok"; `calls` counts the attempts.
+    """
+    def call():
+        call.calls += 1
+        if call.calls <= times:
+            raise ThrottledError(retry_after)
+        return "ok"
+    call.calls = 0
+    return call
+
+
+def scheduler(clock, **kwargs):
+    return AdaptiveScheduler(clock=clock, sleep=clock.sleep, seed=0, **kwargs)
+
+
+def test_retry_after_from_headers():
+    assert retry_after_from_headers({"retry-after-ms": "1500", "Retry-After": "2"}) == 1.5
+    assert retry_after_from_headers({"Retry-After": "2"}) == 2.0
+    assert retry_after_from_headers({"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"}) is None
+    assert retry_after_from_headers(None) is None
+
+
+def test_token_bucket_refills_with_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.advance(0.5)
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert bucket.wait_time(1) == 0.0
+
+
+def test_throttled_call_waits_retry_after_and_halves_concurrency():
+    clock = FakeClock()
+    s = scheduler(clock, initial_concurrency=8)
+    call = throttled(1, retry_after=2.0)
+
+    assert s.run(call) == "ok"
+    assert call.calls == 2
+    assert clock.sleeps == [2.0]
+    assert s.snapshot() == {"calls": 1, "throttled": 1, "retries": 1, "waited": 2.0, "concurrency": 4, "active": 0}
+
+
+def test_exponential_backoff_without_retry_after():
+    clock = FakeClock()
+    s = scheduler(clock, initial_concurrency=8, base_backoff=1.0, max_backoff=3.0)
+
+    assert s.run(throttled(4)) == "ok"
+    # Jittered between half and all of min(max_backoff, base_backoff * 2 ** attempt)
+    for delay, limit in zip(clock.sleeps, [1.0, 2.0, 3.0, 3.0]):
+        assert limit / 2 <= delay <= limit
+    assert len(clock.sleeps) == 4
+    # Halved down to 1 by the four 429s, then one more slot after the success
+    assert s.concurrency == 2
+
+
+def test_concurrency_recovers_after_successes():
+    clock = FakeClock()
+    s = scheduler(clock, initial_concurrency=4, max_concurrency=5)
+    s.run(throttled(2, retry_after=0.0))
+    assert s.concurrency == 2
+
+    # One more slot after as many successes in a row as the current limit, up to max_concurrency
+    grown = []
+    for _ in range(2 + 3 + 4 + 5):
+        s.run(lambda: None)
+        grown.append(s.concurrency)
+    assert grown == [2, 3, 3, 3, 4, 4, 4, 4, 5, 5, 5, 5, 5, 5]
+    assert clock.now == 0.0
+
+
+def test_retry_after_pauses_the_next_caller():
+    clock = FakeClock()
+    s = scheduler(clock, max_retries=0)
+    with pytest.raises(ThrottledError):
+        s.run(throttled(1, retry_after=5.0))
+    assert clock.sleeps == []
+
+    started = []
+    s.run(lambda: started.append(clock()))
+    assert started == [5.0]
+
+
+def test_gives_up_after_max_retries():
+    clock = FakeClock()
+    s = scheduler(clock, max_retries=2)
+    call = throttled(10, retry_after=1.0)
+    with pytest.raises(ThrottledError):
+        s.run(call)
+    assert call.calls == 3
+    assert s.snapshot()["active"] == 0
+
+
+def test_other_errors_are_not_retried():
+    clock = FakeClock()
+    s = scheduler(clock, initial_concurrency=4)
+
+    def fail():
+        raise ValueError("bad request")
+    with pytest.raises(ValueError):
+        s.run(fail)
+    assert s.snapshot() == {"calls": 0, "throttled": 0, "retries": 0, "waited": 0.0, "concurrency": 4, "active": 0}
+
+
+def test_requests_per_minute_budget():
+    clock = FakeClock()
+    s = scheduler(clock, requests_per_minute=60)
+    for _ in range(60):
+        s.run(lambda: None)
+    assert clock.now == 0.0
+    # The burst used the minute's budget: one more request per second
+    for _ in range(3):
+        s.run(lambda: None)
+    assert clock.now == pytest.approx(3.0)
+
+
+def test_tokens_per_minute_budget():
+    clock = FakeClock()
+    s = scheduler(clock, tokens_per_minute=600)
+    s.run(lambda: None, tokens=600)
+    s.run(lambda: None, tokens=100)
+    assert clock.now == pytest.approx(10.0)
+
+
+def test_embedding_client_against_throttling_server():
+    # Requests are sent one at a time and time is virtual, so every run is the same
+    clock = FakeClock()
+    texts = [f"Review number {i}: great coffee, would buy again." for i in range(400)]
+    with ThrottlingEmbeddingServer(max_requests=10, window=0.5, dimensions=16, clock=clock) as server:
+        s = scheduler(clock, initial_concurrency=1, max_concurrency=1)
+        client = EmbeddingClient(server.url, "not-needed", max_batch_items=8, max_workers=1, scheduler=s)
+        assert client.embed(texts) == [fake_embedding(t, 16) for t in texts]
+
+    # 50 requests at 10 per 0.5 s window: one 429 at the end of each of the first four windows,
+    # each followed by a wait until the next window, so the quota is used in full
+    assert server.throttled == 4
+    assert s.stats["calls"] == 50
+    assert clock.sleeps == pytest.approx([0.5] * 4)
+    assert len(texts) / clock.now == pytest.approx(200.0)
+
+
+def test_budget_waits_end_despite_rounding():
+    # 18 requests per second: refills land a rounding error short of a whole request
+    clock = FakeClock(start=0.55)
+    s = scheduler(clock, requests_per_minute=1080, max_retries=0)
+    with pytest.raises(ThrottledError):
+        s.run(throttled(1))
+    for _ in range(30):
+        s.run(lambda: None)
+    assert clock.now == pytest.approx(0.55 + 30 / 18)
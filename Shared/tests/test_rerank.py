@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from sqlvector.rerank import CohereReranker, Reranker
+from sqlvector.testing import FakeRerankServer, WordEncoding
+
+ITEMS = [("doc-0", "tea kettle"), ("doc-1", "coffee grinder for beans"), ("doc-2", "dark roast coffee beans"),
+         ("doc-3", "green tea"), ("doc-4", "coffee mug")]
+
+
+class WordOverlapScorer:
+    """Scores the share of query words in each document; records the batches it receives."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def score(self, query, documents):
+        with self._lock:
+            self.batches.append(list(documents))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        words = set(query.split())
+        return [len(words & set(d.split())) / len(words) for d in documents]
+
+
+@pytest.fixture
+def reranker_for():
+    rerankers = []
+
+    def make(scorer, **kwargs):
+        kwargs.setdefault("encoding", None)
+        rerankers.append(Reranker(scorer, **kwargs))
+        return rerankers[-1]
+    yield make
+    for reranker in rerankers:
+        reranker.close()
+
+
+def text(item):
+    return item[1]
+
+
+def test_reorders_by_relevance(reranker_for):
+    result = reranker_for(WordOverlapScorer(), oversample=3).rerank("coffee beans", ITEMS, 3, text=text)
+    assert result.reranked and result.error is None
+    assert [item[0] for item in result.items] == ["doc-1", "doc-2", "doc-4"]
+    assert result.scores == [1.0, 1.0, 0.5]
+    assert reranker_for(WordOverlapScorer(), oversample=3).candidates(4) == 12
+
+
+def test_batches_and_concurrency(reranker_for):
+    scorer = WordOverlapScorer(delay=0.05)
+    items = [(f"doc-{i}", f"coffee {i}") for i in range(10)]
+    result = reranker_for(scorer, batch_size=3, max_concurrency=2).rerank("coffee", items, 10, text=text)
+    assert sorted(len(batch) for batch in scorer.batches) == [1, 3, 3, 3]
+    assert scorer.peak == 2
+    # Equal scores keep the original order
+    assert result.items == items
+
+
+def test_documents_truncated_to_token_budget(reranker_for):
+    scorer = WordOverlapScorer()
+    long_text = "coffee " * 20 + "beans"
+    reranker_for(scorer, max_document_tokens=5, encoding=WordEncoding()).rerank("beans", [long_text], 1)
+    assert scorer.batches == [["coffee coffee coffee coffee coffee"]]
+    reranker = reranker_for(scorer, max_document_tokens=2)
+    assert reranker.truncate("abcdefghijkl") == "abcdefgh"
+
+
+def test_timeout_falls_back_to_vector_order(reranker_for):
+    result = reranker_for(WordOverlapScorer(delay=0.5), timeout=0.05).rerank("coffee beans", ITEMS, 2, text=text)
+    assert not result.reranked and result.error == "timeout"
+    assert result.items == ITEMS[:2] and result.scores is None
+    assert result.latency < 0.4
+
+
+def test_scorer_error_falls_back(reranker_for):
+    class Failing:
+        def score(self, query, documents):
+            raise ConnectionError("rerank deployment unavailable")
+
+    result = reranker_for(Failing()).rerank("coffee", ITEMS, 3, text=text)
+    assert not result.reranked
+    assert result.error == "ConnectionError('rerank deployment unavailable')"
+    assert result.items == ITEMS[:3]
+
+
+def test_async_scorer_is_awaited(reranker_for):
+    class AsyncScorer(WordOverlapScorer):
+        async def ascore(self, query, documents):
+            await asyncio.sleep(0)
+            return self.score(query, documents)
+
+    scorer = AsyncScorer()
+    reranker = reranker_for(scorer)
+    result = asyncio.run(reranker.arerank("green tea", ITEMS, 1, text=text))
+    assert result.items == [ITEMS[3]]
+    assert len(scorer.batches) == 1
+
+
+def test_cohere_reranker_against_fake_server(reranker_for):
+    with FakeRerankServer() as server:
+        scorer = CohereReranker(server.url, "key")
+        assert scorer.score("coffee beans", ["tea", "coffee beans", "coffee"]) == [0.0, 1.0, 0.5]
+        result = reranker_for(scorer, batch_size=2).rerank("dark roast", ITEMS, 1, text=text)
+    assert result.items == [ITEMS[2]]
+    assert server.requests[0] == {"model": "Cohere-rerank-v4.0-fast", "query": "coffee beans",
+                                  "documents": ["tea", "coffee beans", "coffee"], "top_n": 3}
+    assert len(server.requests) == 1 + 3
@@ -0,0 +1,110 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from sqlvector.streaming import ChatClient, CompletionStream, StreamStats, iter_sse
+from sqlvector.testing import FakeChatServer, FakeClock
+
+
+class Response:
+    """
+    Canned streamed response: `lines` as iter_lines yields them, `closed` once close() is called.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def iter_lines(self, chunk_size=None, decode_unicode=False):
+        yield from self.lines
+
+    def close(self):
+        self.closed = True
+
+
+def chunk(content=None, usage=None):
+    choices = [{"index": 0, "delta": {"content": content}}] if content is not None else []
+    return {"choices": choices, "usage": usage}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(100.0)
+    monkeypatch.setattr("sqlvector.streaming.time.perf_counter", clock)
+    return clock
+
+
+def timed(clock, chunks):
+    # Each chunk arrives `delay` seconds after the previous one
+    for delay, value in chunks:
+        clock.advance(delay)
+        yield value
+
+
+def test_time_to_first_token_and_speed(clock):
+    chunks = [(0.2, chunk("")), (0.3, chunk("Hello")), (0.5, chunk(" there")), (0.5, chunk(" friend"))]
+    stream = CompletionStream(timed(clock, chunks))
+    assert list(stream) == ["Hello", " there", " friend"]
+    assert stream.text == "Hello there friend"
+    assert stream.stats.time_to_first_token == pytest.approx(0.5)
+    assert stream.stats.duration == pytest.approx(1.5)
+    assert stream.stats.tokens == 3
+    assert stream.stats.tokens_per_second == pytest.approx(2.0)
+    assert stream.stats.describe() == "First token after 500 ms, 3 tokens in 1.5 s, 2.0 tokens/s"
+
+
+def test_usage_chunk_overrides_piece_count(clock):
+    chunks = [(0.1, chunk("Hello world")), (1.0, chunk(" again")), (0.0, chunk(usage={"completion_tokens": 11}))]
+    stream = CompletionStream(timed(clock, chunks), start=clock())
+    assert "".join(stream) == "Hello world again"
+    assert stream.stats.tokens == 11
+    assert stream.stats.tokens_per_second == pytest.approx(10.0)
+
+
+def test_sdk_style_objects(clock):
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="Hi"))], usage=None),
+              SimpleNamespace(choices=[], usage=SimpleNamespace(completion_tokens=1))]
+    stream = CompletionStream(iter(chunks))
+    assert list(stream) == ["Hi"]
+    assert stream.stats.tokens == 1 and stream.stats.tokens_per_second is None
+
+
+def test_no_text(clock):
+    stream = CompletionStream(timed(clock, [(2.0, chunk(""))]))
+    assert list(stream) == []
+    assert stream.stats.time_to_first_token is None
+    assert stream.stats.describe() == "No text received in 2.0 s"
+
+
+def test_stats_speed_edge_cases():
+    assert StreamStats(0.5, 0.5, 5).tokens_per_second is None
+    assert StreamStats(0.5, 2.0, 1).tokens_per_second is None
+    assert StreamStats(None, 2.0, 0).tokens_per_second is None
+
+
+def test_iter_sse_stops_at_done():
+    response = Response(["", ": keep-alive", f"data: {json.dumps(chunk('a'))}", "event: ping",
+                         f"data:{json.dumps(chunk('b'))}", "data: [DONE]", "data: not json"])
+    assert [c["choices"][0]["delta"]["content"] for c in iter_sse(response)] == ["a", "b"]
+    assert response.closed
+
+
+def test_response_closed_when_consumer_stops_early(clock):
+    response = Response(f"data: {json.dumps(chunk(word))}" for word in ["one", " two", " three"])
+    stream = CompletionStream(iter_sse(response))
+    pieces = iter(stream)
+    assert next(pieces) == "one"
+    assert not response.closed
+    pieces.close()
+    assert response.closed
+    assert stream.stats.tokens == 1
+
+
+def test_chat_client_against_fake_server():
+    with FakeChatServer(reply="The answer is 42") as server:
+        client = ChatClient(server.url, "key")
+        stream = client.stream([{"role": "user", "content": "question"}], stream_options={"include_usage": True})
+        assert list(stream) == ["The", " answer", " is", " 42"]
+        assert stream.stats.tokens == 4 and stream.stats.time_to_first_token is not None
+        assert client.complete([{"role": "user", "content": "question"}]) == "The answer is 42"
@@ -0,0 +1,138 @@
+import json
+import threading
+
+import pytest
+
+from sqlvector.tracing import JsonLinesExporter, LatencyHistogram, Tracer, span, traced
+
+
+@traced()
+def embed():
+    with span("http.post", attempt=1):
+        pass
+
+
+@traced("sql.query")
+def query():
+    raise TimeoutError("query timed out")
+
+
+def test_spans_nest_under_the_active_span():
+    tracer = Tracer()
+    with tracer.trace("search", backend="sql") as request:
+        embed()
+        with span("sql.connect") as connect:
+            connect.set(pooled=True)
+    trace = request.trace
+    assert [s.name for s in trace.spans] == ["http.post", "embed", "sql.connect", "search"]
+    by_name = {s.name: s for s in trace.spans}
+    assert by_name["http.post"].parent_id == by_name["embed"].span_id
+    assert by_name["embed"].parent_id == by_name["sql.connect"].parent_id == trace.root.span_id
+    assert by_name["sql.connect"].attributes == {"pooled": True}
+    assert [row["stage"] for row in trace.breakdown()] == ["search", "  embed", "    http.post", "  sql.connect"]
+    assert trace.duration >= by_name["embed"].duration
+
+
+def test_errors_are_recorded_and_raised():
+    tracer = Tracer()
+    with pytest.raises(TimeoutError):
+        with tracer.trace("search") as request:
+            query()
+    spans = {s.name: s for s in request.trace.spans}
+    assert spans["sql.query"].error == "TimeoutError('query timed out')"
+    assert spans["search"].to_dict()["status"] == {"code": "ERROR", "message": "TimeoutError('query timed out')"}
+
+
+def test_noop_outside_a_trace_or_when_disabled():
+    assert span("anything").trace is None
+    embed()
+    tracer = Tracer(enabled=False)
+    with tracer.trace("search") as request:
+        embed()
+    assert request.trace is None and tracer.stats() == {}
+    with tracer.trace("search", record=True) as request:
+        # A nested trace is a plain child span
+        with tracer.trace("inner"):
+            pass
+    assert [s.name for s in request.trace.spans] == ["inner", "search"]
+
+
+def test_threads_do_not_share_the_active_span():
+    tracer = Tracer()
+    with tracer.trace("search") as request:
+        worker = threading.Thread(target=embed)
+        worker.start()
+        worker.join()
+    assert [s.name for s in request.trace.spans] == ["search"]
+
+
+def test_histograms_and_stats():
+    histogram = LatencyHistogram(bounds=(10, 100))
+    for value in (1, 2, 3, 4, 50, 60, 70, 80, 90, 500):
+        histogram.record(value)
+    assert histogram.counts == [4, 5, 1]
+    assert histogram.percentile(40) == pytest.approx(10)
+    assert histogram.percentile(90) == pytest.approx(100)
+    assert histogram.percentile(100) == 500
+    assert histogram.summary()["count"] == 10 and histogram.summary()["max_ms"] == 500
+    assert LatencyHistogram().percentile(50) is None
+
+    tracer = Tracer()
+    for _ in range(3):
+        with tracer.trace("search"):
+            embed()
+    stats = tracer.stats()
+    assert list(stats) == ["embed", "http.post", "search"]
+    assert stats["embed"]["count"] == 3
+    tracer.reset()
+    assert tracer.stats() == {}
+
+
+def test_json_lines_export(tmp_path):
+    path = tmp_path / "trace.jsonl"
+
+    class Broken:
+        def export(self, trace):
+            raise OSError("collector unreachable")
+
+    tracer = Tracer(exporters=[JsonLinesExporter(str(path)), Broken()])
+    with tracer.trace("search", k=5) as request:
+        embed()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["http.post", "embed", "search"]
+    assert {r["traceId"] for r in records} == {request.trace.trace_id}
+    assert records[2]["parentSpanId"] == "" and records[2]["attributes"] == {"k": 5}
+    assert records[0]["endTimeUnixNano"] >= records[0]["startTimeUnixNano"]
+    assert tracer.export_errors == 1
+
+
+def test_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRACING", "1")
+    monkeypatch.setenv("TRACE_LOG", str(tmp_path / "trace.jsonl"))
+    monkeypatch.delenv("TRACE_OTEL", raising=False)
+    tracer = Tracer.from_env()
+    assert tracer.enabled and isinstance(tracer.exporters[0], JsonLinesExporter)
+    monkeypatch.setenv("TRACING", "no")
+    monkeypatch.delenv("TRACE_LOG")
+    tracer = Tracer.from_env()
+    assert not tracer.enabled and tracer.exporters == []
+
+
+def test_open_telemetry_export():
+    sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    from sqlvector.tracing import OpenTelemetryExporter
+
+    memory = InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    tracer = Tracer(exporters=[OpenTelemetryExporter(provider.get_tracer("test"))])
+    with pytest.raises(TimeoutError):
+        with tracer.trace("search"):
+            query()
+    spans = {s.name: s for s in memory.get_finished_spans()}
+    assert spans["sql.query"].parent.span_id == spans["search"].context.span_id
+    assert not spans["sql.query"].status.is_ok
+    assert tracer.export_errors == 0